@@ -41,6 +41,7 @@ from pitivi.undo.project import ProjectObserver
 from pitivi.undo.undo import UndoableActionLog
 from pitivi.utils import loggable
 from pitivi.utils.loggable import Loggable
+from pitivi.utils.mediacache import MediaCache
 from pitivi.utils.misc import path_from_uri
 from pitivi.utils.misc import quote_uri
 from pitivi.utils.proxy import ProxyManager
@@ -143,6 +144,7 @@ class Pitivi(Gtk.Application, Loggable):
     def _setup(self):
         # pylint: disable=attribute-defined-outside-init
         self.settings = GlobalSettings()
+        MediaCache.configure(self.settings)
         self.threads = ThreadMaster()
         self.effects = EffectsManager()
         self.proxy_manager = ProxyManager(self)
@@ -236,6 +238,7 @@ class Pitivi(Gtk.Application, Loggable):
         if self.gui:
             self.gui.destroy()
         self.threads.wait_all_threads()
+        self.proxy_manager.jobs.flush()
         self.settings.store_settings()
         self.quit()
         return True
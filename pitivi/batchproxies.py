@@ -0,0 +1,307 @@
+# -*- coding: utf-8 -*-
+# Pitivi video editor
+# Copyright (c) 2024, Pitivi contributors
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this program; if not, see <http://www.gnu.org/licenses/>.
+"""Command-line tool for generating the proxies of many files in batch.
+
+The proxies, thumbnails and waveforms are created exactly as by the app,
+so the media files are ready to be edited when imported in a project.
+
+Run with: pitivi-proxies [--scaled] [--jobs N] DIR|PROJECT.xges ...
+"""
+import argparse
+import os
+import sys
+import time
+from xml.etree import ElementTree
+
+from gi.repository import GES
+from gi.repository import Gio
+from gi.repository import GLib
+from gi.repository import Gst
+
+from pitivi.headless import HeadlessApp
+# Registers the thumbnails and waveform filters used by the transcoders.
+from pitivi.timeline import previewers
+from pitivi.utils import loggable
+from pitivi.utils.loggable import Loggable
+from pitivi.utils.misc import path_from_uri
+from pitivi.utils.proxy import ProxyManager
+
+
+def collect_uris(paths):
+    """Collects the URIs of the media files to be proxied.
+
+    Args:
+        paths (List[str]): Media files, directories which are walked
+            recursively, or project files whose clips are used.
+
+    Returns:
+        List[str]: The URIs, without duplicates, in the order found.
+    """
+    uris = []
+    for path in paths:
+        if path.endswith(".xges"):
+            uris.extend(project_uris(path))
+        elif os.path.isdir(path):
+            for dirpath, dirnames, filenames in os.walk(path):
+                dirnames.sort()
+                for filename in sorted(filenames):
+                    uris.append(Gst.filename_to_uri(os.path.join(dirpath, filename)))
+        else:
+            uris.append(Gst.filename_to_uri(path))
+
+    return [uri for uri in dict.fromkeys(uris)
+            if not ProxyManager.is_proxy_asset(uri) and
+            not uri.endswith(ProxyManager.part_suffix)]
+
+
+def project_uris(path):
+    """Gets the URIs of the media files used by the clips of a project."""
+    uris = []
+    root = ElementTree.parse(path).getroot()
+    for asset in root.iter("asset"):
+        if asset.get("extractable-type-name") != "GESUriClip":
+            continue
+        uri = asset.get("id")
+        if ProxyManager.is_proxy_asset(uri):
+            uri = ProxyManager.get_target_uri(uri)
+        uris.append(uri)
+    return uris
+
+
+class BatchProxies(Loggable):
+    """Transcodes a list of media files, a few at a time.
+
+    Attributes:
+        proxy_manager (ProxyManager): The manager of the proxies of the app.
+        high_quality (bool): Whether to create the high-quality proxies.
+        max_size (Optional[Tuple[int, int]]): The maximum resolution of the
+            scaled proxies, or None to skip them.
+        jobs (int): The maximum number of transcoders running in parallel.
+    """
+
+    def __init__(self, app, uris, high_quality, max_size, jobs):
+        Loggable.__init__(self)
+        self.high_quality = high_quality
+        self.max_size = max_size
+        self.jobs = jobs
+        self.proxy_manager = app.proxy_manager
+        self.failures = 0
+        self.__pending_uris = list(uris)
+        self.__running_jobs = []
+        self.__copying_threads = []
+        self.__loop = GLib.MainLoop()
+
+    def run(self):
+        """Transcodes all the files.
+
+        Returns:
+            int: The exit status of the tool.
+        """
+        if self.proxy_manager.proxying_unsupported:
+            print("No supported proxy format, check the installed GStreamer plugins",
+                  file=sys.stderr)
+            return 1
+
+        start = time.monotonic()
+        GLib.idle_add(self.__start_next_transcoders)
+        self.__loop.run()
+        for thread in self.__copying_threads:
+            thread.join()
+        print("Done in %.1fs, %d failure(s)" % (time.monotonic() - start, self.failures))
+        return 1 if self.failures else 0
+
+    def __start_next_transcoders(self):
+        while self.__pending_uris and len(self.__running_jobs) < self.jobs:
+            uri = self.__pending_uris.pop(0)
+            try:
+                asset = GES.UriClipAsset.request_sync(uri)
+            except GLib.Error as e:
+                self.info("Skipping %s: %s", uri, e)
+                continue
+
+            if asset.is_image() or not asset.get_info().get_stream_list():
+                continue
+
+            self.__start_transcoder(asset)
+
+        if not self.__running_jobs:
+            self.__loop.quit()
+        return False
+
+    def __start_transcoder(self, asset):
+        hq_proxy_uri = self.proxy_manager.get_proxy_uri(asset)
+        scaled_proxy_uri = None
+        size = None
+        if self.max_size and asset.get_info().get_video_streams():
+            scaled_proxy_uri = self.proxy_manager.get_proxy_uri(asset, scaled=True,
+                                                                max_size=self.max_size)
+            size = self.proxy_manager.scale_asset_resolution(asset, *self.max_size)
+
+        missing_hq = self.high_quality and not self.__exists(asset, hq_proxy_uri)
+        missing_scaled = scaled_proxy_uri and not self.__exists(asset, scaled_proxy_uri)
+        if missing_scaled:
+            # Decode the asset once for both the scaled proxy and its shadow.
+            transcoder, signals_emitter = self.proxy_manager.create_transcoder(
+                asset, scaled_proxy_uri, size,
+                hq_proxy_uri=hq_proxy_uri if missing_hq else None)
+        elif missing_hq:
+            transcoder, signals_emitter = self.proxy_manager.create_transcoder(
+                asset, hq_proxy_uri)
+        elif self.__missing_previews(asset):
+            print("Generating the previews of %s" % path_from_uri(asset.get_id()))
+            self.__start_previews(asset)
+            return
+        else:
+            print("Skipping %s, the proxies exist" % path_from_uri(asset.get_id()))
+            return
+
+        print("Transcoding %s" % path_from_uri(asset.get_id()))
+        signals_emitter.connect("done", self.__transcoder_done_cb, asset, transcoder)
+        signals_emitter.connect("error", self.__transcoder_error_cb, transcoder)
+        self.__running_jobs.append(transcoder)
+        transcoder.run_async()
+
+    @staticmethod
+    def __missing_previews(asset):
+        info = asset.get_info()
+        if info.get_video_streams() and \
+                not previewers.ThumbnailCache.get(asset.get_id()).positions:
+            return True
+
+        if info.get_audio_streams() and \
+                not os.path.exists(previewers.get_wavefile_location_for_uri(asset.get_id())):
+            return True
+
+        return False
+
+    def __start_previews(self, asset):
+        """Decodes the asset only for creating its thumbnails and waveform."""
+        pipeline = Gst.Pipeline.new(None)
+        decode = Gst.ElementFactory.make("uridecodebin", None)
+        decode.props.uri = asset.get_id()
+        decode.connect("pad-added", self.__previews_pad_added_cb, pipeline, asset)
+        pipeline.add(decode)
+
+        bus = pipeline.get_bus()
+        bus.add_signal_watch()
+        bus.connect("message", self.__previews_bus_message_cb, pipeline, asset)
+        self.__running_jobs.append(pipeline)
+        pipeline.set_state(Gst.State.PLAYING)
+
+    def __previews_pad_added_cb(self, unused_decode, pad, pipeline, asset):
+        caps = pad.get_current_caps() or pad.query_caps(None)
+        media_type = caps[0].get_name()
+        if media_type == "video/x-raw" and not pipeline.get_by_name("thumbnailbin"):
+            element_filter = Gst.ElementFactory.make("teedthumbnailbin", "thumbnailbin")
+        elif media_type == "audio/x-raw" and not pipeline.get_by_name("waveformbin"):
+            element_filter = Gst.ElementFactory.make("waveformbin", "waveformbin")
+            element_filter.props.duration = asset.get_duration()
+        else:
+            element_filter = None
+
+        fakesink = Gst.ElementFactory.make("fakesink", None)
+        fakesink.props.sync = False
+        pipeline.add(fakesink)
+        fakesink.sync_state_with_parent()
+        if not element_filter:
+            pad.link(fakesink.get_static_pad("sink"))
+            return
+
+        element_filter.props.uri = asset.get_id()
+        pipeline.add(element_filter)
+        element_filter.link(fakesink)
+        element_filter.sync_state_with_parent()
+        pad.link(element_filter.get_static_pad("sink"))
+
+    def __previews_bus_message_cb(self, bus, message, pipeline, asset):
+        if message.type == Gst.MessageType.EOS:
+            for name in ("thumbnailbin", "waveformbin"):
+                element_filter = pipeline.get_by_name(name)
+                if element_filter:
+                    element_filter.finalize()
+            print("Created the previews of %s" % path_from_uri(asset.get_id()))
+        elif message.type == Gst.MessageType.ERROR:
+            error, unused_details = message.parse_error()
+            self.failures += 1
+            print("Failed generating the previews of %s: %s"
+                  % (path_from_uri(asset.get_id()), error), file=sys.stderr)
+        else:
+            return
+
+        bus.remove_signal_watch()
+        bus.disconnect_by_func(self.__previews_bus_message_cb)
+        pipeline.set_state(Gst.State.NULL)
+        self.__running_jobs.remove(pipeline)
+        self.__start_next_transcoders()
+
+    def __exists(self, asset, uri):
+        return Gio.File.new_for_uri(uri).query_exists(None) or \
+            self.proxy_manager.link_cached_proxy(asset, uri)
+
+    def __transcoder_done_cb(self, emitter, asset, transcoder):
+        emitter.disconnect_by_func(self.__transcoder_done_cb)
+        emitter.disconnect_by_func(self.__transcoder_error_cb)
+        self.__running_jobs.remove(transcoder)
+
+        for proxy_uri in ProxyManager.finalize_transcoder(transcoder):
+            print("Created %s" % path_from_uri(proxy_uri))
+            thread = self.proxy_manager.publish_proxy(asset, proxy_uri)
+            if thread:
+                self.__copying_threads.append(thread)
+
+        self.__start_next_transcoders()
+
+    def __transcoder_error_cb(self, emitter, error, unused_details, transcoder):
+        emitter.disconnect_by_func(self.__transcoder_done_cb)
+        emitter.disconnect_by_func(self.__transcoder_error_cb)
+        self.__running_jobs.remove(transcoder)
+        self.failures += 1
+
+        print("Failed transcoding %s: %s" % (path_from_uri(transcoder.props.src_uri), error),
+              file=sys.stderr)
+        self.__start_next_transcoders()
+
+
+def main(argv):
+    """Runs the tool with the specified command-line arguments."""
+    loggable.init("PITIVI_DEBUG")
+    app = HeadlessApp()
+    settings = app.settings
+
+    parser = argparse.ArgumentParser(
+        prog="pitivi-proxies",
+        description="Creates the proxies of media files, for editing them in Pitivi.")
+    parser.add_argument("paths", nargs="+", metavar="PATH",
+                        help="media file, directory or .xges project")
+    parser.add_argument("--no-hq", dest="high_quality", action="store_false",
+                        help="do not create the high-quality proxies")
+    parser.add_argument("--scaled", action="store_true",
+                        help="also create the scaled proxies")
+    parser.add_argument("--width", type=int, default=settings.default_scaled_proxy_width,
+                        help="maximum width of the scaled proxies")
+    parser.add_argument("--height", type=int, default=settings.default_scaled_proxy_height,
+                        help="maximum height of the scaled proxies")
+    parser.add_argument("-j", "--jobs", type=int, default=settings.num_transcoding_jobs,
+                        help="number of files transcoded in parallel")
+    options = parser.parse_args(argv)
+    if not options.high_quality and not options.scaled:
+        parser.error("nothing to do with --no-hq and without --scaled")
+
+    max_size = (options.width, options.height) if options.scaled else None
+    batch = BatchProxies(app, collect_uris(options.paths), options.high_quality,
+                         max_size, max(1, options.jobs))
+    return batch.run()
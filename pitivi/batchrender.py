@@ -0,0 +1,268 @@
+# -*- coding: utf-8 -*-
+# Pitivi video editor
+# Copyright (c) 2024, Pitivi contributors
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this program; if not, see <http://www.gnu.org/licenses/>.
+"""Command-line tool for rendering projects without a display.
+
+The project is loaded and rendered as by the render dialog. The progress is
+printed on stdout as one JSON object per line, for example:
+
+    {"event": "progress", "position": 2000000000, "duration": 8000000000, "fraction": 0.25}
+
+The last line has the "done" or the "error" event.
+
+Run with: pitivi-render [--preset NAME] [--proxies MODE] [-j N] [--report] PROJECT.xges OUTPUT
+"""
+import argparse
+import json
+import os
+import time
+
+from gi.repository import GES
+from gi.repository import GLib
+from gi.repository import Gst
+
+from pitivi.headless import HeadlessApp
+from pitivi.render import CHUNKS_PER_PROCESS
+from pitivi.render import PresetsManager
+from pitivi.render import ProxyRendering
+from pitivi.render import replace_proxies
+from pitivi.utils import loggable
+from pitivi.utils.loggable import Loggable
+from pitivi.utils.parallelrender import compute_cut_points
+from pitivi.utils.parallelrender import ParallelRender
+from pitivi.utils.rendertelemetry import RenderTelemetry
+
+
+def print_event(event, **fields):
+    """Prints a progress event as a line of JSON on stdout."""
+    print(json.dumps({"event": event, **fields}), flush=True)
+
+
+class HeadlessRender(Loggable):
+    """Renders a project file with its saved settings or with a preset.
+
+    Attributes:
+        app (HeadlessApp): The app holding the project.
+        output_uri (str): The URI of the rendered file.
+        preset (Optional[str]): The name of the render preset to be used
+            instead of the rendering settings saved in the project.
+        proxy_rendering (ProxyRendering): How the proxies are used.
+        processes (int): The number of processes rendering in parallel, or 1
+            to render with the pipeline of the project.
+    """
+
+    def __init__(self, app, output_uri, preset, proxy_rendering, processes):
+        Loggable.__init__(self)
+        self.app = app
+        self.output_uri = output_uri
+        self.preset = preset
+        self.proxy_rendering = proxy_rendering
+        self.processes = processes
+        self.project = None
+        self.__parallel_render = None
+        self.__telemetry = None
+        self.__time_started = 0
+        self.__exitcode = 0
+        self.__loop = GLib.MainLoop()
+
+    def run(self, project_uri):
+        """Loads and renders the project.
+
+        Returns:
+            int: The exit status of the tool.
+        """
+        project_manager = self.app.project_manager
+        project_manager.connect("new-project-loaded", self.__project_loaded_cb)
+        project_manager.connect("new-project-failed", self.__project_failed_cb)
+        if project_manager.load_project(project_uri):
+            self.__loop.run()
+        return self.__exitcode
+
+    def __fail(self, message):
+        print_event("error", message=message)
+        self.__exitcode = 1
+        self.__loop.quit()
+
+    def __project_failed_cb(self, unused_project_manager, uri, reason):
+        self.__fail("Failed loading %s: %s" % (uri, reason))
+
+    def __project_loaded_cb(self, unused_project_manager, project):
+        self.project = project
+        if project.at_least_one_asset_missing:
+            self.__fail("Some media files of the project are missing")
+            return
+
+        if self.preset and not self.__apply_preset():
+            return
+
+        replace_proxies(project, self.proxy_rendering, self.app.proxy_manager)
+        project.set_rendering(True)
+        project.add_encoding_profile(project.container_profile)
+        self.__time_started = time.monotonic()
+
+        cut_points = None
+        # The audio is rendered in one pass anyway, see ParallelRender.
+        if self.processes > 1 and project.video_profile.is_enabled():
+            cut_points = compute_cut_points(project.ges_timeline,
+                                            self.processes * CHUNKS_PER_PROCESS,
+                                            project.videorate)
+        if cut_points and len(cut_points) > 2:
+            self.__start_parallel_render(cut_points)
+        else:
+            self.__start_render()
+
+    def __apply_preset(self):
+        presets_manager = PresetsManager(self.project)
+        for preset_item in presets_manager.model:
+            if preset_item.name.lower() != self.preset.lower():
+                continue
+
+            if not self.project.set_container_profile(preset_item.profile):
+                self.__fail("The %s preset cannot be used" % preset_item.name)
+                return False
+            return True
+
+        self.__fail("No %s preset, the available presets are: %s" %
+                    (self.preset, ", ".join(item.name for item in presets_manager.model)))
+        return False
+
+    def __start_render(self):
+        pipeline = self.project.pipeline
+        pipeline.set_state(Gst.State.NULL)
+        pipeline.set_render_settings(self.output_uri, self.project.container_profile)
+        pipeline.set_mode(GES.PipelineFlags.RENDER)
+        encodebin = pipeline.get_by_name("internal-encodebin")
+        encodebin.connect("element-added", self.__element_added_cb)
+        for element in encodebin.iterate_recurse():
+            self.__set_properties(element)
+
+        bus = pipeline.get_bus()
+        bus.add_signal_watch()
+        bus.connect("message", self.__bus_message_cb)
+        pipeline.connect("position", self.__position_cb)
+        if self.app.settings.render_report:
+            self.__telemetry = RenderTelemetry()
+            self.__telemetry.attach(pipeline)
+        pipeline.set_state(Gst.State.PLAYING)
+
+    def __start_parallel_render(self, cut_points):
+        self.__parallel_render = ParallelRender(self.output_uri, self.project.container_profile,
+                                                cut_points, self.processes)
+        # The processes load the project saved with the rendering settings.
+        try:
+            self.project.save(self.project.ges_timeline,
+                              self.__parallel_render.project_uri, None, overwrite=True)
+        except GLib.Error as e:
+            self.__parallel_render.cancel()
+            self.__fail("Failed saving the project: %s" % e.message)
+            return
+
+        self.__parallel_render.connect("position", self.__position_cb)
+        self.__parallel_render.connect("done", self.__parallel_render_done_cb)
+        self.__parallel_render.connect("error", self.__parallel_render_error_cb)
+        self.__parallel_render.start()
+
+    def __element_added_cb(self, unused_bin, gst_element):
+        self.__set_properties(gst_element)
+
+    def __set_properties(self, gst_element):
+        """Sets the codec settings of the project on the encoders."""
+        factory = gst_element.get_factory()
+        if not factory:
+            return
+
+        if factory.get_name() == self.project.vencoder:
+            settings = self.project.vcodecsettings
+        elif factory.get_name() == self.project.aencoder:
+            settings = self.project.acodecsettings
+        else:
+            return
+
+        for propname, value in settings.items():
+            gst_element.set_property(propname, value)
+            self.debug("Setting %s to %s", propname, value)
+
+    def __position_cb(self, unused_pipeline, position):
+        duration = self.project.ges_timeline.props.duration
+        print_event("progress", position=position, duration=duration,
+                    fraction=round(min(position, duration) / duration, 4) if duration else 1.0,
+                    elapsed=round(time.monotonic() - self.__time_started, 1))
+
+    def __render_done(self):
+        fields = {}
+        if self.__telemetry:
+            self.__telemetry.detach()
+            try:
+                fields["report"] = self.__telemetry.write_report(
+                    self.output_uri,
+                    duration=self.project.ges_timeline.props.duration,
+                    muxer=self.project.muxer,
+                    video_encoder=self.project.vencoder,
+                    audio_encoder=self.project.aencoder)
+            except OSError as e:
+                self.warning("Failed writing the render report: %s", e)
+                fields["report_error"] = str(e)
+        print_event("done", output=self.output_uri,
+                    elapsed=round(time.monotonic() - self.__time_started, 1), **fields)
+        self.__loop.quit()
+
+    def __bus_message_cb(self, unused_bus, message):
+        if message.type == Gst.MessageType.EOS:
+            self.project.pipeline.set_state(Gst.State.NULL)
+            self.__render_done()
+        elif message.type == Gst.MessageType.ERROR:
+            error, unused_details = message.parse_error()
+            self.project.pipeline.set_state(Gst.State.NULL)
+            self.__fail(error.message)
+
+    def __parallel_render_done_cb(self, unused_parallel_render):
+        self.__render_done()
+
+    def __parallel_render_error_cb(self, unused_parallel_render, message):
+        self.__fail(message)
+
+
+def main(argv):
+    """Runs the tool with the specified command-line arguments."""
+    loggable.init("PITIVI_DEBUG")
+
+    parser = argparse.ArgumentParser(
+        prog="pitivi-render",
+        description="Renders a Pitivi project without opening a window.")
+    parser.add_argument("project", metavar="PROJECT", help="the .xges project file")
+    parser.add_argument("output", metavar="OUTPUT", help="the rendered file")
+    parser.add_argument("--preset",
+                        help="the render preset to use instead of the rendering settings "
+                        "saved in the project, for example youtube")
+    parser.add_argument("--proxies", choices=["automatic", "always", "never"], default="never",
+                        help="whether to render from the proxies instead of the media files")
+    parser.add_argument("-j", "--processes", type=int, default=1,
+                        help="number of processes rendering chunks in parallel")
+    parser.add_argument("--report", action="store_true",
+                        help="write a JSON performance report next to the output, "
+                        "when rendering with a single process; measuring slows down "
+                        "the render")
+    options = parser.parse_args(argv)
+
+    app = HeadlessApp()
+    if options.report:
+        app.settings.render_report = True
+    project_uri = Gst.filename_to_uri(os.path.abspath(options.project))
+    output_uri = Gst.filename_to_uri(os.path.abspath(options.output))
+    proxy_rendering = ProxyRendering[options.proxies.upper()]
+    render = HeadlessRender(app, output_uri, options.preset, proxy_rendering,
+                            max(1, options.processes))
+    return render.run(project_uri)
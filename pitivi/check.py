@@ -265,6 +265,8 @@ def _using_broadway_display():
     except RuntimeError:
         return False
     display = Gdk.Display.get_default()
+    if not display:
+        return False
     return GObject.type_is_a(display.__gtype__, gdk_broadway_display_type)
 
 
@@ -319,8 +321,13 @@ class GICheck(ClassicDependency):
         return list(module.version_info)
 
 
-def check_requirements():
-    """Checks Pitivi's dependencies are satisfied."""
+def check_requirements(headless=False):
+    """Checks Pitivi's dependencies are satisfied.
+
+    Args:
+        headless (Optional[bool]): Whether to skip checking the audio and
+            video output sinks, for the command-line tools.
+    """
     hard_dependencies_satisfied = True
 
     for dependency in HARD_DEPENDENCIES:
@@ -348,15 +355,16 @@ def check_requirements():
                 "this means gst-python is not installed correctly."))
         return False
 
-    if not _check_audiosinks():
-        print(_("Could not create audio output sink. "
-                "Make sure you have a valid one (pulsesink, alsasink or osssink)."))
-        return False
+    if not headless:
+        if not _check_audiosinks():
+            print(_("Could not create audio output sink. "
+                    "Make sure you have a valid one (pulsesink, alsasink or osssink)."))
+            return False
 
-    if not _check_videosink():
-        print(_("Could not create video output sink. "
-                "Make sure you have a gtksink available."))
-        return False
+        if not _check_videosink():
+            print(_("Could not create video output sink. "
+                    "Make sure you have a gtksink available."))
+            return False
 
     _check_hardware_decoders()
 
@@ -374,11 +382,15 @@ def require_version(modulename, version):
         sys.exit(1)
 
 
-def initialize_modules():
+def initialize_modules(headless=False):
     """Initializes the modules.
 
     This has to be done in a specific order otherwise the app
     crashes on some systems.
+
+    Args:
+        headless (Optional[bool]): Whether to skip opening the display,
+            for the command-line tools.
     """
     try:
         import gi
@@ -390,7 +402,8 @@ def initialize_modules():
     require_version("Gtk", GTK_API_VERSION)
     require_version("Gdk", GTK_API_VERSION)
     from gi.repository import Gdk
-    Gdk.init([])
+    if not headless:
+        Gdk.init([])
     from gi.repository import Gtk
 
     # Monkey patch deprecated methods to use the new variant by default
@@ -475,7 +488,6 @@ HARD_DEPENDENCIES = [GICheck(version_required="3.20.0"),
                      GIDependency("Gio", apiversion="2.0"),
                      GstPluginDependency("gtk"),
                      GstPluginDependency("gdkpixbuf"),
-                     ClassicDependency("matplotlib"),
                      GIDependency("Peas", apiversion="1.0"),
                      GIDependency("PangoCairo", apiversion="1.0"),
                      ]
@@ -7,61 +7,133 @@
 static GObjectClass * gobject_class;
 
 /*
- * This function must be called with a range of samples, and a desired
- * width and height.
- * It will average samples if needed.
+ * The samples to draw, either copied from a Python list or read in place
+ * from an object supporting the buffer protocol, such as a numpy array.
  */
-static PyObject *
-py_fill_surface (PyObject * self, PyObject * args)
+typedef struct
 {
-  PyObject *samples;
-  PyObject *sampleObj;
-  int length, i;
-  double sample;
-  cairo_surface_t *surface;
-  cairo_t *ctx;
-  int width, height;
+  Py_buffer view;
+  gboolean has_view;
+  gboolean is_double;
+  double *values;
+  Py_ssize_t length;
+} Samples;
+
+typedef enum
+{
+  REDUCE_AVERAGE,
+  REDUCE_MIN,
+  REDUCE_MAX,
+} Reduction;
+
+static gboolean
+samples_init (Samples * samples, PyObject * obj)
+{
+  Py_ssize_t i;
+  const char *format;
+
+  memset (samples, 0, sizeof (Samples));
+
+  if (PyList_Check (obj)) {
+    samples->length = PyList_Size (obj);
+    samples->values = g_new (double, samples->length);
+    for (i = 0; i < samples->length; i++) {
+      /* Guaranteed to return something */
+      samples->values[i] = PyFloat_AsDouble (PyList_GetItem (obj, i));
+
+      /* If the object was not a float or convertible to float */
+      if (PyErr_Occurred ()) {
+        g_free (samples->values);
+        return FALSE;
+      }
+    }
+    return TRUE;
+  }
+
+  if (PyObject_GetBuffer (obj, &samples->view, PyBUF_STRIDES | PyBUF_FORMAT) < 0)
+    return FALSE;
+  samples->has_view = TRUE;
+
+  /* Skip the byte order, if it's the native one. */
+  format = samples->view.format;
+  if (format[0] == '@' || format[0] == '='
+      || format[0] == (G_BYTE_ORDER == G_LITTLE_ENDIAN ? '<' : '>'))
+    format++;
+
+  if (samples->view.ndim != 1 || (strcmp (format, "f") && strcmp (format, "d"))) {
+    PyErr_SetString (PyExc_TypeError,
+        "samples must be a list or a one-dimensional float array");
+    PyBuffer_Release (&samples->view);
+    return FALSE;
+  }
+
+  samples->is_double = format[0] == 'd';
+  samples->length = samples->view.shape[0];
+  return TRUE;
+}
+
+static inline double
+samples_get (Samples * samples, Py_ssize_t i)
+{
+  char *item;
+
+  if (samples->values)
+    return samples->values[i];
+
+  item = (char *) samples->view.buf + i * samples->view.strides[0];
+  if (samples->is_double)
+    return *(double *) item;
+  return *(float *) item;
+}
+
+static void
+samples_clear (Samples * samples)
+{
+  if (samples->has_view)
+    PyBuffer_Release (&samples->view);
+  g_free (samples->values);
+}
+
+/*
+ * Fills the area under the samples, reducing the samples falling in the
+ * same pixel column to a single value.
+ */
+static void
+fill_path (cairo_t * ctx, Samples * samples, int width, int height,
+    double scale, Reduction reduction)
+{
+  Py_ssize_t i;
   float pixelsPerSample;
   float currentPixel;
   int samplesInAccum;
   float x = 0.;
+  double sample;
   double accum;
 
-  if (!PyArg_ParseTuple (args, "O!ii", &PyList_Type, &samples, &width, &height))
-    return NULL;
-
-  length = PyList_Size (samples);
-
-  surface = cairo_image_surface_create (CAIRO_FORMAT_ARGB32, width, height);
-
-  ctx = cairo_create (surface);
-
-  cairo_set_source_rgb (ctx, 0.5, 0.7, 0.36);
-  cairo_set_line_width (ctx, 0.5);
   cairo_move_to (ctx, 0, height);
 
-  pixelsPerSample = width / (float) length;
+  pixelsPerSample = width / (float) samples->length;
   currentPixel = 0.;
   samplesInAccum = 0;
   accum = 0.;
 
-  for (i = 0; i < length; i++) {
-    /* Guaranteed to return something */
-    sampleObj = PyList_GetItem (samples, i);
-    sample = PyFloat_AsDouble (sampleObj);
-
-    /* If the object was not a float or convertible to float */
-    if (PyErr_Occurred ()) {
-      cairo_surface_finish (surface);
-      Py_DECREF (samples);
-      return NULL;
-    }
+  for (i = 0; i < samples->length; i++) {
+    sample = samples_get (samples, i) * scale;
 
     currentPixel += pixelsPerSample;
+    if (reduction == REDUCE_AVERAGE)
+      accum += sample;
+    else if (samplesInAccum == 0)
+      accum = sample;
+    else if (reduction == REDUCE_MIN)
+      accum = MIN (accum, sample);
+    else
+      accum = MAX (accum, sample);
     samplesInAccum += 1;
-    accum += sample;
+
     if (currentPixel > 1.0) {
-      accum /= samplesInAccum;
+      if (reduction == REDUCE_AVERAGE)
+        accum /= samplesInAccum;
       cairo_line_to (ctx, x, height - accum);
       accum = 0;
       currentPixel -= 1.0;
@@ -70,16 +142,76 @@ py_fill_surface (PyObject * self, PyObject * args)
     x += pixelsPerSample;
   }
 
-  Py_DECREF (samples);
   cairo_line_to (ctx, width, height);
   cairo_close_path (ctx);
   cairo_fill_preserve (ctx);
+  cairo_new_path (ctx);
+}
+
+/*
+ * This function must be called with a range of samples, and a desired
+ * width and height. The samples can be a list of floats or any
+ * one-dimensional float32 or float64 buffer, read without copying, and
+ * they are multiplied by scale.
+ * It will average samples if needed.
+ * When mins is specified, it draws instead the envelope of the samples,
+ * the highest of each pixel column, over the lowest of mins.
+ */
+static PyObject *
+py_fill_surface (PyObject * self, PyObject * args, PyObject * kwargs)
+{
+  static char *kwlist[] = { "samples", "width", "height", "scale", "mins", NULL };
+  PyObject *samples_obj;
+  PyObject *mins_obj = Py_None;
+  Samples samples;
+  Samples mins;
+  cairo_surface_t *surface;
+  cairo_t *ctx;
+  int width, height;
+  double scale = 1.;
+
+  if (!PyArg_ParseTupleAndKeywords (args, kwargs, "Oii|dO", kwlist,
+          &samples_obj, &width, &height, &scale, &mins_obj))
+    return NULL;
+
+  if (!samples_init (&samples, samples_obj))
+    return NULL;
+
+  if (mins_obj != Py_None && !samples_init (&mins, mins_obj)) {
+    samples_clear (&samples);
+    return NULL;
+  }
+
+  /* The samples are held, so other threads can run while drawing. */
+  Py_BEGIN_ALLOW_THREADS;
+
+  surface = cairo_image_surface_create (CAIRO_FORMAT_ARGB32, width, height);
+
+  ctx = cairo_create (surface);
+  cairo_set_line_width (ctx, 0.5);
+
+  cairo_set_source_rgb (ctx, 0.5, 0.7, 0.36);
+  if (mins_obj == Py_None) {
+    fill_path (ctx, &samples, width, height, scale, REDUCE_AVERAGE);
+  } else {
+    fill_path (ctx, &samples, width, height, scale, REDUCE_MAX);
+    cairo_set_source_rgb (ctx, 0.36, 0.54, 0.24);
+    fill_path (ctx, &mins, width, height, scale, REDUCE_MIN);
+  }
+
+  cairo_destroy (ctx);
+
+  Py_END_ALLOW_THREADS;
+
+  if (mins_obj != Py_None)
+    samples_clear (&mins);
+  samples_clear (&samples);
 
   return PycairoSurface_FromSurface (surface, NULL);
 }
 
 static PyMethodDef renderer_methods[] = {
-  {"fill_surface", py_fill_surface, METH_VARARGS},
+  {"fill_surface", (PyCFunction) py_fill_surface, METH_VARARGS | METH_KEYWORDS},
   {NULL, NULL}
 };
 
@@ -37,6 +37,9 @@ from pitivi.medialibrary import MediaLibraryWidget
 from pitivi.perspective import Perspective
 from pitivi.settings import GlobalSettings
 from pitivi.tabsmanager import BaseTabs
+from pitivi.timeline.previewers import AssetPreviewer
+from pitivi.timeline.previewers import Previewer
+from pitivi.timeline.previewers import PreviewGeneratorManager
 from pitivi.timeline.previewers import ThumbnailCache
 from pitivi.timeline.timeline import TimelineContainer
 from pitivi.transitions import TransitionsListWidget
@@ -97,6 +100,25 @@ class EditorPerspective(Perspective, Loggable):
         pm.connect("project-closed", self._project_manager_project_closed_cb)
         pm.connect("missing-uri", self._project_manager_missing_uri_cb)
 
+        self.__setup_previewers()
+
+    def __setup_previewers(self):
+        max_jobs = self.settings.previewers_max_jobs or \
+            PreviewGeneratorManager.default_max_jobs(self.settings.previewers_max_cpu)
+        Previewer.manager.max_jobs = max_jobs
+        AssetPreviewer.keyframes_only = self.settings.thumbnails_keyframes_only
+
+        ThumbnailCache.pixbuf_cache.max_size = \
+            self.settings.thumbnails_memory_cache_max_size * 1024 * 1024
+        self.settings.connect("thumbnails_cache_max_sizeChanged",
+                              self.__thumbnails_cache_max_size_changed_cb)
+        self.__thumbnails_cache_max_size_changed_cb(self.settings)
+
+    def __thumbnails_cache_max_size_changed_cb(self, settings):
+        max_size = settings.thumbnails_cache_max_size * 1024 * 1024
+        ThumbnailCache.store_max_size = max_size
+        ThumbnailCache.get_store().max_size = max_size
+
     def setup_ui(self):
         """Sets up the UI."""
         self.__setup_css()
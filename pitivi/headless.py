@@ -0,0 +1,42 @@
+# -*- coding: utf-8 -*-
+# Pitivi video editor
+# Copyright (c) 2024, Pitivi contributors
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this program; if not, see <http://www.gnu.org/licenses/>.
+"""The app used by the command-line tools, which have no window."""
+from pitivi.project import ProjectManager
+from pitivi.settings import GlobalSettings
+from pitivi.utils.mediacache import MediaCache
+from pitivi.utils.proxy import ProxyManager
+
+
+class HeadlessApp:
+    """The minimal app the proxies and the projects need when there is no window.
+
+    Attributes:
+        settings (GlobalSettings): The settings of the user.
+        proxy_manager (ProxyManager): The manager of the proxies.
+        project_manager (ProjectManager): The manager of the project.
+    """
+
+    def __init__(self):
+        self.settings = GlobalSettings()
+        MediaCache.configure(self.settings)
+        self.gui = None
+        self.action_log = None
+        self.proxy_manager = ProxyManager(self)
+        self.project_manager = ProjectManager(self)
+
+    def write_action(self, action, **kwargs):
+        """Ignores the action, no scenario is recorded."""
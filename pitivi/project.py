@@ -53,6 +53,7 @@ from pitivi.utils.misc import quote_uri
 from pitivi.utils.misc import scale_pixbuf
 from pitivi.utils.misc import unicode_error_dialog
 from pitivi.utils.pipeline import Pipeline
+from pitivi.utils.proxy import TargetClipsIndex
 from pitivi.utils.ui import beautify_time_delta
 from pitivi.utils.ui import SPACING
 from pitivi.utils.validate import create_monitor
@@ -147,7 +148,9 @@ class ProjectManager(GObject.Object, Loggable):
         except UnicodeEncodeError:
             unicode_error_dialog()
         else:
-            if time_diff > 0:
+            # Without a window, as when rendering from the command line,
+            # there is nobody to ask so the saved project is used.
+            if time_diff > 0 and self.app.gui:
                 use_backup = self._restore_from_backup_dialog(time_diff)
 
                 if use_backup:
@@ -646,6 +649,8 @@ class Project(Loggable, GES.Project):
         self.log("uri:%s", uri)
         self.pipeline = None
         self.ges_timeline = None
+        # The URI clips of the timeline by target asset URI.
+        self.target_clips = None
         self.uri = uri
         self.loaded = False
         self.at_least_one_asset_missing = False
@@ -1478,6 +1483,10 @@ class Project(Loggable, GES.Project):
         self._ensure_layer()
 
         if self.uri:
+            # The command-line tools have no GUI and exit when done, which
+            # would interrupt the resumed jobs again.
+            if self.app.gui:
+                self.__resume_interrupted_proxy_jobs()
             self.loading_assets = {asset for asset in self.loading_assets
                                    if self.app.proxy_manager.is_asset_queued(asset)}
 
@@ -1500,6 +1509,19 @@ class Project(Loggable, GES.Project):
 
         self._load_encoder_settings(profiles)
 
+    def __resume_interrupted_proxy_jobs(self):
+        """Resumes the transcoding jobs interrupted when quitting last time."""
+        proxy_manager = self.app.proxy_manager
+        for asset in self.list_assets(GES.UriClip):
+            if proxy_manager.is_proxy_asset(asset):
+                continue
+
+            for job in proxy_manager.jobs.pop_interrupted(asset.props.id):
+                self.info("Resuming the interrupted proxying of %s", asset.props.id)
+                self._prepare_asset_processing(asset)
+                asset.force_proxying = job["force"]
+                proxy_manager.add_job(asset, scaled=job["scaled"])
+
     def set_container_profile(self, container_profile: GstPbutils.EncodingContainerProfile) -> bool:
         """Sets the specified container profile as new profile if usable.
 
@@ -1796,6 +1818,7 @@ class Project(Loggable, GES.Project):
         if self.ges_timeline is None:
             return False
 
+        self.target_clips = TargetClipsIndex(self.ges_timeline)
         self.ges_timeline.commit = self._commit
         self.pipeline = Pipeline(self.app)
         if not self.pipeline.set_timeline(self.ges_timeline):
@@ -1893,6 +1916,7 @@ class Project(Loggable, GES.Project):
 
         self.pipeline = None
         self.ges_timeline = None
+        self.target_clips = None
 
         return res
 
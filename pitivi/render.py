@@ -32,15 +32,21 @@ from gi.repository import Gtk
 
 from pitivi import configure
 from pitivi.check import MISSING_SOFT_DEPS
+from pitivi.dialogs.prefs import PreferencesDialog
 from pitivi.dialogs.projectsettings import ProjectSettingsDialog
+from pitivi.settings import GlobalSettings
 from pitivi.utils.loggable import Loggable
 from pitivi.utils.misc import cmp
 from pitivi.utils.misc import is_pathname_valid
 from pitivi.utils.misc import path_from_uri
 from pitivi.utils.misc import show_user_manual
+from pitivi.utils.parallelrender import compute_cut_points
+from pitivi.utils.parallelrender import ParallelRender
+from pitivi.utils.rendertelemetry import RenderTelemetry
 from pitivi.utils.ripple_update_group import RippleUpdateGroup
 from pitivi.utils.ui import AUDIO_CHANNELS
 from pitivi.utils.ui import beautify_eta
+from pitivi.utils.ui import beautify_length
 from pitivi.utils.ui import create_audio_rates_model
 from pitivi.utils.ui import create_frame_rates_model
 from pitivi.utils.ui import filter_unsupported_media_files
@@ -53,6 +59,33 @@ from pitivi.utils.widgets import GstElementSettingsDialog
 # a GstPbutils.EncodingProfile used as a Pitivi render preset.
 PITIVI_ENCODING_TARGET_CATEGORY = "user-defined"
 
+# The number of chunks rendered by each process when rendering in parallel,
+# so the processes rendering the easy chunks don't wait for the others.
+CHUNKS_PER_PROCESS = 2
+
+GlobalSettings.add_config_section("render")
+GlobalSettings.add_config_option("render_processes",
+                                 section="render",
+                                 key="processes",
+                                 default=0,
+                                 notify=True)
+PreferencesDialog.add_numeric_preference("render_processes",
+                                         section="other",
+                                         label=_("Processes rendering in parallel"),
+                                         description=_("The number of processes used when rendering in parallel. Use 0 to pick it depending on the number of CPU cores."),
+                                         lower=0)
+
+GlobalSettings.add_config_option("render_report",
+                                 section="render",
+                                 key="report",
+                                 environment="PITIVI_RENDER_REPORT",
+                                 default=False,
+                                 notify=True)
+PreferencesDialog.add_toggle_preference("render_report",
+                                        section="other",
+                                        label=_("Write a performance report when rendering"),
+                                        description=_("Measure the encoding speed, the time spent by each decoder, effect and encoder, and the stalls, and save them in a JSON file next to the rendered file. Measuring slows down the render."))
+
 
 def set_icon_and_title(icon, title, preset_item, icon_size=Gtk.IconSize.DND):
     """Adds icon for the respective preset.
@@ -601,6 +634,200 @@ def extension_for_muxer(muxer_name):
     return exts.get(muxer_name)
 
 
+def _clip_can_pass_through(ges_clip, track_type, format_caps, project):
+    """Checks whether a stream of a clip can be remuxed without re-encoding.
+
+    Args:
+        ges_clip (GES.Clip): The clip.
+        track_type (GES.TrackType): The type of the stream.
+        format_caps (Gst.Caps): The format of the encoded stream.
+        project (Project): The rendered project.
+    """
+    if not isinstance(ges_clip, GES.UriClip) or ges_clip.is_image() or \
+            ges_clip.get_top_effects():
+        return False
+
+    if track_type == GES.TrackType.VIDEO:
+        source = ges_clip.find_track_element(None, GES.VideoUriSource)
+        streams = ges_clip.get_asset().get_info().get_video_streams()
+    else:
+        source = ges_clip.find_track_element(None, GES.AudioUriSource)
+        streams = ges_clip.get_asset().get_info().get_audio_streams()
+    if not source or not streams or source.get_all_control_bindings():
+        return False
+
+    stream = streams[0]
+    if track_type == GES.TrackType.VIDEO:
+        width, height = project.get_video_width_and_height(render=True)
+        framerate = Gst.Fraction(stream.get_framerate_num(), stream.get_framerate_denom())
+        if (stream.get_width(), stream.get_height()) != (width, height) or \
+                framerate != project.videorate:
+            return False
+
+        transformation = [source.get_child_property(name)[1]
+                          for name in ("posx", "posy", "width", "height", "alpha")]
+        if transformation != [0, 0, width, height, 1.0]:
+            return False
+    else:
+        if stream.get_sample_rate() != project.audiorate or \
+                stream.get_channels() != project.audiochannels:
+            return False
+
+        if source.get_child_property("volume")[1] != 1.0:
+            return False
+
+    caps = stream.get_caps()
+    return bool(caps) and caps.can_intersect(format_caps)
+
+
+def find_passthrough_segments(project):
+    """Finds the segments of the timeline which can be rendered by remuxing.
+
+    A segment can be passed through when, in each rendered track containing
+    clips, a single clip is playing, without effects, transformations or transitions, and
+    its stream has the format and the settings of the render profile.
+
+    Args:
+        project (Project): The project to be rendered.
+
+    Returns:
+        List[Tuple[int, int, bool]]: The contiguous (start, end, passthrough)
+        segments covering the timeline.
+    """
+    formats = []
+    for profile in project.container_profile.get_profiles():
+        if not profile.is_enabled():
+            continue
+        if isinstance(profile, GstPbutils.EncodingVideoProfile):
+            formats.append((GES.TrackType.VIDEO, GES.VideoSource, profile.get_format()))
+        elif isinstance(profile, GstPbutils.EncodingAudioProfile):
+            formats.append((GES.TrackType.AUDIO, GES.AudioSource, profile.get_format()))
+
+    duration = project.ges_timeline.props.duration
+    if not formats or not duration:
+        return []
+
+    # The (time, track index, active delta, passthrough delta) events.
+    events = []
+    for ges_layer in project.ges_timeline.get_layers():
+        for ges_clip in ges_layer.get_clips():
+            start = ges_clip.props.start
+            end = start + ges_clip.props.duration
+            for index, (track_type, source_type, format_caps) in enumerate(formats):
+                if not ges_clip.find_track_element(None, source_type):
+                    continue
+                passthrough = int(_clip_can_pass_through(ges_clip, track_type, format_caps, project))
+                events.append((start, index, 1, passthrough))
+                events.append((end, index, -1, -passthrough))
+    events.sort()
+    # The tracks without clips are ignored.
+    used_indexes = {event[1] for event in events}
+
+    segments = []
+    # The number of active and passthrough clips in each track.
+    counts = [[0, 0] for unused_format in formats]
+    position = 0
+    for time_, index, active, passthrough in events + [(duration, 0, 0, 0)]:
+        if time_ > position:
+            segment_passthrough = bool(used_indexes) and \
+                all(counts[used_index] == [1, 1] for used_index in used_indexes)
+            if segments and segments[-1][2] == segment_passthrough:
+                segments[-1] = (segments[-1][0], time_, segment_passthrough)
+            else:
+                segments.append((position, time_, segment_passthrough))
+            position = time_
+        counts[index][0] += active
+        counts[index][1] += passthrough
+
+    return segments
+
+
+class ProxyRendering(IntEnum):
+    """How the proxies are used when rendering."""
+
+    # Render from the proxies only for the formats not well supported.
+    AUTOMATIC = 0
+    # Render from the HQ proxies whenever available.
+    ALWAYS = 1
+    # Render from the original media files.
+    NEVER = 2
+
+
+def get_proxy_replacement(clip, proxy_rendering, proxy_manager, project):
+    """Gets the asset to be rendered instead of the proxy used by a clip.
+
+    Args:
+        clip (GES.Clip): The clip possibly using a proxy.
+        proxy_rendering (ProxyRendering): How the proxies are used.
+        proxy_manager (ProxyManager): The proxy manager of the app.
+        project (Project): The project being rendered.
+
+    Returns:
+        Optional[GES.Asset]: The asset to be used, or None to keep the
+        current one.
+    """
+    if not isinstance(clip, GES.UriClip):
+        return None
+
+    asset = clip.get_asset()
+    asset_target = asset.get_proxy_target()
+    if not asset_target:
+        # The asset is not a proxy.
+        return None
+
+    # Replace all proxies
+    if proxy_rendering == ProxyRendering.NEVER:
+        return asset_target
+
+    # Use HQ Proxy (or equivalent) only for unsupported assets
+    if proxy_rendering == ProxyRendering.AUTOMATIC:
+        if proxy_manager.is_asset_format_well_supported(asset_target):
+            return asset_target
+
+    # Use HQ Proxy (or equivalent) whenever available
+    if proxy_manager.is_hq_proxy(asset):
+        return None
+
+    if proxy_manager.is_scaled_proxy(asset):
+        width, height = project.get_video_width_and_height(render=True)
+        stream = asset.get_info().get_video_streams()[0]
+        asset_res = [stream.get_width(), stream.get_height()]
+
+        if asset_res[0] == width and asset_res[1] == height:
+            # Check whether the scaled proxy size matches the render size
+            # exactly. If the size is same, render from the scaled proxy
+            # to avoid double scaling.
+            return None
+
+        hq_proxy = GES.Asset.request(GES.UriClip,
+                                     proxy_manager.get_proxy_uri(asset_target))
+        return hq_proxy
+    return None
+
+
+def replace_proxies(project, proxy_rendering, proxy_manager):
+    """Sets on the clips the assets to be rendered instead of the proxies.
+
+    Returns:
+        dict: The replaced proxy assets by clip, for reverting.
+    """
+    replaced_assets = {}
+    # The replacement of each asset, computed once for all its clips.
+    replacements = {}
+    target_clips = project.target_clips
+    for target_uri in list(target_clips.targets()):
+        for clip in target_clips.clips_of(target_uri):
+            clip_asset = clip.get_asset()
+            if clip_asset not in replacements:
+                replacements[clip_asset] = get_proxy_replacement(
+                    clip, proxy_rendering, proxy_manager, project)
+            asset = replacements[clip_asset]
+            if asset:
+                replaced_assets[clip] = clip_asset
+                clip.set_asset(asset)
+    return replaced_assets
+
+
 class Quality(IntEnum):
     LOW = 0
     MEDIUM = 1
@@ -830,6 +1057,12 @@ class RenderDialog(Loggable):
         self.preferred_vencoder = self.project.vencoder
         self.preferred_aencoder = self.project.aencoder
         self.__replaced_assets = {}
+        # The duration of the timeline remuxed without re-encoding.
+        self.__passthrough_duration = 0
+        # The processes rendering the chunks, when rendering in parallel.
+        self.__parallel_render = None
+        # The measurements of the pipeline, when writing a report.
+        self.__telemetry = None
 
         self._display_render_settings()
 
@@ -976,6 +1209,9 @@ class RenderDialog(Loggable):
         self.__never_use_proxies = builder.get_object("never_use_proxies")
         self.__never_use_proxies.props.group = self.__automatically_use_proxies
 
+        self.smart_render_checkbutton = builder.get_object("smart_render_checkbutton")
+        self.parallel_render_checkbutton = builder.get_object("parallel_render_checkbutton")
+
         self.presets_manager.preset_menubutton_setup(self.preset_menubutton)
 
         self.window.set_icon_name("system-run-symbolic")
@@ -1161,7 +1397,10 @@ class RenderDialog(Loggable):
         if not self.current_position:
             return None
 
-        current_filesize = os.stat(path_from_uri(self.outfile)).st_size
+        if self.__parallel_render:
+            current_filesize = self.__parallel_render.rendered_size()
+        else:
+            current_filesize = os.stat(path_from_uri(self.outfile)).st_size
         length = self.project.ges_timeline.props.duration
         estimated_size = current_filesize * length / self.current_position
         # Now let's make it human-readable (instead of octets).
@@ -1337,12 +1576,18 @@ class RenderDialog(Loggable):
     def start_action(self):
         """Starts the render process."""
         self._pipeline.set_state(Gst.State.NULL)
-        self._pipeline.set_mode(GES.PipelineFlags.RENDER)
+        if self.__passthrough_duration:
+            self._pipeline.set_mode(GES.PipelineFlags.SMART_RENDER)
+        else:
+            self._pipeline.set_mode(GES.PipelineFlags.RENDER)
         encodebin = self._pipeline.get_by_name("internal-encodebin")
         self._gst_signal_handlers_ids[encodebin] = encodebin.connect(
             "element-added", self.__element_added_cb)
         for element in encodebin.iterate_recurse():
             self.__set_properties(element)
+        if self.app.settings.render_report:
+            self.__telemetry = RenderTelemetry()
+            self.__telemetry.attach(self._pipeline)
         self._pipeline.set_state(Gst.State.PLAYING)
         self._is_rendering = True
         self._time_started = time.time()
@@ -1354,6 +1599,15 @@ class RenderDialog(Loggable):
 
     def _shut_down(self):
         """Shuts down the pipeline and disconnects from its signals."""
+        if self.__parallel_render:
+            self.__parallel_render.disconnect_by_func(self._update_position_cb)
+            self.__parallel_render.disconnect_by_func(self.__parallel_render_done_cb)
+            self.__parallel_render.disconnect_by_func(self.__parallel_render_error_cb)
+            self.__parallel_render.cancel()
+            self.__parallel_render = None
+        if self.__telemetry:
+            self.__telemetry.detach()
+            self.__telemetry = None
         self._is_rendering = False
         self._rendering_is_paused = False
         self._time_spent_paused = 0
@@ -1413,54 +1667,18 @@ class RenderDialog(Loggable):
                 if effect_name == "frei0r-filter-3-point-color-balance":
                     effect.set_child_property("split-preview", False)
 
-    def _asset_replacement(self, clip):
-        if not isinstance(clip, GES.UriClip):
-            return None
-
-        asset = clip.get_asset()
-        asset_target = asset.get_proxy_target()
-        if not asset_target:
-            # The asset is not a proxy.
-            return None
-
-        # Replace all proxies
+    def __proxy_rendering(self):
         if self.__never_use_proxies.get_active():
-            return asset_target
-
-        # Use HQ Proxy (or equivalent) only for unsupported assets
-        if self.__automatically_use_proxies.get_active():
-            if self.app.proxy_manager.is_asset_format_well_supported(asset_target):
-                return asset_target
-
-            proxy_unsupported = True
-
-        # Use HQ Proxy (or equivalent) whenever available
-        if self.__always_use_proxies.get_active() or proxy_unsupported:
-            if self.app.proxy_manager.is_hq_proxy(asset):
-                return None
-
-            if self.app.proxy_manager.is_scaled_proxy(asset):
-                width, height = self.project.get_video_width_and_height(render=True)
-                stream = asset.get_info().get_video_streams()[0]
-                asset_res = [stream.get_width(), stream.get_height()]
+            return ProxyRendering.NEVER
 
-                if asset_res[0] == width and asset_res[1] == height:
-                    # Check whether the scaled proxy size matches the render size
-                    # exactly. If the size is same, render from the scaled proxy
-                    # to avoid double scaling.
-                    return None
+        if self.__always_use_proxies.get_active():
+            return ProxyRendering.ALWAYS
 
-                hq_proxy = GES.Asset.request(GES.UriClip,
-                                             self.app.proxy_manager.get_proxy_uri(asset_target))
-                return hq_proxy
-        return None
+        return ProxyRendering.AUTOMATIC
 
     def __replace_proxies(self):
-        for clip in self.project.ges_timeline.ui.clips():
-            asset = self._asset_replacement(clip)
-            if asset:
-                self.__replaced_assets[clip] = clip.get_asset()
-                clip.set_asset(asset)
+        self.__replaced_assets = replace_proxies(self.project, self.__proxy_rendering(),
+                                                 self.app.proxy_manager)
 
     def _use_proxy_assets(self):
         for clip, asset in self.__replaced_assets.items():
@@ -1510,10 +1728,75 @@ class RenderDialog(Loggable):
             self.app.settings.lastExportFolder = chooser.get_current_folder()
             self.fileentry.set_text(os.path.join(chooser.get_filename()))
 
+    def __find_passthrough_duration(self):
+        if not self.smart_render_checkbutton.get_active():
+            return 0
+
+        segments = find_passthrough_segments(self.project)
+        for start, end, passthrough in segments:
+            self.debug("Segment %s - %s %s", Gst.TIME_ARGS(start), Gst.TIME_ARGS(end),
+                       "passed through" if passthrough else "re-encoded")
+        passthrough_duration = sum(end - start for start, end, passthrough in segments
+                                   if passthrough)
+        self.info("Smart rendering, passing through %s of %s",
+                  Gst.TIME_ARGS(passthrough_duration),
+                  Gst.TIME_ARGS(self.project.ges_timeline.props.duration))
+        return passthrough_duration
+
+    def __render_processes(self):
+        processes = self.app.settings.render_processes
+        if processes <= 0:
+            processes = max(2, (os.cpu_count() or 1) // 4)
+        return processes
+
+    def __find_cut_points(self):
+        if not self.parallel_render_checkbutton.get_active():
+            return None
+
+        if not self.video_output_checkbutton.get_active():
+            # The audio is rendered in one pass anyway, see ParallelRender.
+            self.info("Not rendering in parallel the audio only")
+            return None
+
+        cut_points = compute_cut_points(self.project.ges_timeline,
+                                        self.__render_processes() * CHUNKS_PER_PROCESS,
+                                        self.project.videorate)
+        if len(cut_points) < 3:
+            self.info("The timeline is too short for rendering in parallel")
+            return None
+
+        return cut_points
+
+    def __start_parallel_render(self, cut_points):
+        """Renders the chunks of the timeline in parallel processes."""
+        # The chunks are encoded from scratch, as the cuts are not aligned
+        # on the keyframes of the streams which could be passed through.
+        self.__passthrough_duration = 0
+        self.__parallel_render = ParallelRender(
+            self.outfile, self.project.container_profile, cut_points, self.__render_processes())
+        self.__parallel_render.connect("position", self._update_position_cb)
+        self.__parallel_render.connect("done", self.__parallel_render_done_cb)
+        self.__parallel_render.connect("error", self.__parallel_render_error_cb)
+        # The processes load the project saved with the rendering settings.
+        self.project.add_encoding_profile(self.project.container_profile)
+        try:
+            self.project.save(self.project.ges_timeline,
+                              self.__parallel_render.project_uri, None, overwrite=True)
+        except GLib.Error as e:
+            self.__parallel_render_error_cb(self.__parallel_render, e.message)
+            return
+
+        self.__parallel_render.start()
+        # The processes cannot be paused.
+        self.progress.play_pause_button.hide()
+        self._is_rendering = True
+        self._time_started = time.time()
+
     def _render_button_clicked_cb(self, unused_button):
         """Starts the rendering process."""
         self.__replace_proxies()
         self.__unset_effect_preview_props()
+        self.__passthrough_duration = self.__find_passthrough_duration()
         filename = os.path.realpath(self.fileentry.get_text())
         self.outfile = Gst.filename_to_uri(filename)
         self.app.settings.lastExportFolder = os.path.dirname(filename)
@@ -1523,16 +1806,20 @@ class RenderDialog(Loggable):
 
         self.app.gui.editor.timeline_ui.timeline.set_best_zoom_ratio(allow_zoom_in=True)
         self.project.set_rendering(True)
-        self._pipeline.set_render_settings(
-            self.outfile, self.project.container_profile)
-        self.start_action()
         self.progress.window.show()
         self.progress.connect("cancel", self._cancel_render)
         self.progress.connect("pause", self._pause_render)
-        bus = self._pipeline.get_bus()
-        bus.add_signal_watch()
-        self._gst_signal_handlers_ids[bus] = bus.connect("message", self._bus_message_cb)
-        self.project.pipeline.connect("position", self._update_position_cb)
+        cut_points = self.__find_cut_points()
+        if cut_points:
+            self.__start_parallel_render(cut_points)
+        else:
+            self._pipeline.set_render_settings(
+                self.outfile, self.project.container_profile)
+            self.start_action()
+            bus = self._pipeline.get_bus()
+            bus.add_signal_watch()
+            self._gst_signal_handlers_ids[bus] = bus.connect("message", self._bus_message_cb)
+            self.project.pipeline.connect("position", self._update_position_cb)
         # Force writing the config now, or the path will be reset
         # if the user opens the rendering dialog again
         self.app.settings.store_settings()
@@ -1590,22 +1877,9 @@ class RenderDialog(Loggable):
     def _bus_message_cb(self, unused_bus, message):
         if message.type == Gst.MessageType.EOS:  # Render complete
             self.debug("got EOS message, render complete")
-            self._shut_down()
-            self.progress.progressbar.set_fraction(1.0)
-            self.progress.progressbar.set_text(_("Render complete"))
-            self.progress.window.set_title(_("Render complete"))
-            self.progress.set_filesize_estimate(None)
-            if not self.progress.window.is_active():
-                notification = _(
-                    '"%s" has finished rendering.') % self.fileentry.get_text()
-                self.notification = self.app.system.desktop_message(
-                    _("Render complete"), notification, "pitivi")
-            self._maybe_play_finished_sound()
-            self.progress.play_rendered_file_button.show()
-            self.progress.close_button.show()
-            self.progress.show_in_file_manager_button.show()
-            self.progress.cancel_button.hide()
-            self.progress.play_pause_button.hide()
+            if self.__telemetry:
+                self.__write_report()
+            self.__render_complete()
 
         elif message.type == Gst.MessageType.ERROR:
             # Errors in a GStreamer pipeline are fatal. If we encounter one,
@@ -1626,6 +1900,50 @@ class RenderDialog(Loggable):
                     else:
                         self.app.simple_uninhibit(RenderDialog.INHIBIT_REASON)
 
+    def __write_report(self):
+        self.__telemetry.detach()
+        try:
+            self.__telemetry.write_report(
+                self.outfile,
+                duration=self.project.ges_timeline.props.duration,
+                muxer=self.project.muxer,
+                video_encoder=self.project.vencoder,
+                audio_encoder=self.project.aencoder)
+        except OSError as e:
+            self.warning("Failed writing the render report: %s", e)
+
+    def __render_complete(self):
+        self._shut_down()
+        self.progress.progressbar.set_fraction(1.0)
+        if self.__passthrough_duration:
+            self.progress.progressbar.set_text(
+                _("Render complete, an estimated %s of %s passed through without re-encoding") %
+                (beautify_length(self.__passthrough_duration),
+                 beautify_length(self.project.ges_timeline.props.duration)))
+        else:
+            self.progress.progressbar.set_text(_("Render complete"))
+        self.progress.window.set_title(_("Render complete"))
+        self.progress.set_filesize_estimate(None)
+        if not self.progress.window.is_active():
+            notification = _(
+                '"%s" has finished rendering.') % self.fileentry.get_text()
+            self.notification = self.app.system.desktop_message(
+                _("Render complete"), notification, "pitivi")
+        self._maybe_play_finished_sound()
+        self.progress.play_rendered_file_button.show()
+        self.progress.close_button.show()
+        self.progress.show_in_file_manager_button.show()
+        self.progress.cancel_button.hide()
+        self.progress.play_pause_button.hide()
+
+    def __parallel_render_done_cb(self, unused_parallel_render):
+        self.debug("The chunks have been concatenated, render complete")
+        self.__render_complete()
+
+    def __parallel_render_error_cb(self, unused_parallel_render, message):
+        self._cancel_render()
+        self._show_render_error_dialog(message, None)
+
     def _update_position_cb(self, unused_pipeline, position):
         """Updates the progress bar and triggers the update of the file size.
 
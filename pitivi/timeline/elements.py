@@ -15,11 +15,12 @@
 #
 # You should have received a copy of the GNU Lesser General Public
 # License along with this program; if not, see <http://www.gnu.org/licenses/>.
+import bisect
+import math
 import os
 from gettext import gettext as _
 from typing import Optional
 
-import numpy
 from gi.repository import Gdk
 from gi.repository import GdkPixbuf
 from gi.repository import GES
@@ -27,12 +28,6 @@ from gi.repository import GObject
 from gi.repository import Gst
 from gi.repository import GstController
 from gi.repository import Gtk
-from matplotlib.axes import Axes
-from matplotlib.backend_bases import MouseButton
-from matplotlib.backends.backend_gtk3cairo import FigureCanvasGTK3Cairo
-from matplotlib.collections import PathCollection
-from matplotlib.figure import Figure
-from matplotlib.lines import Line2D
 
 from pitivi.configure import get_pixmap_dir
 from pitivi.effects import ALLOWED_ONLY_ONCE_EFFECTS
@@ -62,10 +57,23 @@ from pitivi.utils.ui import set_state_flags_recurse
 
 KEYFRAME_LINE_HEIGHT = 2
 KEYFRAME_LINE_ALPHA = 0.5
-KEYFRAME_LINE_COLOR = "#EDD400"  # "Tango" medium yellow
-KEYFRAME_NODE_COLOR = "#F57900"  # "Tango" medium orange
-SELECTED_KEYFRAME_NODE_COLOR = "#204A87"  # "Tango" dark sky blue
-HOVERED_KEYFRAME_NODE_COLOR = "#3465A4"  # "Tango" medium sky blue
+# The distance in pixels at which the line can be clicked.
+KEYFRAME_LINE_PICK_RADIUS = 5
+# The half diagonal of the keyframe diamonds, in pixels.
+KEYFRAME_NODE_RADIUS = 5
+HIGHLIGHTED_KEYFRAME_NODE_RADIUS = 6
+
+
+def parse_color(spec):
+    color = Gdk.RGBA()
+    color.parse(spec)
+    return color
+
+
+KEYFRAME_LINE_COLOR = parse_color("#EDD400")  # "Tango" medium yellow
+KEYFRAME_NODE_COLOR = parse_color("#F57900")  # "Tango" medium orange
+SELECTED_KEYFRAME_NODE_COLOR = parse_color("#204A87")  # "Tango" dark sky blue
+HOVERED_KEYFRAME_NODE_COLOR = parse_color("#3465A4")  # "Tango" medium sky blue
 
 
 def get_pspec(element_factory_name, propname):
@@ -76,7 +84,14 @@ def get_pspec(element_factory_name, propname):
     return [prop for prop in element.list_properties() if prop.name == propname][0]
 
 
-class KeyframeCurve(FigureCanvasGTK3Cairo, Loggable):
+class KeyframeCurve(Gtk.DrawingArea, Loggable):
+    """Widget for displaying and editing the keyframes of a property.
+
+    The keyframes are drawn with cairo straight from the values of the
+    control source. The edge keyframes are at the edges of the widget and
+    the values range between the bottom and the top.
+    """
+
     YLIM_OVERRIDES = {}
 
     __YLIM_OVERRIDES_VALUES = [("volume", "volume", (0.0, 0.2))]
@@ -94,17 +109,14 @@ class KeyframeCurve(FigureCanvasGTK3Cairo, Loggable):
     }
 
     def __init__(self, timeline, binding, ges_elem):
-        figure = Figure()
-        FigureCanvasGTK3Cairo.__init__(self, figure)
+        Gtk.DrawingArea.__init__(self)
         Loggable.__init__(self)
 
-        # Remove the "matplotlib-canvas" class which forces a white background.
-        # https://github.com/matplotlib/matplotlib/commit/3c832377fb4c4b32fcbdbc60fdfedb57296bc8c0
-        style_ctx = self.get_style_context()
-        for css_class in style_ctx.list_classes():
-            style_ctx.remove_class(css_class)
-
-        style_ctx.add_class("KeyframeCurve")
+        self.get_style_context().add_class("KeyframeCurve")
+        self.add_events(Gdk.EventMask.BUTTON_PRESS_MASK |
+                        Gdk.EventMask.BUTTON_RELEASE_MASK |
+                        Gdk.EventMask.POINTER_MOTION_MASK |
+                        Gdk.EventMask.LEAVE_NOTIFY_MASK)
 
         self._ges_elem = ges_elem
         self._timeline = timeline
@@ -121,35 +133,6 @@ class KeyframeCurve(FigureCanvasGTK3Cairo, Loggable):
         # and values.
         self._line_xs = []
         self._line_ys = []
-
-        transparent = (0, 0, 0, 0)
-        self._ax: Axes = figure.add_axes([0, 0, 1, 1], facecolor=transparent)
-        # Clear the Axes object.
-        self._ax.cla()
-        self._ax.grid(False)
-        self._ax.tick_params(axis='both',
-                             which='both',
-                             bottom=False,
-                             top=False,
-                             right=False,
-                             left=False)
-
-        # This seems to also be necessary for transparency ..
-        figure.patch.set_visible(False)
-
-        # The PathCollection object holding the keyframes dots.
-        sizes = [50]
-        self._keyframes: PathCollection = self._ax.scatter([], [], marker='D', s=sizes,
-                                                           c=KEYFRAME_NODE_COLOR, zorder=2)
-
-        # matplotlib weirdness, simply here to avoid a warning ..
-        self._keyframes.set_picker(True)
-
-        # The Line2D object holding the lines between keyframes.
-        self.__line: Line2D = self._ax.plot([], [],
-                                            alpha=KEYFRAME_LINE_ALPHA,
-                                            c=KEYFRAME_LINE_COLOR,
-                                            linewidth=KEYFRAME_LINE_HEIGHT, zorder=1)[0]
         self._update_plots()
 
         # Drag and drop logic
@@ -172,18 +155,14 @@ class KeyframeCurve(FigureCanvasGTK3Cairo, Loggable):
 
         self.__hovered = False
 
-        self.connect("motion-notify-event", self.__motion_notify_event_cb)
+        self.connect("button-press-event", self._button_press_event_cb)
+        self.connect("motion-notify-event", self._motion_notify_event_cb)
+        self.connect("button-release-event", self._button_release_event_cb)
         self.connect("event", self._event_cb)
-        self.connect("notify::height-request", self.__height_request_cb)
-        self.connect("button_release_event", self._button_release_event_cb)
-
-        self.mpl_connect('button_press_event', self._mpl_button_press_event_cb)
-        self.mpl_connect('button_release_event', self._mpl_button_release_event_cb)
-        self.mpl_connect('motion_notify_event', self._mpl_motion_event_cb)
 
     def release(self):
-        disconnect_all_by_func(self, self.__height_request_cb)
-        disconnect_all_by_func(self, self.__motion_notify_event_cb)
+        disconnect_all_by_func(self, self._button_press_event_cb)
+        disconnect_all_by_func(self, self._motion_notify_event_cb)
         disconnect_all_by_func(self, self._button_release_event_cb)
         disconnect_all_by_func(self, self._control_source_changed_cb)
 
@@ -204,35 +183,142 @@ class KeyframeCurve(FigureCanvasGTK3Cairo, Loggable):
             self._line_xs.append(value.timestamp)
             self._line_ys.append(value.value)
 
-        self._populate_lines()
+        self.queue_draw()
 
-    def _populate_lines(self):
-        self._ax.set_xlim(self._line_xs[0], self._line_xs[-1])
-        self.__compute_ylim()
+    def __get_size(self):
+        # The parent Gtk.Layout allocates the requested size.
+        return max(1, self.props.width_request), max(1, self.props.height_request)
 
-        arr = numpy.array((self._line_xs, self._line_ys)).transpose()
-        self._keyframes.set_offsets(arr)
-        self.__line.set_xdata(self._line_xs)
-        self.__line.set_ydata(self._line_ys)
-        self.queue_draw()
+    def __contains_point(self, x, y):
+        width, height = self.__get_size()
+        return 0 <= x <= width and 0 <= y <= height
 
-    def __compute_ylim(self):
-        height = self.props.height_request
-        if height <= 0:
-            return
+    def _get_point(self, timestamp, value):
+        """Gets the position of a keyframe in the widget.
+
+        Args:
+            timestamp (int): The timestamp of the keyframe.
+            value (float): The value of the keyframe.
+
+        Returns:
+            (float, float): The x and y coordinates.
+        """
+        width, height = self.__get_size()
+        start, end = self._line_xs[0], self._line_xs[-1]
+        x = (timestamp - start) * width / max(1, end - start)
+        # Leave room for the line at the top and at the bottom.
+        span = max(1, height - 2 * KEYFRAME_LINE_HEIGHT)
+        y = KEYFRAME_LINE_HEIGHT + \
+            (self.__ylim_max - value) * span / (self.__ylim_max - self.__ylim_min)
+        return x, y
+
+    def _get_timestamp_value(self, x, y):
+        """Gets the timestamp and the value at a position in the widget.
+
+        Args:
+            x (float): The x coordinate.
+            y (float): The y coordinate.
+
+        Returns:
+            (int, float): The timestamp and the value, not clamped.
+        """
+        width, height = self.__get_size()
+        start, end = self._line_xs[0], self._line_xs[-1]
+        timestamp = start + x * max(1, end - start) / width
+        span = max(1, height - 2 * KEYFRAME_LINE_HEIGHT)
+        value = self.__ylim_max - \
+            (y - KEYFRAME_LINE_HEIGHT) * (self.__ylim_max - self.__ylim_min) / span
+        return int(round(timestamp)), value
+
+    def __get_keyframes_range(self, x1, x2):
+        """Gets the range of the keyframes which can be seen between x1 and x2.
+
+        The keyframes right outside are included, for their lines.
+        """
+        margin = KEYFRAME_NODE_RADIUS + KEYFRAME_LINE_HEIGHT
+        timestamp1, unused_value = self._get_timestamp_value(x1 - margin, 0)
+        timestamp2, unused_value = self._get_timestamp_value(x2 + margin, 0)
+        start = max(0, bisect.bisect_left(self._line_xs, timestamp1) - 1)
+        end = min(len(self._line_xs), bisect.bisect_right(self._line_xs, timestamp2) + 1)
+        return start, end
+
+    def _get_keyframe_at(self, x, y):
+        """Gets the index of the keyframe at the specified position, if any."""
+        if len(self._line_xs) < 2:
+            return None
+
+        start, end = self.__get_keyframes_range(x, x)
+        for index in range(start, end):
+            keyframe_x, keyframe_y = self._get_point(self._line_xs[index], self._line_ys[index])
+            if abs(keyframe_x - x) + abs(keyframe_y - y) <= KEYFRAME_NODE_RADIUS:
+                return index
+        return None
+
+    def _get_line_at(self, x, y):
+        """Gets the index of the right keyframe of the line at the position.
+
+        Returns:
+            Optional[int]: The index of the keyframe ending the line, if any.
+        """
+        if len(self._line_xs) < 2:
+            return None
+
+        start, end = self.__get_keyframes_range(x, x)
+        x2, y2 = self._get_point(self._line_xs[start], self._line_ys[start])
+        for index in range(start + 1, end):
+            x1, y1 = x2, y2
+            x2, y2 = self._get_point(self._line_xs[index], self._line_ys[index])
+            if self.__distance_to_segment(x, y, x1, y1, x2, y2) <= KEYFRAME_LINE_PICK_RADIUS:
+                return index
+        return None
 
-        ylim_min = -(KEYFRAME_LINE_HEIGHT / height)
-        ylim_max = (self.__ylim_max * height) / (height - KEYFRAME_LINE_HEIGHT)
-        self._ax.set_ylim(ylim_min, ylim_max)
+    @staticmethod
+    def __distance_to_segment(x, y, x1, y1, x2, y2):
+        dx = x2 - x1
+        dy = y2 - y1
+        length2 = dx * dx + dy * dy
+        if length2:
+            ratio = max(0, min(1, ((x - x1) * dx + (y - y1) * dy) / length2))
+            x1 += ratio * dx
+            y1 += ratio * dy
+        return math.hypot(x - x1, y - y1)
 
-    def __height_request_cb(self, unused_self, unused_pspec):
-        self.__compute_ylim()
+    def do_draw(self, cr):
+        if len(self._line_xs) < 2:
+            return
 
-    def __maybe_create_keyframe(self, event):
-        line_contains = self.__line.contains(event)[0]
-        keyframe_existed = self._keyframes.contains(event)[0]
+        x1, unused_y1, x2, unused_y2 = cr.clip_extents()
+        start, end = self.__get_keyframes_range(x1, x2)
+        points = [self._get_point(self._line_xs[index], self._line_ys[index])
+                  for index in range(start, end)]
+
+        cr.set_line_width(KEYFRAME_LINE_HEIGHT)
+        cr.set_source_rgba(KEYFRAME_LINE_COLOR.red, KEYFRAME_LINE_COLOR.green,
+                           KEYFRAME_LINE_COLOR.blue, KEYFRAME_LINE_ALPHA)
+        cr.move_to(*points[0])
+        for point in points[1:]:
+            cr.line_to(*point)
+        cr.stroke()
+
+        self._draw_keyframes(cr, points, KEYFRAME_NODE_RADIUS, KEYFRAME_NODE_COLOR)
+
+    @staticmethod
+    def _draw_keyframes(cr, points, radius, color):
+        """Draws the keyframes as diamonds centered on the specified points."""
+        for x, y in points:
+            cr.move_to(x, y - radius)
+            cr.line_to(x + radius, y)
+            cr.line_to(x, y + radius)
+            cr.line_to(x - radius, y)
+            cr.close_path()
+        cr.set_source_rgb(color.red, color.green, color.blue)
+        cr.fill()
+
+    def __maybe_create_keyframe(self, x, y, timestamp):
+        line_contains = self._get_line_at(x, y) is not None
+        keyframe_existed = self._get_keyframe_at(x, y) is not None
         if line_contains and not keyframe_existed:
-            self._create_keyframe(event.xdata)
+            self._create_keyframe(timestamp)
 
     def _create_keyframe(self, timestamp):
         res, value = self.__source.control_source_get_value(timestamp)
@@ -275,37 +361,28 @@ class KeyframeCurve(FigureCanvasGTK3Cairo, Loggable):
         self._update_plots()
         self._timeline.ges_timeline.get_parent().commit_timeline()
 
-    def __motion_notify_event_cb(self, unused_widget, unused_event):
-        # We need to do this here, because Matplotlib's callbacks can't stop
-        # signal propagation.
-        if self.handling_motion:
-            return True
-        return False
-
     def _event_cb(self, unused_element, event):
         if event.type == Gdk.EventType.LEAVE_NOTIFY:
             cursor = NORMAL_CURSOR
             self._timeline.get_window().set_cursor(cursor)
         return False
 
-    def _mpl_button_press_event_cb(self, event):
-        if event.button != MouseButton.LEFT:
-            return
+    def _button_press_event_cb(self, unused_widget, event):
+        res, button = event.get_button()
+        if not res or button != 1:
+            return False
 
-        result = self._keyframes.contains(event)
-        if result[0]:
+        index = self._get_keyframe_at(event.x, event.y)
+        if index is not None:
             # A keyframe has been clicked.
-            keyframe_index = result[1]['ind'][0]
-            offsets = self._keyframes.get_offsets()
-            offset, value = offsets[keyframe_index]
+            offset = self._line_xs[index]
+            value = self._line_ys[index]
 
-            # pylint: disable=protected-access
-            if event.guiEvent.type == Gdk.EventType._2BUTTON_PRESS:
-                index = result[1]['ind'][0]
+            if event.type == Gdk.EventType.DOUBLE_BUTTON_PRESS:
                 # pylint: disable=consider-using-in
-                if index == 0 or index == len(offsets) - 1:
+                if index == 0 or index == len(self._line_xs) - 1:
                     # It's an edge keyframe. These should not be removed.
-                    return
+                    return False
 
                 # Rollback the last operation if it is "Move keyframe".
                 # This is needed because a double-click also triggers a
@@ -325,49 +402,48 @@ class KeyframeCurve(FigureCanvasGTK3Cairo, Loggable):
                 self._initial_timestamp = offset
                 self._initial_value = value
                 self.handling_motion = True
-            return
+            return False
 
-        if event.guiEvent.type != Gdk.EventType.BUTTON_PRESS:
-            return
+        if event.type != Gdk.EventType.BUTTON_PRESS:
+            return False
 
-        result = self.__line.contains(event)
-        if result[0]:
+        right = self._get_line_at(event.x, event.y)
+        if right is not None:
             # The line has been clicked.
             self.debug("The keyframe curve has been clicked")
             self._timeline.app.action_log.begin("Move keyframe curve segment",
                                                 toplevel=True)
-            x = event.xdata
-            offsets = self._keyframes.get_offsets()
-            keyframes = offsets[:, 0]
-            right = numpy.searchsorted(keyframes, x)
             # Remember the clicked line for drag&drop.
-            self.__clicked_line = (offsets[right - 1], offsets[right])
-            self.__ydata_drag_start = max(self.__ylim_min, min(event.ydata, self.__ylim_max))
+            self.__clicked_line = ((self._line_xs[right - 1], self._line_ys[right - 1]),
+                                   (self._line_xs[right], self._line_ys[right]))
+            unused_timestamp, ydata = self._get_timestamp_value(event.x, event.y)
+            self.__ydata_drag_start = max(self.__ylim_min, min(ydata, self.__ylim_max))
             self.handling_motion = True
+        return False
 
-    def _mpl_motion_event_cb(self, event):
-        if event.ydata is not None and event.xdata is not None:
-            # The mouse event is in the figure boundaries.
+    def _motion_notify_event_cb(self, unused_widget, event):
+        xdata = None
+        if self._line_xs and self.__contains_point(event.x, event.y):
+            xdata, ydata = self._get_timestamp_value(event.x, event.y)
             if self._offset is not None:
                 self._dragged = True
-                keyframe_ts, ydata = self.__compute_keyframe_position(event)
-                self._move_keyframe(int(self._offset), keyframe_ts, ydata)
+                keyframe_ts, ydata = self.__compute_keyframe_position(event.x, event.y, xdata, ydata)
+                self._move_keyframe(self._offset, keyframe_ts, ydata)
                 self._offset = keyframe_ts
-                self._update_tooltip(event)
                 hovering = True
             elif self.__clicked_line:
                 self._dragged = True
-                ydata = max(self.__ylim_min, min(event.ydata, self.__ylim_max))
+                ydata = max(self.__ylim_min, min(ydata, self.__ylim_max))
                 self._move_keyframe_line(self.__clicked_line, ydata, self.__ydata_drag_start)
                 hovering = True
             else:
-                hovering = self.__line.contains(event)[0]
+                hovering = self._get_line_at(event.x, event.y) is not None
         else:
             hovering = False
 
         if hovering:
             cursor = DRAG_CURSOR
-            self._update_tooltip(event)
+            self._update_tooltip(xdata)
             if not self.__hovered:
                 self.emit("enter")
                 self.__hovered = True
@@ -380,26 +456,29 @@ class KeyframeCurve(FigureCanvasGTK3Cairo, Loggable):
 
         self._timeline.get_window().set_cursor(cursor)
 
-    def _mpl_button_release_event_cb(self, event):
-        if event.button != MouseButton.LEFT:
-            return
+        # Stop the signal propagation while dragging a keyframe or a line.
+        return self.handling_motion
+
+    def _button_release_event_cb(self, unused_widget, event):
+        res, button = event.get_button()
+        if not res or button != 1:
+            return False
 
         # In order to make sure we seek to the exact position where we added a
-        # new keyframe, we don't use matplotlib's event.xdata, but rather
-        # compute it the same way we do for the seek logic.
-        event_widget = Gtk.get_event_widget(event.guiEvent)
-        x, unused_y = event_widget.translate_coordinates(self._timeline.layout.layers_vbox,
-                                                         event.x, event.y)
-        event.xdata = Zoomable.pixel_to_ns(x) - self._ges_elem.props.start + self._ges_elem.props.in_point
+        # new keyframe, we don't use the timestamp computed from the size of
+        # the curve, but rather compute it the same way we do for the seek logic.
+        x, unused_y = self.translate_coordinates(self._timeline.layout.layers_vbox,
+                                                 event.x, event.y)
+        xdata = Zoomable.pixel_to_ns(x) - self._ges_elem.props.start + self._ges_elem.props.in_point
 
         if self._offset is not None:
             # If dragging a keyframe, make sure the keyframe ends up exactly
             # where the mouse was released. Otherwise, the playhead will not
             # seek exactly on the keyframe.
-            if self._dragged:
-                if event.ydata is not None:
-                    keyframe_ts, ydata = self.__compute_keyframe_position(event)
-                    self._move_keyframe(int(self._offset), keyframe_ts, ydata)
+            if self._dragged and self.__contains_point(event.x, event.y):
+                unused_timestamp, ydata = self._get_timestamp_value(event.x, event.y)
+                keyframe_ts, ydata = self.__compute_keyframe_position(event.x, event.y, xdata, ydata)
+                self._move_keyframe(self._offset, keyframe_ts, ydata)
             self.debug("Keyframe released")
             self._timeline.app.action_log.commit("Move keyframe")
         elif self.__clicked_line:
@@ -408,17 +487,12 @@ class KeyframeCurve(FigureCanvasGTK3Cairo, Loggable):
 
             if not self._dragged:
                 # The keyframe line was clicked, but not dragged
-                assert event.guiEvent.type == Gdk.EventType.BUTTON_RELEASE
-                self.__maybe_create_keyframe(event)
+                self.__maybe_create_keyframe(event.x, event.y, xdata)
 
         self.handling_motion = False
         self._offset = None
         self.__clicked_line = ()
 
-    def _button_release_event_cb(self, unused_widget, event):
-        if not event.get_button() == (True, 1):
-            return False
-
         dragged = self._dragged
         self._dragged = False
 
@@ -426,16 +500,18 @@ class KeyframeCurve(FigureCanvasGTK3Cairo, Loggable):
         # unselected.
         return dragged
 
-    def _update_tooltip(self, event):
-        """Sets or clears the tooltip showing info about the hovered line."""
+    def _update_tooltip(self, xdata):
+        """Sets or clears the tooltip showing info about the hovered line.
+
+        Args:
+            xdata (Optional[int]): The hovered timestamp, or None to clear it.
+        """
         markup = None
-        if event:
-            if not event.xdata:
-                return
+        if xdata is not None:
             if self._offset is not None:
                 xdata = self._offset
             else:
-                xdata = max(self._line_xs[0], min(event.xdata, self._line_xs[-1]))
+                xdata = max(self._line_xs[0], min(xdata, self._line_xs[-1]))
             res, value = self.__source.control_source_get_value(xdata)
             assert res
             pmin = self.__paramspec.minimum
@@ -450,12 +526,12 @@ class KeyframeCurve(FigureCanvasGTK3Cairo, Loggable):
                 "{:.3f}".format(value))
         self.set_tooltip_markup(markup)
 
-    def __compute_keyframe_position(self, event):
-        keyframe_ts = self.__compute_keyframe_new_timestamp(event)
-        ydata = max(self.__ylim_min, min(event.ydata, self.__ylim_max))
+    def __compute_keyframe_position(self, x, y, xdata, ydata):
+        keyframe_ts = self.__compute_keyframe_new_timestamp(xdata)
+        ydata = max(self.__ylim_min, min(ydata, self.__ylim_max))
         if self._timeline.get_parent().control_mask:
-            delta_x = abs(event.x - self._initial_x)
-            delta_y = abs(event.y - self._initial_y)
+            delta_x = abs(x - self._initial_x)
+            delta_y = abs(y - self._initial_y)
             if delta_x > delta_y:
                 ydata = self._initial_value
             else:
@@ -463,28 +539,28 @@ class KeyframeCurve(FigureCanvasGTK3Cairo, Loggable):
 
         return keyframe_ts, ydata
 
-    def __compute_keyframe_new_timestamp(self, event):
+    def __compute_keyframe_new_timestamp(self, xdata):
         # The user can not change the timestamp of the first
         # and last keyframes.
         values = self.__source.get_all()
         if self._offset in (values[0].timestamp, values[-1].timestamp):
             return self._offset
 
-        if event.xdata != self._offset:
+        if xdata != self._offset:
             try:
-                kf = next(kf for kf in values if kf.timestamp == int(self._offset))
+                kf = next(kf for kf in values if kf.timestamp == self._offset)
             except StopIteration:
-                return event.xdata
+                return xdata
 
             i = values.index(kf)
-            keyframe_timestamp = int(event.xdata)
+            keyframe_timestamp = xdata
             if keyframe_timestamp <= values[i - 1].timestamp:
                 keyframe_timestamp = values[i - 1].timestamp + 1
             if keyframe_timestamp >= values[i + 1].timestamp:
                 keyframe_timestamp = values[i + 1].timestamp - 1
             return keyframe_timestamp
 
-        return event.xdata
+        return xdata
 
 
 class MultipleKeyframeCurve(KeyframeCurve):
@@ -492,19 +568,16 @@ class MultipleKeyframeCurve(KeyframeCurve):
 
     def __init__(self, timeline, bindings, ges_elem):
         self.__bindings = bindings
+        # The timestamps of the keyframes drawn highlighted, if any.
+        self.__selected_keyframe = None
+        self.__hovered_keyframe = None
         super().__init__(timeline, bindings[0], ges_elem)
 
         self._timeline = timeline
         self._project = timeline.app.project_manager.current_project
         self._project.pipeline.connect("position", self._position_cb)
 
-        sizes = [80]
-        self.__selected_keyframe = self._ax.scatter([0], [0.5], marker='D', s=sizes,
-                                                    c=SELECTED_KEYFRAME_NODE_COLOR, zorder=3)
-        self.__hovered_keyframe = self._ax.scatter([0], [0.5], marker='D', s=sizes,
-                                                   c=HOVERED_KEYFRAME_NODE_COLOR, zorder=3)
         self.__update_selected_keyframe()
-        self.__hovered_keyframe.set_visible(False)
 
     def release(self):
         super().release()
@@ -534,7 +607,16 @@ class MultipleKeyframeCurve(KeyframeCurve):
             self._line_xs.append(timestamp)
             self._line_ys.append(0.5)
 
-        self._populate_lines()
+        self.queue_draw()
+
+    def do_draw(self, cr):
+        KeyframeCurve.do_draw(self, cr)
+
+        for timestamp, color in ((self.__selected_keyframe, SELECTED_KEYFRAME_NODE_COLOR),
+                                 (self.__hovered_keyframe, HOVERED_KEYFRAME_NODE_COLOR)):
+            if timestamp is not None:
+                self._draw_keyframes(cr, [self._get_point(timestamp, 0.5)],
+                                     HIGHLIGHTED_KEYFRAME_NODE_RADIUS, color)
 
     def _create_keyframe(self, timestamp):
         with self._timeline.app.action_log.started("Add keyframe",
@@ -560,48 +642,48 @@ class MultipleKeyframeCurve(KeyframeCurve):
     def _move_keyframe_line(self, line, y_dest_value, y_start_value):
         pass
 
-    def _mpl_button_release_event_cb(self, event):
-        if event.button == MouseButton.LEFT:
+    def _button_release_event_cb(self, widget, event):
+        if event.get_button() == (True, 1):
             if self._offset is not None and not self._dragged:
                 # A keyframe was clicked but not dragged, so we
                 # should select it by seeking to its position.
                 source = self._timeline.selection.get_single_clip()
                 assert source
-                position = int(self._offset) - source.props.in_point + source.props.start
+                position = self._offset - source.props.in_point + source.props.start
 
                 if self._timeline.app.settings.leftClickAlsoSeeks:
                     self._timeline.set_next_seek_position(position)
                 else:
                     self._project.pipeline.simple_seek(position)
 
-        super()._mpl_button_release_event_cb(event)
+        return super()._button_release_event_cb(widget, event)
 
-    def _mpl_motion_event_cb(self, event):
-        super()._mpl_motion_event_cb(event)
+    def _motion_notify_event_cb(self, widget, event):
+        res = super()._motion_notify_event_cb(widget, event)
 
-        result = self._keyframes.contains(event)
-        if result[0]:
+        index = self._get_keyframe_at(event.x, event.y)
+        if index is not None:
             # A keyframe is hovered
-            keyframe_index = result[1]['ind'][0]
-            offset = self._keyframes.get_offsets()[keyframe_index][0]
-            self.__show_special_keyframe(self.__hovered_keyframe, offset)
+            self.__set_hovered_keyframe(self._line_xs[index])
         else:
-            self.__hide_special_keyframe(self.__hovered_keyframe)
+            self.__set_hovered_keyframe(None)
 
-    def __show_special_keyframe(self, keyframe, offset):
-        offsets = numpy.array([[offset, 0.5]])
-        keyframe.set_offsets(offsets)
-        keyframe.set_visible(True)
-        self.queue_draw()
+        return res
 
-    def __hide_special_keyframe(self, keyframe):
-        keyframe.set_visible(False)
-        self.queue_draw()
+    def __set_hovered_keyframe(self, timestamp):
+        if self.__hovered_keyframe != timestamp:
+            self.__hovered_keyframe = timestamp
+            self.queue_draw()
+
+    def __set_selected_keyframe(self, timestamp):
+        if self.__selected_keyframe != timestamp:
+            self.__selected_keyframe = timestamp
+            self.queue_draw()
 
     def _control_source_changed_cb(self, control_source, timed_value):
         super()._control_source_changed_cb(control_source, timed_value)
         self.__update_selected_keyframe()
-        self.__hide_special_keyframe(self.__hovered_keyframe)
+        self.__set_hovered_keyframe(None)
 
     def _position_cb(self, unused_pipeline, unused_position):
         self.__update_selected_keyframe()
@@ -618,25 +700,27 @@ class MultipleKeyframeCurve(KeyframeCurve):
             return
         source_position = position - source.props.start + source.props.in_point
 
-        offsets = self._keyframes.get_offsets()
-        keyframes = offsets[:, 0]
-
-        index = numpy.searchsorted(keyframes, source_position)
-        if 0 <= index < len(keyframes) and keyframes[index] == source_position:
-            self.__show_special_keyframe(self.__selected_keyframe, source_position)
+        index = bisect.bisect_left(self._line_xs, source_position)
+        if 0 <= index < len(self._line_xs) and self._line_xs[index] == source_position:
+            self.__set_selected_keyframe(source_position)
         else:
-            self.__hide_special_keyframe(self.__selected_keyframe)
+            self.__set_selected_keyframe(None)
 
-    def _update_tooltip(self, event):
+    def _update_tooltip(self, xdata):
         markup = None
-        if event:
-            if not event.xdata:
-                return
-            markup = _("Timestamp: %s") % Gst.TIME_ARGS(event.xdata)
+        if xdata is not None:
+            markup = _("Timestamp: %s") % Gst.TIME_ARGS(xdata)
         self.set_tooltip_markup(markup)
 
 
-class TimelineElement(Gtk.Layout, Zoomable, Loggable):
+class TimelineElement(Gtk.Layout, Loggable):
+    """Widget showing a source of a clip.
+
+    The previewer is created only when the clip is first realized by the
+    layer, and the zoomable children are notified of the zoom changes only
+    while the clip is realized.
+    """
+
     __gsignals__ = {
         # Signal the keyframes curve are being hovered
         "curve-enter": (GObject.SignalFlags.RUN_LAST, None, ()),
@@ -646,7 +730,6 @@ class TimelineElement(Gtk.Layout, Zoomable, Loggable):
 
     def __init__(self, element, timeline):
         Gtk.Layout.__init__(self)
-        Zoomable.__init__(self)
         Loggable.__init__(self)
 
         self.set_name(element.get_name())
@@ -662,15 +745,18 @@ class TimelineElement(Gtk.Layout, Zoomable, Loggable):
 
         self.props.vexpand = True
 
-        self.previewer = self._get_previewer()
-        if self.previewer:
-            self.add(self.previewer)
+        # Created when realized, see set_realized.
+        self.previewer = None
+        self.__realized = False
+        # The zoom ratio when the element has been unrealized.
+        self.__zoomratio = None
 
         self.__background = self._get_background()
         if self.__background:
             self.add(self.__background)
 
-        self.markers = ClipMarkersBox(self.app, self._ges_elem)
+        self.markers = ClipMarkersBox(self.timeline.app, self._ges_elem)
+        Zoomable.remove_instance(self.markers)
         self._ges_elem.markers_manager.set_markers_box(self.markers)
 
         self.add(self.markers)
@@ -696,6 +782,54 @@ class TimelineElement(Gtk.Layout, Zoomable, Loggable):
         if self.markers:
             self._ges_elem.markers_manager.set_markers_box(None)
             self.markers.release()
+            if Zoomable.has_instance(self.markers):
+                Zoomable.remove_instance(self.markers)
+
+    def set_realized(self, realized):
+        """Sets whether the element is in view.
+
+        The previewer is created the first time the element gets in view.
+        While out of view, the zoomable children are not notified of the
+        zoom changes.
+
+        Args:
+            realized (bool): Whether the element is in view.
+        """
+        if self.__realized == realized:
+            return
+        self.__realized = realized
+
+        zoomables = [self.markers]
+        if self.previewer:
+            zoomables.append(self.previewer)
+
+        if realized:
+            for zoomable in zoomables:
+                Zoomable.add_instance(zoomable)
+                if self.__zoomratio != Zoomable.zoomratio:
+                    zoomable.zoom_changed()
+            if not self.previewer:
+                self.__create_previewer()
+        else:
+            for zoomable in zoomables:
+                Zoomable.remove_instance(zoomable)
+            self.__zoomratio = Zoomable.zoomratio
+
+    def __create_previewer(self):
+        self.previewer = self._get_previewer()
+        if not self.previewer:
+            return
+
+        # Keep it below the markers and the keyframes curve, as when it
+        # was the first child.
+        self.previewer.connect_after("realize", self.__previewer_realize_cb)
+        self.previewer.set_size_request(self.__width, self.__height)
+        self.previewer.set_selected(bool(self._ges_elem.selected))
+        self.put(self.previewer, 0, 0)
+        self.previewer.show_all()
+
+    def __previewer_realize_cb(self, previewer):
+        previewer.get_window().lower()
 
     # Public API
     def set_size(self, width, height):
@@ -1387,11 +1521,14 @@ class Clip(Gtk.EventBox, Loggable):
         self.update_position()
 
 
-class FullClip(Clip, Zoomable):
-    """Full version of Clip(ui)."""
+class FullClip(Clip):
+    """Full version of Clip(ui).
+
+    The layer realizes the clip when it gets in view, see `set_realized`.
+    """
 
     def __init__(self, layer: GES.Layer, ges_clip: GES.Clip):
-        Zoomable.__init__(self)
+        self._realized = False
         Clip.__init__(self, layer, ges_clip)
 
         self.ges_clip.ui = self
@@ -1401,6 +1538,20 @@ class FullClip(Clip, Zoomable):
         ges_timeline_element.selected.selected = self.ges_clip.selected.selected
         ges_timeline_element.ui = None
 
+    def set_realized(self, realized):
+        """Sets whether the clip is in view.
+
+        Args:
+            realized (bool): Whether the clip is in view.
+        """
+        self._realized = realized
+        self.set_child_visible(realized)
+        for ges_timeline_element in self.ges_clip.get_children(False):
+            if isinstance(ges_timeline_element.ui, TimelineElement):
+                ges_timeline_element.ui.set_realized(realized)
+        if realized:
+            self.update_position()
+
     def update_position(self):
         ges_layer = self.ges_clip.props.layer
         layer = ges_layer.ui
@@ -1408,13 +1559,17 @@ class FullClip(Clip, Zoomable):
             # Things are not settled yet.
             return
 
+        if not self.get_child_visible():
+            # Out of view, the layer updates it when it gets realized.
+            return
+
         start = self.ges_clip.props.start
         duration = self.ges_clip.props.duration
-        x = self.ns_to_pixel(start)
+        x = Zoomable.ns_to_pixel(start)
         # The calculation of the width assumes that the start is always
         # int(pixels_float). In that case, the rounding can add up and a pixel
         # might be lost if we ignore the start of the clip.
-        width = self.ns_to_pixel(start + duration) - x
+        width = Zoomable.ns_to_pixel(start + duration) - x
 
         parent_height = layer.props.height_request
         y = 0
@@ -1434,7 +1589,7 @@ class FullClip(Clip, Zoomable):
                 parent_height != self._current_parent_height or \
                 layer != self._current_parent:
 
-            offset_px = self.ns_to_pixel(self.ges_clip.props.in_point)
+            offset_px = Zoomable.ns_to_pixel(self.ges_clip.props.in_point)
 
             for ges_timeline_element in self.ges_clip.get_children(False):
                 if not ges_timeline_element.ui:
@@ -1577,6 +1732,7 @@ class FullSourceClip(SourceClip, FullClip):
             return
 
         ges_source.ui = widget
+        widget.set_realized(self._realized)
 
         self._connect_to_child_ui(ges_source)
 
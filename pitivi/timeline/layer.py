@@ -14,6 +14,7 @@
 #
 # You should have received a copy of the GNU Lesser General Public
 # License along with this program; if not, see <http://www.gnu.org/licenses/>.
+import collections
 import re
 from gettext import gettext as _
 
@@ -25,6 +26,8 @@ from gi.repository import Gtk
 from pitivi.timeline import elements
 from pitivi.undo.timeline import CommitTimelineFinalizingAction
 from pitivi.utils.loggable import Loggable
+from pitivi.utils.misc import disconnect_all_by_func
+from pitivi.utils.timeline import IntervalIndex
 from pitivi.utils.timeline import Zoomable
 from pitivi.utils.ui import LAYER_HEIGHT
 from pitivi.utils.ui import MINI_LAYER_HEIGHT
@@ -308,6 +311,7 @@ class Layer(Gtk.Layout, Loggable):
 
         self._children = []
         self._changed = False
+        self.clips_index = IntervalIndex()
 
         self.ges_layer.connect("clip-added", self._clip_added_cb)
         self.ges_layer.connect("clip-removed", self._clip_removed_cb)
@@ -318,6 +322,10 @@ class Layer(Gtk.Layout, Loggable):
 
         self.media_types = GES.TrackType(0)
         self.old_media_types = GES.TrackType(0)
+        # The number of clips supporting each track type, and the
+        # supported formats each clip has been counted with.
+        self.__media_type_counts = collections.Counter()
+        self.__clips_media_types = {}
 
     def set_name(self, name):
         self.ges_layer.set_meta("video::name", name)
@@ -355,18 +363,32 @@ class Layer(Gtk.Layout, Loggable):
             return
 
         self.old_media_types = self.media_types
-        self.media_types: GES.TrackType = GES.TrackType(0)
-        ges_clips = self.ges_layer.get_clips()
-        for ges_clip in ges_clips:
-            self.media_types |= ges_clip.props.supported_formats
-            if self.media_types & GES.TrackType.AUDIO and self.media_types & GES.TrackType.VIDEO:
-                # Cannot find more types than these.
-                break
+        media_types = 0
+        for track_type, count in self.__media_type_counts.items():
+            if count:
+                media_types |= track_type
+        self.media_types: GES.TrackType = GES.TrackType(media_types)
+
+    def __count_media_types(self, ges_clip, removed=False):
+        """Updates the counts of clips with the supported formats of a clip."""
+        old_types = self.__clips_media_types.pop(ges_clip, 0)
+        new_types = 0 if removed else int(ges_clip.props.supported_formats)
+        if not removed:
+            self.__clips_media_types[ges_clip] = new_types
+
+        for bit in range(max(old_types, new_types).bit_length()):
+            track_type = 1 << bit
+            if track_type & old_types:
+                self.__media_type_counts[track_type] -= 1
+            if track_type & new_types:
+                self.__media_type_counts[track_type] += 1
 
     def _clip_child_added_cb(self, ges_clip, child):
+        self.__count_media_types(ges_clip)
         self.check_media_types()
 
     def _clip_child_removed_cb(self, ges_clip, child):
+        self.__count_media_types(ges_clip)
         self.check_media_types()
 
     def _clip_added_cb(self, unused_ges_layer, ges_clip):
@@ -376,6 +398,8 @@ class Layer(Gtk.Layout, Loggable):
     def _add_clip_ui(self, ges_clip, clip_ui):
         self._children.append(clip_ui)
         self._children.sort(key=lambda clip: clip.z_order)
+        self.__index_clip(ges_clip)
+        self.__count_media_types(ges_clip)
 
         clip_ui.update_position()
         self._changed = True
@@ -383,6 +407,15 @@ class Layer(Gtk.Layout, Loggable):
 
         ges_clip.connect_after("child-added", self._clip_child_added_cb)
         ges_clip.connect_after("child-removed", self._clip_child_removed_cb)
+        ges_clip.connect("notify::start", self._clip_extent_changed_cb)
+        ges_clip.connect("notify::duration", self._clip_extent_changed_cb)
+
+    def __index_clip(self, ges_clip):
+        start = ges_clip.props.start
+        self.clips_index.update(ges_clip, start, start + ges_clip.props.duration)
+
+    def _clip_extent_changed_cb(self, ges_clip, unused_pspec):
+        self.__index_clip(ges_clip)
 
     def _clip_removed_cb(self, unused_ges_layer, ges_clip):
         self._remove_clip(ges_clip)
@@ -391,31 +424,46 @@ class Layer(Gtk.Layout, Loggable):
     def _remove_clip_ui(self, ges_clip, clip_ui):
         self.remove(clip_ui)
         self._children.remove(clip_ui)
+        self.clips_index.remove(ges_clip)
+        self.__count_media_types(ges_clip, removed=True)
         self._changed = True
         clip_ui.release()
         clip_ui = None
 
         ges_clip.disconnect_by_func(self._clip_child_added_cb)
         ges_clip.disconnect_by_func(self._clip_child_removed_cb)
+        disconnect_all_by_func(ges_clip, self._clip_extent_changed_cb)
 
     def update_position(self):
         pass
 
+    def _get_drawn_children(self):
+        """Gets the clips widgets to be drawn, sorted by z-order."""
+        return self._children
+
     def do_draw(self, cr):
         if self._changed:
             self._children.sort(key=lambda clip: clip.z_order)
-            for child in self._children:
+            for child in self._get_drawn_children():
                 if isinstance(child, elements.TransitionClip):
                     window = child.get_window()
-                    window.raise_()
+                    if window:
+                        window.raise_()
             self._changed = False
 
-        for child in self._children:
+        for child in self._get_drawn_children():
             self.propagate_draw(child, cr)
 
 
 class FullLayer(Layer, Zoomable):
-    """Container for the Full clips."""
+    """Container for the Full clips.
+
+    Every clip has a widget, but only the widgets of the clips in the
+    viewport set by the timeline are realized. The other widgets are not
+    mapped, so they are not allocated, positioned or drawn, their
+    previewers are created only when they first get in view, and they are
+    not notified of the zoom changes.
+    """
 
     __gtype_name__ = "PitiviFullLayer"
 
@@ -423,6 +471,13 @@ class FullLayer(Layer, Zoomable):
         Layer.__init__(self, ges_layer, timeline)
         Zoomable.__init__(self)
 
+        # The (start, end) time range of the clips to be realized,
+        # or None when all of them are realized.
+        self.__viewport = None
+        self.__realized = set()
+        # The realized clips widgets sorted by z-order, None when outdated.
+        self.__drawn = None
+
         self.ges_layer.ui = self
         for ges_clip in ges_layer.get_clips():
             self._add_clip(ges_clip)
@@ -451,7 +506,10 @@ class FullLayer(Layer, Zoomable):
 
         widget = ui_type(self, ges_clip)
         self.put(widget, self.ns_to_pixel(ges_clip.props.start), 0)
+        # Positioned only when realized, see __update_realized.
+        widget.set_child_visible(False)
         Layer._add_clip_ui(self, ges_clip, widget)
+        self.__update_realized(ges_clip)
 
     def _remove_clip(self, ges_clip):
         if not ges_clip.ui:
@@ -462,12 +520,59 @@ class FullLayer(Layer, Zoomable):
             self.error("Implement UI for type %s?", ges_clip.__gtype__)
             return
 
+        self.__realized.discard(ges_clip.ui)
+        self.__drawn = None
         Layer._remove_clip_ui(self, ges_clip, ges_clip.ui)
 
+    def _clip_extent_changed_cb(self, ges_clip, pspec):
+        Layer._clip_extent_changed_cb(self, ges_clip, pspec)
+        self.__update_realized(ges_clip)
+
+    def set_viewport(self, start, end):
+        """Realizes only the widgets of the clips overlapping the time range.
+
+        Args:
+            start (int): The start of the range, in nanoseconds.
+            end (int): The end of the range, in nanoseconds.
+        """
+        self.__viewport = (start, end)
+        in_view = {ges_clip.ui for ges_clip in self.clips_index.overlapping(start, end)}
+        for clip_ui in self.__realized - in_view:
+            self.__set_realized(clip_ui, False)
+        for clip_ui in in_view - self.__realized:
+            self.__set_realized(clip_ui, True)
+
+    def is_realized(self, ges_clip):
+        """Checks whether the widget of the clip is realized."""
+        return ges_clip.ui in self.__realized
+
+    def __update_realized(self, ges_clip):
+        if self.__viewport:
+            start, end = self.clips_index.get_extent(ges_clip)
+            in_view = start < self.__viewport[1] and end > self.__viewport[0]
+        else:
+            in_view = True
+
+        if in_view != (ges_clip.ui in self.__realized):
+            self.__set_realized(ges_clip.ui, in_view)
+
+    def __set_realized(self, clip_ui, realized):
+        if realized:
+            self.__realized.add(clip_ui)
+        else:
+            self.__realized.remove(clip_ui)
+        self.__drawn = None
+        clip_ui.set_realized(realized)
+
+    def _get_drawn_children(self):
+        if self._changed or self.__drawn is None:
+            self.__drawn = sorted(self.__realized, key=lambda clip: clip.z_order)
+        return self.__drawn
+
     def update_position(self):
-        for ges_clip in self.ges_layer.get_clips():
-            if hasattr(ges_clip, 'ui') and ges_clip.ui:
-                ges_clip.ui.update_position()
+        # The other clips are positioned when realized.
+        for clip_ui in self.__realized:
+            clip_ui.update_position()
 
 
 class MiniLayer(Layer):
@@ -15,6 +15,7 @@
 # You should have received a copy of the GNU Lesser General Public
 # License along with this program; if not, see <http://www.gnu.org/licenses/>.
 """Markers display and management."""
+import bisect
 import os
 from typing import Optional
 
@@ -124,6 +125,8 @@ class MarkersBox(Gtk.EventBox, Zoomable, Loggable):
         self.props.height_request = TIMELINE_MARKER_SIZE
 
         self.__markers_container: Optional[GES.MarkerList] = None
+        # The positions of the markers, sorted.
+        self.__positions = []
         self.marker_moving: Optional[Marker] = None
         self.marker_new: Optional[Marker] = None
 
@@ -151,16 +154,13 @@ class MarkersBox(Gtk.EventBox, Zoomable, Loggable):
         if start >= end:
             return None
 
-        markers_positions = list(ges_marker.props.position
-                                 for ges_marker in self.markers_container.get_markers()
-                                 if start <= ges_marker.props.position < end)
-        if not markers_positions:
-            return None
-
         if after is not None:
-            return min(markers_positions)
+            index = bisect.bisect_left(self.__positions, start)
         else:
-            return max(markers_positions)
+            index = bisect.bisect_left(self.__positions, end) - 1
+        if 0 <= index < len(self.__positions) and start <= self.__positions[index] < end:
+            return self.__positions[index]
+        return None
 
     def add_at_timeline_time(self, position):
         """Adds a marker at the given timeline position."""
@@ -184,6 +184,7 @@ class MarkersBox(Gtk.EventBox, Zoomable, Loggable):
             self.__markers_container.disconnect_by_func(self._marker_moved_cb)
 
         self.__markers_container = ges_markers_container
+        self.__positions = []
         if self.__markers_container:
             self.__create_marker_widgets()
             self.__markers_container.connect("marker-added", self._marker_added_cb)
@@ -295,6 +296,7 @@ class MarkersBox(Gtk.EventBox, Zoomable, Loggable):
         return Marker(ges_marker, "Marker", TIMELINE_MARKER_SIZE, TIMELINE_MARKER_SIZE)
 
     def _add_marker(self, position, ges_marker):
+        bisect.insort(self.__positions, position)
         marker = self._create_marker(ges_marker)
         x = self.ns_to_pixel(position) - self.offset - marker.width / 2
         self.layout.put(marker, x, 0)
@@ -308,13 +310,21 @@ class MarkersBox(Gtk.EventBox, Zoomable, Loggable):
         if not ges_marker.ui:
             return
 
+        self.__remove_position(ges_marker.props.position)
         self.layout.remove(ges_marker.ui)
         ges_marker.ui = None
 
     def _marker_moved_cb(
-            self, unused_markers, unused_prev_position, position, ges_marker):
+            self, unused_markers, prev_position, position, ges_marker):
+        self.__remove_position(prev_position)
+        bisect.insort(self.__positions, position)
         self._move_marker(position, ges_marker)
 
+    def __remove_position(self, position):
+        index = bisect.bisect_left(self.__positions, position)
+        if index < len(self.__positions) and self.__positions[index] == position:
+            del self.__positions[index]
+
     def _move_marker(self, position, ges_marker):
         x = self.ns_to_pixel(position) - self.offset - ges_marker.ui.width / 2
         self.layout.move(ges_marker.ui, x, 0)
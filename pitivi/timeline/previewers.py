@@ -15,11 +15,20 @@
 # You should have received a copy of the GNU Lesser General Public
 # License along with this program; if not, see <http://www.gnu.org/licenses/>.
 """Previewers for the timeline."""
+import bisect
+import collections
 import contextlib
-import hashlib
+import heapq
+import itertools
+import multiprocessing
 import os
 import random
+import shutil
 import sqlite3
+import tempfile
+import threading
+import time
+import urllib.parse
 from gettext import gettext as _
 
 import cairo
@@ -34,12 +43,15 @@ from gi.repository import Gtk
 from gi.repository import Pango
 from gi.repository import PangoCairo
 
+from pitivi.dialogs.prefs import PreferencesDialog
 from pitivi.settings import GlobalSettings
 from pitivi.settings import xdg_cache_home
 from pitivi.utils.loggable import Loggable
+from pitivi.utils.mediacache import MediaCache
 from pitivi.utils.misc import path_from_uri
 from pitivi.utils.misc import quantize
 from pitivi.utils.misc import quote_uri
+from pitivi.utils.pipeline import create_cpu_throttling_clock
 from pitivi.utils.pipeline import MAX_BRINGING_TO_PAUSED_DURATION
 from pitivi.utils.proxy import get_proxy_target
 from pitivi.utils.proxy import ProxyManager
@@ -69,9 +81,21 @@ THUMB_MARGIN_PX = 3
 THUMB_HEIGHT = EXPANDED_SIZE - 2 * CLIP_BORDER_WIDTH
 THUMB_PERIOD = int(Gst.SECOND / 2)
 assert Gst.SECOND % THUMB_PERIOD == 0
-# For the waveforms, ensures we always have a little extra surface when
-# scrolling while playing, in pixels.
-WAVEFORM_SURFACE_EXTRA_PX = 500
+# When the missing thumbnails are at least this fraction of the thumbnails
+# in the range they span, and there are at least LINEAR_THUMBNAILING_MIN_THUMBS
+# of them, decoding the range once is cheaper than seeking for each of them.
+LINEAR_THUMBNAILING_MIN_DENSITY = 0.25
+LINEAR_THUMBNAILING_MIN_THUMBS = 8
+# The number of levels of the thumbnails pyramid. The positions of each
+# level are separated by twice the interval of the previous level, starting
+# with THUMB_PERIOD, so a level contains all the positions of the coarser
+# levels and zooming never needs different thumbnails.
+THUMB_LEVELS = 10
+# The width of the waveform tiles, in pixels.
+WAVEFORM_TILE_WIDTH = 256
+# The maximum number of waveform tiles waiting to be rendered. The oldest
+# requests, most likely for tiles scrolled out of view, are dropped.
+MAX_PENDING_WAVEFORM_TILES = 128
 
 PREVIEW_GENERATOR_SIGNALS = {
     "done": (GObject.SignalFlags.RUN_LAST, None, ()),
@@ -85,6 +109,34 @@ GlobalSettings.add_config_option("previewers_max_cpu",
                                  key="max-cpu-usage",
                                  default=90)
 
+# The number of previewers of each kind running at the same time,
+# 0 meaning it's derived from the number of cores and previewers_max_cpu.
+GlobalSettings.add_config_option("previewers_max_jobs",
+                                 section="previewers",
+                                 key="max-jobs",
+                                 default=0)
+
+GlobalSettings.add_config_option("thumbnails_keyframes_only",
+                                 section="previewers",
+                                 key="thumbnails-keyframes-only",
+                                 default=False)
+
+GlobalSettings.add_config_option("thumbnails_cache_max_size",
+                                 section="previewers",
+                                 key="thumbnails-cache-max-size",
+                                 default=1024,
+                                 notify=True)
+PreferencesDialog.add_numeric_preference("thumbnails_cache_max_size",
+                                         description=_("The thumbnails of the least recently used assets are discarded when this limit is exceeded."),
+                                         section="timeline",
+                                         label=_("Thumbnails cache size (MB)"),
+                                         lower=1)
+
+GlobalSettings.add_config_option("thumbnails_memory_cache_max_size",
+                                 section="previewers",
+                                 key="thumbnails-memory-cache-max-size",
+                                 default=128)
+
 
 class PreviewerBin(Gst.Bin, Loggable):
     """Baseclass for elements gathering data to create previews."""
@@ -127,14 +179,18 @@ class TeedThumbnailBin(PreviewerBin):
         self.uri = None
         self.thumb_cache = None
         self.gdkpixbufsink = self.internal_bin.get_by_name("gdkpixbufsink")
+        # The (stream_time, pixbuf) pairs waiting to be added to the cache
+        # in the main loop.
+        self.__pending_thumbs = []
+        self.__pending_thumbs_lock = threading.Lock()
 
-    def __add_thumbnail(self, message):
-        struct = message.get_structure()
-        struct_name = struct.get_name()
-        if struct_name == "pixbuf":
-            stream_time = struct.get_value("stream-time")
+    def __add_thumbnails_cb(self):
+        with self.__pending_thumbs_lock:
+            pending_thumbs = self.__pending_thumbs
+            self.__pending_thumbs = []
+
+        for stream_time, pixbuf in pending_thumbs:
             self.log("%s new thumbnail %s", self.uri, stream_time)
-            pixbuf = struct.get_value("pixbuf")
             self.thumb_cache[stream_time] = pixbuf
 
         return False
@@ -142,12 +198,21 @@ class TeedThumbnailBin(PreviewerBin):
     def do_post_message(self, message):
         if message.type == Gst.MessageType.ELEMENT and \
                 message.src == self.gdkpixbufsink:
-            GLib.idle_add(self.__add_thumbnail, message)
+            struct = message.get_structure()
+            if struct.get_name() == "pixbuf":
+                thumb = (struct.get_value("stream-time"), struct.get_value("pixbuf"))
+                with self.__pending_thumbs_lock:
+                    # Hand the thumbnails to the main loop in batches.
+                    schedule = not self.__pending_thumbs
+                    self.__pending_thumbs.append(thumb)
+                if schedule:
+                    GLib.idle_add(self.__add_thumbnails_cb)
 
         return Gst.Bin.do_post_message(self, message)
 
     def finalize(self):
         """Finalizes the previewer, saving data to file if needed."""
+        self.__add_thumbnails_cb()
         self.thumb_cache.commit()
 
     def do_get_property(self, prop):
@@ -164,6 +229,64 @@ class TeedThumbnailBin(PreviewerBin):
             raise AttributeError('unknown property %s' % prop.name)
 
 
+class WaveformPeaks:
+    """Accumulator of the peaks of a waveform.
+
+    The values are written in a preallocated float32 array, one per
+    SAMPLE_DURATION. The samples not reported by the level element, and
+    the clipping ones, are filled by linear interpolation in `finish`.
+
+    Attributes:
+        values (numpy.ndarray): The peaks, NaN where still unknown.
+    """
+
+    def __init__(self, n_samples):
+        self.values = numpy.full(n_samples, numpy.nan, dtype=numpy.float32)
+
+    def add(self, pos, rms):
+        """Records the RMS values in dB of the channels at the sample index.
+
+        Returns:
+            bool: Whether the position is inside the waveform.
+        """
+        if not 0 <= pos < len(self.values):
+            return False
+
+        # Let's go mono, ignoring the channels which are clipping.
+        levels = [10 ** (val / 20) * 100 for val in rms[:2] if val < 0]
+        if levels:
+            self.values[pos] = sum(levels) / len(levels)
+        return True
+
+    def finish(self):
+        """Interpolates the unknown values.
+
+        Returns:
+            numpy.ndarray: The complete peaks.
+        """
+        values = self.values
+        if values.size == 0:
+            return values
+
+        gaps = numpy.isnan(values)
+
+        # The waveform starts from silence and ends with silence after
+        # the last known sample.
+        if gaps[0]:
+            values[0] = 0
+            gaps[0] = False
+        if not gaps.any():
+            return values
+
+        # Indexes where the runs of unknown values start and end. The
+        # known neighbours of the runs are enough to interpolate them.
+        edges = numpy.flatnonzero(gaps[1:] != gaps[:-1]) + 1
+        edges[0::2] -= 1
+        known = numpy.unique(edges)
+        values[gaps] = numpy.interp(numpy.flatnonzero(gaps), known, values[known], right=0)
+        return values
+
+
 class WaveformPreviewer(PreviewerBin):
     """Bin to generate and save waveforms as a .npy file."""
 
@@ -195,7 +318,6 @@ class WaveformPreviewer(PreviewerBin):
         self.samples = None
         self.n_samples = 0
         self.duration = 0
-        self.prev_pos = 0
 
     def do_get_property(self, prop):
         if prop.name == 'uri':
@@ -230,47 +352,24 @@ class WaveformPreviewer(PreviewerBin):
                 stream_time = struct.get_value("stream-time")
 
                 if self.peaks is None:
-                    self.peaks = []
-                    for unused_channel in peaks:
-                        self.peaks.append([0] * int(self.n_samples))
+                    self.peaks = WaveformPeaks(int(self.n_samples))
 
                 pos = int(stream_time / SAMPLE_DURATION)
-                if pos >= len(self.peaks[0]):
+                if not self.peaks.add(pos, peaks):
                     return False
 
-                for i, val in enumerate(peaks):
-                    if val < 0:
-                        val = 10 ** (val / 20) * 100
-                    else:
-                        val = self.peaks[i][pos - 1]
-
-                    # Linearly joins values between to known samples values.
-                    unknowns = range(self.prev_pos + 1, pos)
-                    if unknowns:
-                        prev_val = self.peaks[i][self.prev_pos]
-                        linear_const = (val - prev_val) / len(unknowns)
-                        for temppos in unknowns:
-                            self.peaks[i][temppos] = self.peaks[i][temppos - 1] + linear_const
-
-                    self.peaks[i][pos] = val
-
-                self.prev_pos = pos
-
         return Gst.Bin.do_post_message(self, message)
 
     def finalize(self):
         """Finalizes the previewer, saving data to file if needed."""
-        if not self.passthrough and self.peaks:
-            # Let's go mono.
-            if len(self.peaks) > 1:
-                samples = (numpy.array(self.peaks[0]) + numpy.array(self.peaks[1])) / 2
-            else:
-                samples = numpy.array(self.peaks[0])
+        if not self.passthrough and self.peaks is not None:
+            samples = self.peaks.finish()
 
             with open(self.wavefile, 'wb') as wavefile:
                 numpy.save(wavefile, samples)
 
             self.samples = samples
+            self.peaks = None
 
 
 Gst.Element.register(None, "waveformbin", Gst.Rank.NONE,
@@ -280,20 +379,54 @@ Gst.Element.register(None, "teedthumbnailbin", Gst.Rank.NONE,
 
 
 class PreviewGeneratorManager(Loggable):
-    """Manager for running the previewers."""
+    """Manager for running the previewers.
+
+    Runs up to `max_jobs` previewers of each GES.TrackType at the same time,
+    picking them from a priority queue. The previewers are ranked by their
+    `priority`, then by their distance from the visible range of the
+    timeline, then by their distance from the playhead.
+
+    Attributes:
+        max_jobs (int): The maximum number of previewers of a GES.TrackType
+            running at the same time.
+    """
 
     def __init__(self):
         Loggable.__init__(self)
 
-        # The current Previewer per GES.TrackType.
-        self._current_previewers = {}
-        # The queue of Previewers.
+        self.max_jobs = 1
+        # The running Previewers per GES.TrackType.
+        self._current_previewers = {
+            GES.TrackType.AUDIO: [],
+            GES.TrackType.VIDEO: []
+        }
+        # The queue of Previewers per GES.TrackType, as heaps of
+        # (priority, sequence number, previewer) entries.
         self._previewers = {
             GES.TrackType.AUDIO: [],
             GES.TrackType.VIDEO: []
         }
+        # The Previewers in the queues.
+        self._queued = set()
+        self._counter = itertools.count()
         self._running = True
 
+        # The visible (start, end) range of the timeline, in nanoseconds.
+        self._visible_range = None
+        self._playhead_position = 0
+        self.__rerank_id = 0
+
+    @staticmethod
+    def default_max_jobs(max_cpu_usage):
+        """Gets the number of previewers which can run at the same time.
+
+        Args:
+            max_cpu_usage (int): The percentage of the CPU the previewers
+                are allowed to use.
+        """
+        # Each decoding pipeline typically keeps more than one core busy.
+        return max(1, multiprocessing.cpu_count() * max_cpu_usage // 100 // 2)
+
     def add_previewer(self, previewer):
         """Adds the specified previewer to the queue.
 
@@ -302,63 +435,161 @@ class PreviewGeneratorManager(Loggable):
         """
         track_type = previewer.track_type
 
-        current = self._current_previewers.get(track_type)
-        if previewer in self._previewers[track_type] or previewer is current:
+        running = self._current_previewers[track_type]
+        if previewer in self._queued or previewer in running:
             # Already in the queue or already processing.
             return
 
-        if not self._previewers[track_type] and current is None:
+        if not self._previewers[track_type] and len(running) < self.max_jobs:
             self._start_previewer(previewer)
         else:
-            self._previewers[track_type].insert(0, previewer)
+            self.__enqueue(previewer)
+
+    def __enqueue(self, previewer):
+        entry = (self._rank(previewer), next(self._counter), previewer)
+        heapq.heappush(self._previewers[previewer.track_type], entry)
+        self._queued.add(previewer)
+
+    def _rank(self, previewer):
+        """Computes the rank of the previewer in the queue, lower is sooner.
+
+        Returns:
+            Tuple[int, int, int]: The priority of the previewer, the distance
+                from the visible range and the distance from the playhead.
+        """
+        ges_elem = getattr(previewer, "ges_elem", None)
+        if not ges_elem or not self._visible_range:
+            return previewer.priority, 0, 0
+
+        start = ges_elem.props.start
+        end = start + ges_elem.props.duration
+        visible_start, visible_end = self._visible_range
+        visible_distance = max(0, visible_start - end, start - visible_end)
+        playhead_distance = max(0, start - self._playhead_position,
+                                self._playhead_position - end)
+        return previewer.priority, visible_distance, playhead_distance
+
+    def set_viewport(self, start, end, playhead_position):
+        """Sets the visible range of the timeline and the playhead position.
+
+        The queued previewers are re-ranked when the main loop is idle.
+
+        Args:
+            start (int): The start of the visible range, in nanoseconds.
+            end (int): The end of the visible range, in nanoseconds.
+            playhead_position (int): The position of the playhead.
+        """
+        if self._visible_range == (start, end) and self._playhead_position == playhead_position:
+            return
+
+        self._visible_range = (start, end)
+        self._playhead_position = playhead_position
+        if not self.__rerank_id:
+            self.__rerank_id = GLib.idle_add(self.__rerank_cb)
+
+    def __rerank_cb(self):
+        self.__rerank_id = 0
+        for track_type, queue in self._previewers.items():
+            queue[:] = [(self._rank(previewer), seq, previewer)
+                        for unused_rank, seq, previewer in queue]
+            heapq.heapify(queue)
+            if track_type == GES.TrackType.VIDEO:
+                # The thumbnails are saved as soon as they are produced, so
+                # the thumbnailers can be interrupted without losing work.
+                # The waveforms would have to be generated again from scratch.
+                self.__demote_offscreen_previewers(track_type)
+        return False
+
+    def __demote_offscreen_previewers(self, track_type):
+        """Replaces the running off-screen previewers with visible ones."""
+        if not self._running:
+            return
+
+        queue = self._previewers[track_type]
+        running = self._current_previewers[track_type]
+        for previewer in sorted(running, key=self._rank, reverse=True):
+            if not queue:
+                break
+
+            rank = self._rank(previewer)
+            if rank[1] == 0:
+                # The previewer is in view.
+                continue
+
+            best_rank = queue[0][0]
+            if best_rank[1] > 0 or best_rank >= rank:
+                break
+
+            self.debug("Demoting off-screen previewer %s", previewer)
+            # Stopping the previewer starts the next one from the queue.
+            previewer.stop_generation()
+            self.__enqueue(previewer)
 
     def _start_previewer(self, previewer):
-        self._current_previewers[previewer.track_type] = previewer
+        self._current_previewers[previewer.track_type].append(previewer)
         previewer.connect("done", self.__previewer_done_cb)
         previewer.start_generation()
 
     @contextlib.contextmanager
     def paused(self, interrupt=False):
-        """Pauses (and flushes if interrupt=True) managed previewers."""
+        """Pauses (and flushes if interrupt=True) managed previewers.
+
+        The running previewers which have been paused are resumed when
+        leaving the context, so they keep their slots only while working.
+        """
+        # Set before stopping, so the "done" handler does not start others.
+        self._running = False
+        paused = []
         if interrupt:
-            for previewer in list(self._current_previewers.values()):
-                previewer.stop_generation()
+            for previewers in self._current_previewers.values():
+                for previewer in list(previewers):
+                    previewer.stop_generation()
 
             for previewers in self._previewers.values():
-                for previewer in previewers:
+                for unused_priority, unused_seq, previewer in previewers:
                     previewer.stop_generation()
         else:
-            for previewer in list(self._current_previewers.values()):
-                previewer.pause_generation()
+            for previewers in self._current_previewers.values():
+                for previewer in list(previewers):
+                    previewer.pause_generation()
+                    paused.append(previewer)
 
             for previewers in self._previewers.values():
-                for previewer in previewers:
+                for unused_priority, unused_seq, previewer in previewers:
                     previewer.pause_generation()
 
         try:
-            self._running = False
             yield
         except:
             self.warning("An exception occurred while the previewer was paused")
             raise
         finally:
             self._running = True
+            for previewer in paused:
+                if previewer in self._current_previewers[previewer.track_type]:
+                    # Not done in the meantime, resume it.
+                    previewer.start_generation()
             for track_type in self._previewers:
-                self.__start_next_previewer(track_type)
+                self.__start_next_previewers(track_type)
 
     def __previewer_done_cb(self, previewer):
-        self.__start_next_previewer(previewer.track_type)
+        running = self._current_previewers[previewer.track_type]
+        if previewer in running:
+            running.remove(previewer)
+            previewer.disconnect_by_func(self.__previewer_done_cb)
 
-    def __start_next_previewer(self, track_type):
-        next_previewer = self._current_previewers.pop(track_type, None)
-        if next_previewer:
-            next_previewer.disconnect_by_func(self.__previewer_done_cb)
+        self.__start_next_previewers(previewer.track_type)
 
+    def __start_next_previewers(self, track_type):
         if not self._running:
             return
 
-        if self._previewers[track_type]:
-            self._start_previewer(self._previewers[track_type].pop())
+        queue = self._previewers[track_type]
+        running = self._current_previewers[track_type]
+        while queue and len(running) < self.max_jobs:
+            unused_priority, unused_seq, previewer = heapq.heappop(queue)
+            self._queued.discard(previewer)
+            self._start_previewer(previewer)
 
 
 class Previewer(GObject.Object):
@@ -366,6 +597,8 @@ class Previewer(GObject.Object):
 
     Attributes:
         track_type (GES.TrackType): The type of content.
+        priority (int): The priority of the previewer in the queue of the
+            PreviewGeneratorManager, lower values being started first.
     """
 
     # We only need one PreviewGeneratorManager to manage all previewers.
@@ -374,6 +607,7 @@ class Previewer(GObject.Object):
     def __init__(self, track_type, max_cpu_usage):
         GObject.Object.__init__(self)
         self.track_type = track_type
+        self.priority = 0
         self._max_cpu_usage = max_cpu_usage
 
     def start_generation(self):
@@ -397,17 +631,34 @@ class Previewer(GObject.Object):
         """Gets the interval for which a thumbnail is displayed.
 
         Returns:
-            int: a duration in nanos, multiple of THUMB_PERIOD.
+            int: a duration in nanos, THUMB_PERIOD multiplied by a power of two,
+                so the thumbnails are taken from the levels of the pyramid.
         """
         interval = Zoomable.pixel_to_ns(thumb_width + THUMB_MARGIN_PX)
-        # Make sure the thumb interval is a multiple of THUMB_PERIOD.
-        quantized = quantize(interval, THUMB_PERIOD)
-        # Make sure the quantized thumb interval fits
-        # the thumb and the margin.
-        if quantized < interval:
-            quantized += THUMB_PERIOD
-        # Make sure we don't show thumbs more often than THUMB_PERIOD.
-        return max(THUMB_PERIOD, quantized)
+        coarsest = THUMB_PERIOD * 2 ** (THUMB_LEVELS - 1)
+        if interval > coarsest:
+            # Beyond the pyramid, use multiples of its coarsest level.
+            return -(-interval // coarsest) * coarsest
+
+        # Make sure the interval fits the thumb and the margin.
+        quantized = THUMB_PERIOD
+        while quantized < interval:
+            quantized *= 2
+        return quantized
+
+    @staticmethod
+    def thumb_level(position):
+        """Gets the coarsest pyramid level containing the specified position.
+
+        Returns:
+            int: The level, 0 being the finest one.
+        """
+        level = 0
+        period = THUMB_PERIOD
+        while level < THUMB_LEVELS - 1 and position % (period * 2) == 0:
+            period *= 2
+            level += 1
+        return level
 
 
 class ImagePreviewer(Gtk.Layout, Previewer, Zoomable, Loggable):
@@ -556,10 +807,17 @@ class ImagePreviewer(Gtk.Layout, Previewer, Zoomable, Loggable):
 class AssetPreviewer(Previewer, Loggable):
     """Previewer for creating thumbnails for a video asset.
 
+    The thumbnails are created by seeking to each missing position, or,
+    when many positions are missing, by decoding once the range they span.
+
     Attributes:
         thumb_cache (ThumbnailCache): The pixmaps persistent cache.
+        keyframes_only (bool): Whether to decode only the keyframes when
+            decoding a range, which is faster but less accurate.
     """
 
+    keyframes_only = False
+
     # We could define them in Previewer, but for some reason they are ignored.
     __gsignals__ = PREVIEW_GENERATOR_SIGNALS
 
@@ -581,6 +839,10 @@ class AssetPreviewer(Previewer, Loggable):
         self.position = -1
         # The positions for which we failed to get a pixbuf.
         self.failures = set()
+        # Whether the pipeline is playing a range to create the thumbnails.
+        self.__linear = False
+        # The (start, stop) range being played to create the thumbnails.
+        self.__linear_range = (0, 0)
 
         self.thumb_height = THUMB_HEIGHT
         self.thumb_width = 0
@@ -667,6 +929,10 @@ class AssetPreviewer(Previewer, Loggable):
             self.stop_generation()
             return
 
+        if self._should_thumbnail_linearly():
+            self._start_linear_thumbnailing()
+            return
+
         usage_percent = self.cpu_usage_tracker.usage()
         if usage_percent < self._max_cpu_usage:
             self.interval *= 0.9
@@ -681,6 +947,66 @@ class AssetPreviewer(Previewer, Loggable):
                                               self._create_next_thumb_cb,
                                               priority=GLib.PRIORITY_LOW)
 
+    def _should_thumbnail_linearly(self):
+        """Checks whether decoding the missing range is cheaper than seeking."""
+        if len(self.queue) < LINEAR_THUMBNAILING_MIN_THUMBS:
+            return False
+
+        span = max(self.queue) - min(self.queue) + THUMB_PERIOD
+        return len(self.queue) >= LINEAR_THUMBNAILING_MIN_DENSITY * span / THUMB_PERIOD
+
+    def _start_linear_thumbnailing(self):
+        """Plays the range of the missing thumbnails to capture them all."""
+        start = min(self.queue)
+        stop = max(self.queue) + 1
+        self.debug("Thumbnailing linearly %s - %s, keyframes only: %s",
+                   Gst.TIME_ARGS(start), Gst.TIME_ARGS(stop), self.keyframes_only)
+        self.__linear = True
+        self.__linear_range = (start, stop)
+
+        # The videorate element outputs the frames at THUMB_PERIOD, and
+        # the gdkpixbufsink posts each of them.
+        self.pipeline.use_clock(create_cpu_throttling_clock(self._max_cpu_usage))
+        flags = Gst.SeekFlags.FLUSH
+        if self.keyframes_only:
+            flags |= Gst.SeekFlags.KEY_UNIT | Gst.SeekFlags.TRICKMODE | \
+                Gst.SeekFlags.TRICKMODE_KEY_UNITS
+        else:
+            flags |= Gst.SeekFlags.ACCURATE
+        self.pipeline.seek(1.0, Gst.Format.TIME, flags,
+                           Gst.SeekType.SET, start,
+                           Gst.SeekType.SET, stop)
+        self.pipeline.set_state(Gst.State.PLAYING)
+
+    def __add_linear_thumbnail(self, struct):
+        """Handles a thumbnail created while playing a range."""
+        stream_time = struct.get_value("stream-time")
+        position = quantize(stream_time + THUMB_PERIOD // 2, THUMB_PERIOD)
+        if position in self.thumb_cache:
+            return
+
+        pixbuf = struct.get_value("pixbuf")
+        self.thumb_cache[position] = pixbuf
+        self._set_pixbuf(pixbuf, position)
+        with contextlib.suppress(ValueError):
+            self.queue.remove(position)
+
+    def __linear_thumbnailing_done(self):
+        """Handles the end of the range played to create the thumbnails."""
+        start, stop = self.__linear_range
+        missed = [position for position in self.queue if start <= position < stop]
+        self.debug("Linear thumbnailing done, %d positions missed", len(missed))
+        self.failures.update(missed)
+        # The queue might have been updated meanwhile with other positions.
+        self.queue = [position for position in self.queue if position not in self.failures]
+        self.__linear = False
+        if not self.queue:
+            self.stop_generation()
+            return
+
+        self.pipeline.set_state(Gst.State.PAUSED)
+        self._schedule_next_thumb_generation()
+
     def _start_thumbnailing_cb(self):
         if not self.__start_id:
             # Can happen if stopGeneration is called because the clip has been
@@ -745,6 +1071,18 @@ class AssetPreviewer(Previewer, Loggable):
         """
 
     def __bus_message_cb(self, unused_bus, message):
+        if self.__linear:
+            if message.src == self.gdkpixbufsink and \
+                    message.type == Gst.MessageType.ELEMENT and \
+                    message.get_structure().get_name() == "pixbuf":
+                self.__add_linear_thumbnail(message.get_structure())
+            elif message.type == Gst.MessageType.EOS:
+                self.__linear_thumbnailing_done()
+            elif message.type == Gst.MessageType.ERROR:
+                self.warning("Linear thumbnailing failed: %s", message.parse_error())
+                self.__linear_thumbnailing_done()
+            return Gst.BusSyncReply.PASS
+
         if message.src == self.pipeline and \
                 message.type == Gst.MessageType.STATE_CHANGED:
             if message.parse_state_changed()[1] == Gst.State.PAUSED:
@@ -824,12 +1162,16 @@ class AssetPreviewer(Previewer, Loggable):
             self.pipeline.set_state(Gst.State.NULL)
             self.pipeline.get_state(Gst.CLOCK_TIME_NONE)
             self.pipeline = None
+        self.__linear = False
 
         self.emit("done")
 
     def pause_generation(self):
         if self.pipeline:
             self.pipeline.set_state(Gst.State.READY)
+        # When resumed, the pipeline is prerolled again and the missing
+        # thumbnails are created in whichever mode fits better.
+        self.__linear = False
 
 
 class VideoPreviewer(Gtk.Layout, AssetPreviewer, Zoomable):
@@ -846,11 +1188,13 @@ class VideoPreviewer(Gtk.Layout, AssetPreviewer, Zoomable):
     def __init__(self, ges_elem, max_cpu_usage):
         Gtk.Layout.__init__(self)
         Zoomable.__init__(self)
+        # Set before initializing AssetPreviewer so it's available for
+        # ranking when the previewer is added to the queue.
+        self.ges_elem: GES.VideoUriSource = ges_elem
         AssetPreviewer.__init__(self, get_proxy_target(ges_elem), max_cpu_usage)
 
         self.get_style_context().add_class("VideoPreviewer")
 
-        self.ges_elem: GES.VideoUriSource = ges_elem
         self.thumbs = {}
 
         # Connect signals and fire things up
@@ -901,10 +1245,15 @@ class VideoPreviewer(Gtk.Layout, AssetPreviewer, Zoomable):
 
             thumbs[position] = thumb
             if position in self.thumb_cache:
-                pixbuf = self.thumb_cache[position]
+                pixbuf = self.thumb_cache.get_pixbuf(position, self.thumb_height)
                 thumb.set_from_pixbuf(pixbuf)
                 thumb.set_visible(True)
             else:
+                # Meanwhile, show the closest thumbnail already available.
+                nearest = self.thumb_cache.nearest_position(position, interval // 2)
+                if nearest is not None:
+                    thumb.set_from_pixbuf(self.thumb_cache.get_pixbuf(nearest, self.thumb_height))
+                    thumb.set_visible(True)
                 if position not in self.failures and position != self.position:
                     queue.append(position)
 
@@ -912,6 +1261,9 @@ class VideoPreviewer(Gtk.Layout, AssetPreviewer, Zoomable):
             self.remove(thumb)
         self.thumbs = thumbs
 
+        # Fill the pyramid coarse-to-fine, so when zooming out the
+        # thumbnails are already available.
+        queue.sort(key=lambda position: (-self.thumb_level(position), position))
         self.queue = queue
         if queue:
             self.become_controlled()
@@ -924,6 +1276,8 @@ class VideoPreviewer(Gtk.Layout, AssetPreviewer, Zoomable):
             # Can happen because we don't stop the pipeline before
             # updating the thumbnails in _update_thumbnails.
             return
+        if pixbuf.props.height != self.thumb_height and position in self.thumb_cache:
+            pixbuf = self.thumb_cache.get_pixbuf(position, self.thumb_height)
         thumb.set_from_pixbuf(pixbuf)
 
     def release(self):
@@ -961,48 +1315,345 @@ class Thumbnail(Gtk.Image):
         self.props.height_request = height
 
 
+class PixbufCache(Loggable):
+    """Memory-bounded LRU cache of decoded thumbnails, shared process-wide.
+
+    The pixbufs are keyed by (uri, position, height).
+
+    Attributes:
+        max_size (int): The maximum size of the cached pixels, in bytes.
+        size (int): The size of the cached pixels, in bytes.
+        hits (int): The number of lookups which found a pixbuf.
+        misses (int): The number of lookups which did not find a pixbuf.
+    """
+
+    def __init__(self, max_size):
+        Loggable.__init__(self)
+        self.max_size = max_size
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self._pixbufs = collections.OrderedDict()
+
+    def __len__(self):
+        return len(self._pixbufs)
+
+    def get(self, key):
+        """Gets the pixbuf for the specified key, or None if not cached."""
+        try:
+            pixbuf = self._pixbufs[key]
+        except KeyError:
+            self.misses += 1
+            return None
+
+        self._pixbufs.move_to_end(key)
+        self.hits += 1
+        return pixbuf
+
+    def set(self, key, pixbuf):
+        """Caches the pixbuf for the specified key, evicting old pixbufs."""
+        self.remove(key)
+        self._pixbufs[key] = pixbuf
+        self.size += pixbuf.get_byte_length()
+        self.trim()
+
+    def remove(self, key):
+        """Removes the pixbuf for the specified key, if cached."""
+        pixbuf = self._pixbufs.pop(key, None)
+        if pixbuf:
+            self.size -= pixbuf.get_byte_length()
+
+    def remove_uri(self, uri):
+        """Removes the pixbufs of the specified URI."""
+        for key in [key for key in self._pixbufs if key[0] == uri]:
+            self.remove(key)
+
+    def trim(self):
+        """Evicts the least recently used pixbufs until the size fits."""
+        while self.size > self.max_size and self._pixbufs:
+            unused_key, pixbuf = self._pixbufs.popitem(last=False)
+            self.size -= pixbuf.get_byte_length()
+
+    def log_stats(self):
+        """Logs the usage statistics, useful for tuning the size."""
+        lookups = self.hits + self.misses
+        self.debug("%d pixbufs, %d/%d bytes, %d hits, %d misses (%.1f%% hits)",
+                   len(self), self.size, self.max_size, self.hits, self.misses,
+                   100 * self.hits / lookups if lookups else 0)
+
+
+class ThumbnailStore(Loggable):
+    """Persistent storage shared by the thumbnail caches of all the assets.
+
+    The thumbnails are kept in a single sqlite3 database in WAL mode. When
+    the size of the thumbnails exceeds `max_size`, the thumbnails of the
+    least recently used assets are evicted.
+
+    The database is opened only when it's first needed, and opening it does
+    not depend on the number of assets it contains.
+
+    Attributes:
+        path (str): The path of the database file.
+        max_size (int): The maximum size of the thumbnails, in bytes.
+    """
+
+    def __init__(self, path, max_size):
+        Loggable.__init__(self)
+        self.path = path
+        self.max_size = max_size
+        self.__db = None
+        # The total size of the thumbnails, computed when first needed.
+        self.__total_size = None
+
+    @property
+    def _db(self):
+        if not self.__db:
+            self.log("Opening the thumbnails store %s", self.path)
+            self.__db = sqlite3.connect(self.path)
+            self.__db.execute("PRAGMA journal_mode=WAL")
+            self.__db.execute("PRAGMA synchronous=NORMAL")
+            self.__db.execute("CREATE TABLE IF NOT EXISTS Assets "
+                              "(Id INTEGER NOT NULL PRIMARY KEY, "
+                              " Key TEXT NOT NULL UNIQUE, "
+                              " Size INTEGER NOT NULL DEFAULT 0, "
+                              " LastAccess REAL NOT NULL DEFAULT 0)")
+            self.__db.execute("CREATE TABLE IF NOT EXISTS Thumbs "
+                              "(Asset INTEGER NOT NULL, "
+                              " Time INTEGER NOT NULL, "
+                              " Jpeg BLOB NOT NULL, "
+                              " PRIMARY KEY (Asset, Time))")
+        return self.__db
+
+    def asset_id(self, key):
+        """Gets the ID of the asset with the specified key.
+
+        The asset is created if it does not exist yet, and it's marked as
+        the most recently used one.
+
+        Args:
+            key (str): The cache key of the asset.
+
+        Returns:
+            int: The ID of the asset in the store.
+        """
+        now = time.time()
+        row = self._db.execute("SELECT Id FROM Assets WHERE Key = ?", (key,)).fetchone()
+        if row:
+            self._db.execute("UPDATE Assets SET LastAccess = ? WHERE Id = ?", (now, row[0]))
+            return row[0]
+
+        cur = self._db.execute("INSERT INTO Assets (Key, LastAccess) VALUES (?, ?)", (key, now))
+        return cur.lastrowid
+
+    def positions(self, asset_id):
+        """Gets the positions for which the asset has thumbnails."""
+        cur = self._db.execute("SELECT Time FROM Thumbs WHERE Asset = ?", (asset_id,))
+        return {row[0] for row in cur.fetchall()}
+
+    def get(self, asset_id, position):
+        """Gets the JPEG data of a thumbnail, or None if missing."""
+        row = self._db.execute("SELECT Jpeg FROM Thumbs WHERE Asset = ? AND Time = ?",
+                               (asset_id, position)).fetchone()
+        return row[0] if row else None
+
+    def thumbnails(self, asset_id):
+        """Gets the (position, JPEG data) pairs of the thumbnails of the asset."""
+        return self._db.execute("SELECT Time, Jpeg FROM Thumbs WHERE Asset = ?",
+                                (asset_id,)).fetchall()
+
+    def get_any(self, asset_id):
+        """Gets the JPEG data of any thumbnail of the asset, or None."""
+        row = self._db.execute("SELECT Jpeg FROM Thumbs WHERE Asset = ? LIMIT 1",
+                               (asset_id,)).fetchone()
+        return row[0] if row else None
+
+    def set(self, asset_id, position, jpeg):
+        """Sets the JPEG data of a thumbnail, replacing the existing one."""
+        row = self._db.execute("SELECT length(Jpeg) FROM Thumbs WHERE Asset = ? AND Time = ?",
+                               (asset_id, position)).fetchone()
+        delta = len(jpeg) - (row[0] if row else 0)
+        self._db.execute("INSERT OR REPLACE INTO Thumbs VALUES (?, ?, ?)",
+                         (asset_id, position, sqlite3.Binary(jpeg)))
+        self._db.execute("UPDATE Assets SET Size = Size + ? WHERE Id = ?", (delta, asset_id))
+        if self.__total_size is not None:
+            self.__total_size += delta
+
+    def remove(self, asset_id):
+        """Removes the asset and its thumbnails."""
+        row = self._db.execute("SELECT Size FROM Assets WHERE Id = ?", (asset_id,)).fetchone()
+        self._db.execute("DELETE FROM Thumbs WHERE Asset = ?", (asset_id,))
+        self._db.execute("DELETE FROM Assets WHERE Id = ?", (asset_id,))
+        if row and self.__total_size is not None:
+            self.__total_size -= row[0]
+
+    @property
+    def total_size(self):
+        """The total size of the thumbnails in the store, in bytes."""
+        if self.__total_size is None:
+            row = self._db.execute("SELECT COALESCE(SUM(Size), 0) FROM Assets").fetchone()
+            self.__total_size = row[0]
+        return self.__total_size
+
+    def evict(self, protected_ids=()):
+        """Removes the least recently used assets until the size fits.
+
+        Args:
+            protected_ids (Iterable[int]): The IDs of the assets in use,
+                which must not be evicted.
+        """
+        if self.total_size <= self.max_size:
+            return
+
+        rows = self._db.execute("SELECT Id, Size FROM Assets ORDER BY LastAccess, Id").fetchall()
+        for asset_id, size in rows:
+            if self.total_size <= self.max_size:
+                break
+            if asset_id in protected_ids:
+                continue
+            self.debug("Evicting %d bytes of thumbnails of asset %d", size, asset_id)
+            self.remove(asset_id)
+
+    def commit(self, protected_ids=()):
+        """Evicts what does not fit and saves the store on disk."""
+        if not self.__db:
+            return
+        self.evict(protected_ids)
+        self.__db.commit()
+
+
 class ThumbnailCache(Loggable):
     """Cache for the thumbnails of an asset.
 
-    Uses a separate sqlite3 database for each asset.
+    The thumbnails of all the assets are kept in a shared ThumbnailStore,
+    in the user cache.
+
+    When a shared cache directory is used, the thumbnails of each asset are
+    also published there in a separate file, which is only ever replaced
+    as a whole, and imported when the asset has no thumbnails locally. The
+    shared files are never evicted, and the store is not kept on the shared
+    directory, as it's updated whenever a thumbnail is read.
+
+    Attributes:
+        height (int): The height of the thumbnails.
+        asset_id (int): The ID of the asset in the store.
+        store_max_size (int): The maximum size of the shared store, in bytes.
     """
 
     # The cache of caches.
     caches_by_uri = {}
 
+    # The decoded thumbnails of all the assets.
+    pixbuf_cache = PixbufCache(GlobalSettings.thumbnails_memory_cache_max_size * 1024 * 1024)
+
+    store_max_size = 1024 * 1024 * 1024
+    # The store shared by all the caches.
+    _store = None
+
     def __init__(self, uri):
         Loggable.__init__(self)
         self.uri = uri
-        self.dbfile = self.dbfile_name(uri)
-        self.log("Caching thumbs for %s in %s", uri, self.dbfile)
-        self._db = sqlite3.connect(self.dbfile)
-        self._cur = self._db.cursor()
-        self._cur.execute("CREATE TABLE IF NOT EXISTS Thumbs "
-                          "(Time INTEGER NOT NULL PRIMARY KEY, "
-                          " Jpeg BLOB NOT NULL)")
+        self.height = THUMB_HEIGHT
+        self.key = self.cache_key(uri)
+        self.store = self.get_store()
+        self.log("Caching thumbs for %s in %s as %s", uri, self.store.path, self.key)
+        self.asset_id = self.store.asset_id(self.key)
         # The cached (width, height) of the images.
         self._image_size = (0, 0)
-        # The cached positions available in the database.
-        self.positions = self.__existing_positions()
+        # The cached positions available in the store.
+        self.positions = self.store.positions(self.asset_id)
+        # The same positions, sorted, for finding the closest thumbnail.
+        self.__sorted_positions = sorted(self.positions)
         # The ID of the autosave event.
         self.__autosave_id = None
-
-    def __existing_positions(self):
-        self._cur.execute("SELECT Time FROM Thumbs")
-        return {row[0] for row in self._cur.fetchall()}
+        # The number of thumbnails known to be in the shared cache.
+        self.__published_count = 0
+        if not self.positions:
+            self.__import_shared()
 
     @staticmethod
-    def dbfile_name(uri):
-        """Returns the cache file path for the specified URI."""
-        filename = gen_filename(Gst.uri_get_location(uri), "db")
+    def cache_key(uri):
+        """Returns the key identifying the thumbnails of the specified URI."""
+        return MediaCache.filename(Gst.uri_get_location(uri), "thumbs")
+
+    @classmethod
+    def get_store(cls):
+        """Gets the store shared by all the caches."""
         thumbs_dir = xdg_cache_home("thumbs")
-        thumbs_cache_dir = os.path.join(thumbs_dir, "v1")
+        thumbs_cache_dir = os.path.join(thumbs_dir, "v2")
 
         if not os.path.exists(thumbs_cache_dir):
             os.makedirs(thumbs_cache_dir)
-            GLib.idle_add(delete_all_files_in_dir, thumbs_dir)
+            for old_cache_dir in (thumbs_dir, os.path.join(thumbs_dir, "v1")):
+                GLib.idle_add(delete_all_files_in_dir, old_cache_dir)
+
+        path = os.path.join(thumbs_cache_dir, "thumbs.db")
+        if not cls._store or cls._store.path != path:
+            cls._store = ThumbnailStore(path, cls.store_max_size)
+        return cls._store
+
+    def shared_path(self):
+        """Gets the path of the file with the thumbnails in the shared cache.
+
+        Returns:
+            Optional[str]: The path, or None if no shared cache is used.
+        """
+        thumbs_dir = MediaCache.shared_directory("thumbs", "v2")
+        if not thumbs_dir:
+            return None
+        return os.path.join(thumbs_dir, self.key)
+
+    def __import_shared(self):
+        """Copies in the store the thumbnails published in the shared cache."""
+        path = self.shared_path()
+        if not path or not os.path.exists(path):
+            return
 
-        return os.path.join(thumbs_cache_dir, filename)
+        try:
+            db = sqlite3.connect("file:%s?mode=ro&immutable=1" % urllib.parse.quote(path),
+                                 uri=True)
+            try:
+                rows = db.execute("SELECT Time, Jpeg FROM Thumbs").fetchall()
+            finally:
+                db.close()
+        except sqlite3.Error as e:
+            self.warning("Failed reading the shared thumbnails %s: %s", path, e)
+            return
+
+        self.debug("Importing %d shared thumbnails from %s", len(rows), path)
+        for position, jpeg in rows:
+            self.store.set(self.asset_id, position, jpeg)
+            self.positions.add(position)
+        self.__sorted_positions = sorted(self.positions)
+        self.__published_count = len(self.positions)
+
+    def __publish(self):
+        """Replaces the thumbnails published in the shared cache."""
+        path = self.shared_path()
+        if not path or self.__published_count == len(self.positions):
+            return
+
+        fd, tmp_path = tempfile.mkstemp(suffix=".thumbs", dir=os.path.dirname(self.store.path))
+        os.close(fd)
+        try:
+            db = sqlite3.connect(tmp_path)
+            try:
+                db.execute("CREATE TABLE Thumbs "
+                           "(Time INTEGER NOT NULL PRIMARY KEY, Jpeg BLOB NOT NULL)")
+                db.executemany("INSERT INTO Thumbs VALUES (?, ?)",
+                               self.store.thumbnails(self.asset_id))
+                db.commit()
+            finally:
+                db.close()
+
+            part_path = path + ".part"
+            shutil.copyfile(tmp_path, part_path)
+            os.replace(part_path, path)
+            self.__published_count = len(self.positions)
+            self.debug("Published %d thumbnails to %s", self.__published_count, path)
+        except (OSError, sqlite3.Error) as e:
+            self.warning("Failed publishing the thumbnails %s: %s", path, e)
+        finally:
+            os.unlink(tmp_path)
 
     @classmethod
     def update_caches(cls):
@@ -1013,11 +1664,12 @@ class ThumbnailCache(Loggable):
         """
         changed_files_uris = []
         for uri, cache in cls.caches_by_uri.items():
-            dbfile = cls.dbfile_name(uri)
-            if cache.dbfile != dbfile:
+            if cache.key != cls.cache_key(uri):
                 changed_files_uris.append(uri)
         for uri in changed_files_uris:
-            del cls.caches_by_uri[uri]
+            cache = cls.caches_by_uri.pop(uri)
+            cache.store.remove(cache.asset_id)
+            cls.pixbuf_cache.remove_uri(uri)
         return changed_files_uris
 
     @classmethod
@@ -1053,10 +1705,9 @@ class ThumbnailCache(Loggable):
             List[int]: The width and height of the images in the cache.
         """
         if self._image_size[0] == 0:
-            self._cur.execute("SELECT * FROM Thumbs LIMIT 1")
-            row = self._cur.fetchone()
-            if row:
-                pixbuf = self.__pixbuf_from_row(row)
+            jpeg = self.store.get_any(self.asset_id)
+            if jpeg:
+                pixbuf = self.__pixbuf_from_jpeg(jpeg)
                 self._image_size = (pixbuf.get_width(), pixbuf.get_height())
         return self._image_size
 
@@ -1070,26 +1721,75 @@ class ThumbnailCache(Loggable):
         return self[position]
 
     @staticmethod
-    def __pixbuf_from_row(row):
-        """Returns the GdkPixbuf.Pixbuf from the specified row."""
-        jpeg = row[1]
+    def __pixbuf_from_jpeg(jpeg):
+        """Returns the GdkPixbuf.Pixbuf from the specified JPEG data."""
         loader = GdkPixbuf.PixbufLoader.new()
         loader.write(jpeg)
         loader.close()
         pixbuf = loader.get_pixbuf()
         return pixbuf
 
+    def nearest_position(self, position, max_distance):
+        """Gets the available position closest to the specified position.
+
+        Args:
+            position (int): The position for which a thumbnail is needed.
+            max_distance (int): The maximum distance from `position`.
+
+        Returns:
+            Optional[int]: The closest position having a thumbnail, if any.
+        """
+        index = bisect.bisect_left(self.__sorted_positions, position)
+        candidates = self.__sorted_positions[max(0, index - 1):index + 1]
+        nearest = min(candidates, key=lambda pos: abs(pos - position), default=None)
+        if nearest is None or abs(nearest - position) > max_distance:
+            return None
+        return nearest
+
+    def get_pixbuf(self, position, height):
+        """Gets the thumbnail for the specified position at the specified height.
+
+        Thumbnails with a different height than the stored ones are scaled
+        from the stored ones instead of being generated again.
+
+        Args:
+            position (int): The position of the thumbnail.
+            height (int): The height of the thumbnail.
+
+        Returns:
+            GdkPixbuf.Pixbuf: The thumbnail.
+        """
+        if height == self.height:
+            return self[position]
+
+        key = (self.uri, position, height)
+        pixbuf = self.pixbuf_cache.get(key)
+        if pixbuf:
+            return pixbuf
+
+        pixbuf = self[position]
+        width = max(1, round(pixbuf.props.width * height / pixbuf.props.height))
+        pixbuf = pixbuf.scale_simple(width, height, GdkPixbuf.InterpType.BILINEAR)
+        self.pixbuf_cache.set(key, pixbuf)
+        return pixbuf
+
     def __contains__(self, position):
-        """Returns whether a row for the specified position exists in the DB."""
+        """Returns whether a thumbnail for the specified position exists."""
         return position in self.positions
 
     def __getitem__(self, position):
         """Gets the GdkPixbuf.Pixbuf for the specified position."""
-        self._cur.execute("SELECT * FROM Thumbs WHERE Time = ?", (position,))
-        row = self._cur.fetchone()
-        if not row:
+        key = (self.uri, position, self.height)
+        pixbuf = self.pixbuf_cache.get(key)
+        if pixbuf:
+            return pixbuf
+
+        jpeg = self.store.get(self.asset_id, position)
+        if not jpeg:
             raise KeyError(position)
-        return self.__pixbuf_from_row(row)
+        pixbuf = self.__pixbuf_from_jpeg(jpeg)
+        self.pixbuf_cache.set(key, pixbuf)
+        return pixbuf
 
     def __setitem__(self, position, pixbuf):
         """Sets a GdkPixbuf.Pixbuf for the specified position."""
@@ -1098,11 +1798,11 @@ class ThumbnailCache(Loggable):
         if not success:
             self.warning("JPEG compression failed")
             return
-        blob = sqlite3.Binary(jpeg)
-        # Replace if a row with the same time already exists.
-        self._cur.execute("DELETE FROM Thumbs WHERE  time=?", (position,))
-        self._cur.execute("INSERT INTO Thumbs VALUES (?,?)", (position, blob,))
-        self.positions.add(position)
+        self.store.set(self.asset_id, position, jpeg)
+        if position not in self.positions:
+            self.positions.add(position)
+            bisect.insort(self.__sorted_positions, position)
+        self.pixbuf_cache.set((self.uri, position, self.height), pixbuf)
         self._schedule_commit()
 
     def _schedule_commit(self):
@@ -1125,9 +1825,13 @@ class ThumbnailCache(Loggable):
         return False
 
     def commit(self):
-        """Saves the cache on disk (in the database)."""
-        self._db.commit()
-        self.log("Saved thumbnail cache file")
+        """Saves the cache on disk (in the shared store)."""
+        protected_ids = {cache.asset_id for cache in self.caches_by_uri.values()}
+        protected_ids.add(self.asset_id)
+        self.store.commit(protected_ids)
+        self.log("Saved thumbnail cache")
+        self.__publish()
+        self.pixbuf_cache.log_stats()
 
 
 def delete_all_files_in_dir(path):
@@ -1140,18 +1844,12 @@ def delete_all_files_in_dir(path):
         pass
 
 
-def gen_filename(uri, extension):
-    """Generates the cache filename for the specified URI."""
-    uri_hash = hashlib.sha256(uri.encode("UTF-8")).hexdigest()
-    return "{}_{}_{}.{}".format(os.path.basename(uri), uri_hash, os.path.getmtime(uri), extension)
-
-
 def get_wavefile_location_for_uri(uri):
     """Computes the URI where the wave.npy file should be stored."""
     if ProxyManager.is_proxy_asset(uri):
         uri = ProxyManager.get_target_uri(uri)
-    filename = gen_filename(Gst.uri_get_location(uri), "wave.npy")
-    waves_dir = xdg_cache_home("waves")
+    filename = MediaCache.filename(Gst.uri_get_location(uri), "wave.npy")
+    waves_dir = MediaCache.shared_directory("waves") or xdg_cache_home("waves")
     cache_dir = os.path.join(waves_dir, "v2")
 
     if not os.path.exists(cache_dir):
@@ -1162,6 +1860,221 @@ def get_wavefile_location_for_uri(uri):
     return os.path.join(cache_dir, filename)
 
 
+class WaveformTileCache(Loggable):
+    """Memory-bounded LRU cache of waveform tiles, shared process-wide.
+
+    The tiles are surfaces WAVEFORM_TILE_WIDTH wide, keyed by
+    (uri, zoom level, height, rate, index). The missing tiles are rendered
+    by a worker thread, the most recently requested first, and the widgets
+    which requested them are redrawn when they are ready. When too many
+    tiles are waiting, the oldest requests are dropped and the tiles are
+    requested again if they are drawn later.
+
+    Attributes:
+        max_size (int): The maximum size of the cached tiles, in bytes.
+        size (int): The size of the cached tiles, in bytes.
+    """
+
+    def __init__(self, max_size):
+        Loggable.__init__(self)
+        self.max_size = max_size
+        self.size = 0
+        # The (surface, size) of the tiles.
+        self._tiles = collections.OrderedDict()
+        # The widgets waiting for each tile being rendered.
+        self._pending = {}
+        # The jobs waiting for the worker, the newest at the end.
+        self._jobs = collections.deque()
+        self._jobs_condition = threading.Condition()
+        self._worker = None
+
+    def __len__(self):
+        return len(self._tiles)
+
+    def get(self, key):
+        """Gets the surface for the specified key, or None if not cached."""
+        try:
+            surface, unused_size = self._tiles[key]
+        except KeyError:
+            return None
+
+        self._tiles.move_to_end(key)
+        return surface
+
+    def set(self, key, surface, size):
+        """Caches the surface for the specified key, evicting old tiles."""
+        self.remove(key)
+        self._tiles[key] = (surface, size)
+        self.size += size
+        self.trim()
+
+    def remove(self, key):
+        """Removes the tile for the specified key, if cached."""
+        tile = self._tiles.pop(key, None)
+        if tile:
+            self.size -= tile[1]
+
+    def remove_uri(self, uri):
+        """Removes the tiles of the specified URI."""
+        for key in [key for key in self._tiles if key[0] == uri]:
+            self.remove(key)
+
+    def trim(self):
+        """Evicts the least recently used tiles until the size fits."""
+        while self.size > self.max_size and self._tiles:
+            unused_key, (unused_surface, size) = self._tiles.popitem(last=False)
+            self.size -= size
+
+    def request(self, key, widget, samples, mins, width, height, scale):
+        """Schedules the rendering of a tile.
+
+        Args:
+            key (tuple): The key of the tile.
+            widget (Gtk.Widget): The widget to redraw when the tile is ready.
+            samples (numpy.ndarray): The peaks to draw.
+            mins (numpy.ndarray): The mins to draw under the peaks.
+            width (int): The width of the tile.
+            height (int): The height of the tile.
+            scale (float): The factor for scaling the samples to the height.
+        """
+        if key in self._pending:
+            if widget not in self._pending[key]:
+                self._pending[key].append(widget)
+            return
+
+        self._pending[key] = [widget]
+        with self._jobs_condition:
+            self._jobs.append((key, samples, mins, width, height, scale))
+            while len(self._jobs) > MAX_PENDING_WAVEFORM_TILES:
+                stale_job = self._jobs.popleft()
+                self._pending.pop(stale_job[0], None)
+            self._jobs_condition.notify()
+
+        if not self._worker:
+            self._worker = threading.Thread(target=self.__render_tiles,
+                                            name="waveform-tiles", daemon=True)
+            self._worker.start()
+
+    def __render_tiles(self):
+        while True:
+            with self._jobs_condition:
+                while not self._jobs:
+                    self._jobs_condition.wait()
+                key, samples, mins, width, height, scale = self._jobs.pop()
+
+            try:
+                surface = renderer.fill_surface(samples, width, height, scale, mins)
+            except Exception as e:  # pylint: disable=broad-except
+                self.error("Failed rendering the waveform tile %s: %s", key, e)
+                GLib.idle_add(self.__tile_rendered_cb, key, None, 0)
+                continue
+
+            GLib.idle_add(self.__tile_rendered_cb, key, surface, width * max(height, 0) * 4)
+
+    def __tile_rendered_cb(self, key, surface, size):
+        if surface is None:
+            # The rendering failed, the tile can be requested again.
+            self._pending.pop(key, None)
+            return False
+
+        self.set(key, surface, size)
+        for widget in self._pending.pop(key, []):
+            widget.queue_draw()
+        return False
+
+
+class WaveformCache(Loggable):
+    """Cache for the waveform of an asset, shared by all its clips.
+
+    The peaks are memory-mapped from the .wave.npy file. Coarser levels,
+    decimated by 2, 4, 8, etc. keep the min, max and RMS of the peaks they
+    cover, so drawing at any zoom level touches about as many samples as
+    there are pixels.
+
+    Attributes:
+        samples (numpy.ndarray): The peaks, one per SAMPLE_DURATION.
+        max_value (float): The largest peak.
+    """
+
+    # The cache of caches.
+    caches_by_uri = {}
+
+    # The rendered tiles of all the assets.
+    tiles = WaveformTileCache(32 * 1024 * 1024)
+
+    def __init__(self, uri, samples, wavefile=None):
+        Loggable.__init__(self)
+        self.uri = uri
+        self.wavefile = wavefile
+        self.samples = samples
+        self.max_value = float(samples.max()) if len(samples) else 0.0
+        # The (mins, maxs, rms) of each level, the first being the peaks.
+        self._levels = [(samples, samples, samples)]
+        self.__build_levels()
+
+    def __build_levels(self):
+        mins, maxs, rms = self._levels[-1]
+        while len(rms) > 1:
+            if len(rms) % 2:
+                mins = numpy.append(mins, mins[-1])
+                maxs = numpy.append(maxs, maxs[-1])
+                rms = numpy.append(rms, rms[-1])
+            mins = mins.reshape(-1, 2).min(axis=1)
+            maxs = maxs.reshape(-1, 2).max(axis=1)
+            rms = numpy.sqrt(numpy.square(rms.reshape(-1, 2), dtype=numpy.float32).mean(axis=1))
+            self._levels.append((mins, maxs, rms))
+
+    def __len__(self):
+        return len(self.samples)
+
+    @classmethod
+    def get(cls, uri):
+        """Gets the WaveformCache for the specified URI.
+
+        Returns:
+            Optional[WaveformCache]: The cache, or None if the waveform
+            has not been generated yet.
+        """
+        if ProxyManager.is_proxy_asset(uri):
+            uri = ProxyManager.get_target_uri(uri)
+
+        wavefile = get_wavefile_location_for_uri(uri)
+        cache = cls.caches_by_uri.get(uri)
+        if cache and cache.wavefile == wavefile:
+            return cache
+
+        # The asset changed or the waveform is not loaded yet.
+        if cls.caches_by_uri.pop(uri, None):
+            cls.tiles.remove_uri(uri)
+        if not os.path.exists(wavefile):
+            return None
+
+        samples = numpy.load(wavefile, mmap_mode="r")
+        cache = WaveformCache(uri, samples, wavefile)
+        cache.debug("Loaded %d samples from %s", len(samples), wavefile)
+        cls.caches_by_uri[uri] = cache
+        return cache
+
+    def peaks(self, start, end, width):
+        """Gets the peaks in a range, at a resolution fit for drawing it.
+
+        Args:
+            start (int): The index of the first sample.
+            end (int): The index after the last sample.
+            width (int): The number of pixels the range will be drawn on.
+
+        Returns:
+            Tuple[numpy.ndarray, numpy.ndarray, numpy.ndarray]: Views of
+            the mins, maxs and RMS of the peaks in the range, at the
+            coarsest level still having at least one value per pixel.
+        """
+        samples_per_px = (end - start) // max(width, 1)
+        level = min(max(0, samples_per_px.bit_length() - 1), len(self._levels) - 1)
+        start >>= level
+        end = -(-end >> level)
+        return tuple(values[start:end] for values in self._levels[level])
+
+
 class AudioPreviewer(Gtk.Layout, Previewer, Zoomable, Loggable):
     """Audio previewer using the results from the "level" GStreamer element."""
 
@@ -1180,16 +2093,7 @@ class AudioPreviewer(Gtk.Layout, Previewer, Zoomable, Loggable):
 
         self.ges_elem = ges_elem
 
-        self.samples = None
-        self.peaks = None
-        self.surface = None
-        # The zoom level when self.surface has been created.
-        self._surface_zoom_level = 0
-        # The pixels range self.surface corresponds to.
-        self._surface_start_px = 0
-        self._surface_end_px = 0
-        # The playback rate from last time the surface was updated.
-        self._rate = 1.0
+        self.waveform = None
 
         # Guard against malformed URIs
         self.wavefile = None
@@ -1202,49 +2106,26 @@ class AudioPreviewer(Gtk.Layout, Previewer, Zoomable, Loggable):
         """Discards the audio samples so they are recreated."""
         self.stop_generation()
 
-        self.samples = None
-        self.surface = None
+        self.waveform = None
         self.queue_draw()
 
         self.become_controlled()
 
     def _start_levels_discovery(self):
-        filename = get_wavefile_location_for_uri(self._uri)
-        if os.path.exists(filename):
-            with open(filename, "rb") as samples:
-                self.samples = self._scale_samples(numpy.load(samples))
+        self.waveform = WaveformCache.get(self._uri)
+        if self.waveform:
             self.queue_draw()
         else:
-            self.wavefile = filename
+            self.wavefile = get_wavefile_location_for_uri(self._uri)
             self._launch_pipeline()
 
-    @staticmethod
-    def _scale_samples(samples):
-        max_value = max(samples)
-        has_sound = max_value > 0.0001
-        if has_sound:
-            # TODO: The 65 value comes from the height of the widget.
-            #   It should not be hardcoded though. We can fix this
-            #   when we implement a waveform samples cache, because it's
-            #   wasteful if multiple clips backed by the same asset
-            #   keep their own samples copy.
-            factor = 65 / max_value
-            samples = samples * factor
-
-        return list(samples)
-
     def _launch_pipeline(self):
         self.debug(
             "Now generating waveforms for: %s", path_from_uri(self._uri))
         self.pipeline = Gst.parse_launch("uridecodebin name=decode uri=" +
                                          self._uri + " ! waveformbin name=wave"
                                          " ! fakesink qos=false name=faked")
-        # This line is necessary so we can instantiate GstTranscoder's
-        # GstCpuThrottlingClock below.
-        Gst.ElementFactory.make("uritranscodebin", None)
-        clock = GObject.new(GObject.type_from_name("GstCpuThrottlingClock"))
-        clock.props.cpu_usage = self._max_cpu_usage
-        self.pipeline.use_clock(clock)
+        self.pipeline.use_clock(create_cpu_throttling_clock(self._max_cpu_usage))
         faked = self.pipeline.get_by_name("faked")
         faked.props.sync = True
         self._wavebin = self.pipeline.get_by_name("wave")
@@ -1259,7 +2140,7 @@ class AudioPreviewer(Gtk.Layout, Previewer, Zoomable, Loggable):
 
     def _prepare_samples(self):
         self._wavebin.finalize()
-        self.samples = self._scale_samples(self._wavebin.samples)
+        self.waveform = WaveformCache.get(self._uri)
 
     def _bus_message_cb(self, bus, message):
         if message.type == Gst.MessageType.EOS:
@@ -1295,7 +2176,7 @@ class AudioPreviewer(Gtk.Layout, Previewer, Zoomable, Loggable):
         return False
 
     def do_draw(self, context):
-        if not self.samples or not self.ges_elem.get_track() or not self.ges_elem.props.active:
+        if not self.waveform or not self.ges_elem.get_track() or not self.ges_elem.props.active:
             # Nothing to draw.
             return
 
@@ -1324,40 +2205,40 @@ class AudioPreviewer(Gtk.Layout, Previewer, Zoomable, Loggable):
         zoom = self.get_current_zoom_level()
         height = self.get_allocation().height - 2 * CLIP_BORDER_WIDTH
 
-        if not self.surface or \
-                height != self.surface.get_height() or \
-                zoom != self._surface_zoom_level or \
-                start_px < self._surface_start_px or \
-                rate != self._rate or \
-                end_px > self._surface_end_px:
-            # Generate a new surface since the previously generated one, if any,
-            # cannot be reused.
-            if self.surface:
-                self.surface.finish()
-                self.surface = None
-            self._surface_zoom_level = zoom
-            # The generated waveform is for an extended range if possible,
-            # so if the user scrolls we don't rebuild the waveform every time.
-            self._surface_start_px = max(0, start_px - WAVEFORM_SURFACE_EXTRA_PX)
-            self._rate = rate
-            self._surface_end_px = min(end_px + WAVEFORM_SURFACE_EXTRA_PX, max_duration_px)
-
-            sample_duration = SAMPLE_DURATION / rate
-            range_start = min(max(0, int(self.pixel_to_ns(self._surface_start_px) / sample_duration)), len(self.samples))
-            range_end = min(max(0, int(self.pixel_to_ns(self._surface_end_px) / sample_duration)), len(self.samples))
-            samples = self.samples[range_start:range_end]
-            surface_width = self._surface_end_px - self._surface_start_px
-            self.surface = renderer.fill_surface(samples, surface_width, height)
-
-        # Paint the surface, ignoring the clipped rect.
+        # Paint the tiles, ignoring the clipped rect.
         # We only have to make sure the offset is correct:
-        # 1. + self._start_surface_ns, because that's the position of
-        # the surface in context, if the entire asset would be drawn.
+        # 1. + the position of the tile in context, if the entire asset
+        # would be drawn.
         # 2. - inpoint, because we're drawing a clip, not the entire asset.
         context.set_operator(cairo.OPERATOR_OVER)
-        offset_px = self._surface_start_px - inpoint_px
-        context.set_source_surface(self.surface, offset_px, CLIP_BORDER_WIDTH)
-        context.paint()
+        tiles = WaveformCache.tiles
+        for index in range(start_px // WAVEFORM_TILE_WIDTH, -(-end_px // WAVEFORM_TILE_WIDTH)):
+            key = (self.waveform.uri, zoom, height, rate, index)
+            surface = tiles.get(key)
+            if not surface:
+                self.__request_tile(key, index, rate, max_duration_px, height)
+                continue
+
+            offset_px = index * WAVEFORM_TILE_WIDTH - inpoint_px
+            context.set_source_surface(surface, offset_px, CLIP_BORDER_WIDTH)
+            context.paint()
+
+    def __request_tile(self, key, index, rate, max_duration_px, height):
+        tile_start_px = index * WAVEFORM_TILE_WIDTH
+        tile_end_px = min(tile_start_px + WAVEFORM_TILE_WIDTH, max_duration_px)
+
+        sample_duration = SAMPLE_DURATION / rate
+        range_start = min(max(0, int(self.pixel_to_ns(tile_start_px) / sample_duration)), len(self.waveform))
+        range_end = min(max(0, int(self.pixel_to_ns(tile_end_px) / sample_duration)), len(self.waveform))
+        if range_start >= range_end:
+            return
+
+        width = tile_end_px - tile_start_px
+        mins, maxs, unused_rms = self.waveform.peaks(range_start, range_end, width)
+        scale = 1.0
+        if self.waveform.max_value > 0.0001:
+            scale = height / self.waveform.max_value
+        WaveformCache.tiles.request(key, self, maxs, mins, width, height, scale)
 
     def _emit_done_on_idle(self):
         self.emit("done")
@@ -77,6 +77,9 @@ FRAME_MIN_WIDTH_PIXELS = 5
 # How short it should be.
 FRAME_HEIGHT_PIXELS = 5
 
+# The half width of the top part of the playhead.
+PLAYHEAD_SEMI_WIDTH = 4
+
 NORMAL_FONT_SIZE = FONT_SCALING_FACTOR * 13
 SMALL_FONT_SIZE = FONT_SCALING_FACTOR * 11
 
@@ -87,6 +90,10 @@ class ScaleRuler(Gtk.DrawingArea, Loggable):
     Displays a series of consecutive intervals. For each interval its beginning
     time is shown. If zoomed in enough, shows the frames in alternate colors.
 
+    The intervals and the frames are drawn in a surface which is reused as
+    long as the zoom, the scroll offset, the size and the framerate do not
+    change, so when the position changes only the playhead is painted.
+
     Attributes:
         zoom (pitivi.utils.timeline.Zoomable): Zoom controller.
         settings (pitivi.settings.GlobalSettings): The settings of the app.
@@ -109,7 +116,11 @@ class ScaleRuler(Gtk.DrawingArea, Loggable):
                         Gdk.EventMask.BUTTON_PRESS_MASK | Gdk.EventMask.BUTTON_RELEASE_MASK |
                         Gdk.EventMask.SCROLL_MASK)
 
+        # The static content of the ruler.
         self.pixbuf = None
+        # The (zoomratio, offset, width, height, frame duration) of the
+        # content of the pixbuf, None when it has to be drawn again.
+        self.__pixbuf_key = None
 
         # all values are in pixels
         self.pixbuf_offset = 0
@@ -129,8 +140,26 @@ class ScaleRuler(Gtk.DrawingArea, Loggable):
         self._pipeline.connect("position", self._pipeline_position_cb)
 
     def _pipeline_position_cb(self, unused_pipeline, position):
+        if self.__pixbuf_key != self.__get_pixbuf_key():
+            self.position = position
+            self.queue_draw()
+            return
+
+        # Only the playhead needs to be painted again.
+        self.queue_draw_area(*self._get_playhead_area())
         self.position = position
-        self.queue_draw()
+        self.queue_draw_area(*self._get_playhead_area())
+
+    def __get_pixbuf_key(self):
+        frame_duration = self.ges_timeline.get_frame_time(1) if self.ges_timeline else None
+        return (self.zoom.zoomratio, self.pixbuf_offset,
+                self.get_allocated_width(), self.get_allocated_height(), frame_duration)
+
+    def _get_playhead_area(self):
+        """Gets the (x, y, width, height) area covered by the playhead."""
+        xpos = int(self.zoom.ns_to_pixel(self.position) - self.pixbuf_offset)
+        margin = PLAYHEAD_SEMI_WIDTH + PLAYHEAD_WIDTH * 2
+        return xpos - margin, 0, 2 * margin + 1, self.get_allocated_height()
 
     def _set_colors(self):
         # pylint: disable=attribute-defined-outside-init
@@ -155,6 +184,8 @@ class ScaleRuler(Gtk.DrawingArea, Loggable):
 
     def _update_colors_cb(self, settings, gparams):
         self._set_colors()
+        self.__pixbuf_key = None
+        self.queue_draw()
 
 # Gtk.Widget overrides
 
@@ -170,6 +201,7 @@ class ScaleRuler(Gtk.DrawingArea, Loggable):
 
         # Create a new buffer
         self.pixbuf = cairo.ImageSurface(cairo.FORMAT_ARGB32, width, height)
+        self.__pixbuf_key = None
 
         self._set_colors()
         return False
@@ -179,17 +211,18 @@ class ScaleRuler(Gtk.DrawingArea, Loggable):
             self.info("No buffer to paint")
             return False
 
-        pixbuf = self.pixbuf
-
-        # Draw on a temporary context and then copy everything.
-        drawing_context = cairo.Context(pixbuf)
-        self.draw_background(drawing_context)
-        self.draw_ruler(drawing_context)
-        self.draw_position(drawing_context)
-        pixbuf.flush()
+        key = self.__get_pixbuf_key()
+        if key != self.__pixbuf_key:
+            # Draw the static content on the buffer, to be reused.
+            drawing_context = cairo.Context(self.pixbuf)
+            self.draw_background(drawing_context)
+            self.draw_ruler(drawing_context)
+            self.pixbuf.flush()
+            self.__pixbuf_key = key
 
         context.set_source_surface(self.pixbuf, 0.0, 0.0)
         context.paint()
+        self.draw_position(context)
 
         return False
 
@@ -394,7 +427,7 @@ class ScaleRuler(Gtk.DrawingArea, Loggable):
         """
         height = self.pixbuf.get_height()
 
-        semi_width = 4
+        semi_width = PLAYHEAD_SEMI_WIDTH
         semi_height = int(semi_width * 1.61803)
         y = int(3 * height / 4)
 
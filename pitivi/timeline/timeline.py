@@ -74,6 +74,11 @@ from pitivi.utils.widgets import ZoomBox
 # Creates new layer if a clip is held at layers separator after this time interval
 SEPARATOR_ACCEPTING_DROP_INTERVAL_MS = 1000
 
+# The clips widgets are realized only in the visible part of the timeline
+# plus this number of pages on each side, so scrolling does not reveal
+# clips not realized yet.
+REALIZED_MARGIN_PAGES = 1
+
 
 GlobalSettings.add_config_option('markersSnappableByDefault',
                                  section="user-interface",
@@ -437,6 +442,8 @@ class Timeline(Gtk.EventBox, Zoomable, Loggable):
         # Whether the entire timeline content is in view and
         # it should be kept that way if it makes sense.
         self.zoomed_fitted = True
+        # The zoom ratio set to fit the timeline, see set_best_zoom_ratio.
+        self.__fitted_zoomratio = None
 
         # A list of (controls separator, layers separator) tuples.
         self._separators = []
@@ -451,6 +458,8 @@ class Timeline(Gtk.EventBox, Zoomable, Loggable):
         # The parameters for the delayed scroll to be performed after
         # the layers box is allocated a size.
         self.delayed_scroll = {}
+        # The (position, x) to keep in place when the zoom is applied.
+        self.__zoom_anchor = None
         self.__next_seek_position = None
 
         # Whether the playhead is in Locked mode
@@ -523,6 +532,7 @@ class Timeline(Gtk.EventBox, Zoomable, Loggable):
         self.layout.layers_vbox.connect_after("size-allocate", self.__size_allocate_cb)
 
         self.hadj.connect("value-changed", self.__hadj_value_changed_cb)
+        self.hadj.connect("changed", self.__hadj_changed_cb)
 
     def __size_allocate_cb(self, unused_widget, unused_allocation):
         """Handles the layers vbox size allocations."""
@@ -663,6 +673,7 @@ class Timeline(Gtk.EventBox, Zoomable, Loggable):
             self.scroll_to_playhead(Gtk.Align.START)
         if not pipeline.playing():
             self.update_visible_overlays()
+            self.__update_previewers_viewport()
             self.editor_state.set_value("playhead-position", position)
 
     def __snapping_started_cb(self, unused_timeline, unused_obj1, unused_obj2, position):
@@ -757,13 +768,16 @@ class Timeline(Gtk.EventBox, Zoomable, Loggable):
             else:
                 # The time at the playhead.
                 position = self.__last_position
+            # Scroll so position remains in place, when the zoom is applied.
+            x, unused_y = event_widget.translate_coordinates(self.layout, event.x, event.y)
+            self.__zoom_anchor = (position, x)
+            zoom_level = Zoomable.get_current_zoom_level()
             if delta_y > 0:
                 Zoomable.zoom_out()
             else:
                 Zoomable.zoom_in()
-            # Scroll so position remains in place.
-            x, unused_y = event_widget.translate_coordinates(self.layout, event.x, event.y)
-            self.hadj.set_value(self.ns_to_pixel(position) - x)
+            if Zoomable.get_current_zoom_level() == zoom_level:
+                self.__zoom_anchor = None
             return False
 
         device = event.get_source_device() or event.device
@@ -802,15 +816,10 @@ class Timeline(Gtk.EventBox, Zoomable, Loggable):
         """
         sources = []
         for layer in self.ges_timeline.layers:
-            clips = layer.get_clips()
-            for clip in clips:
-                start = clip.get_start()
-                duration = clip.get_duration()
-                if start <= position <= duration + start:
-                    source = clip.find_track_element(None, GES.VideoSource)
-                    if source:
-                        sources.append(source)
-                    continue
+            for clip in layer.ui.clips_index.containing(position):
+                source = clip.find_track_element(None, GES.VideoSource)
+                if source:
+                    sources.append(source)
         return sources
 
     def update_visible_overlays(self):
@@ -1052,6 +1061,38 @@ class Timeline(Gtk.EventBox, Zoomable, Loggable):
 
     def __hadj_value_changed_cb(self, hadj):
         self.editor_state.set_value("scroll", hadj.get_value())
+        self.__update_layers_viewport()
+        self.__update_previewers_viewport()
+
+    def __hadj_changed_cb(self, unused_hadj):
+        # The page size changes when the timeline is resized.
+        self.__update_layers_viewport()
+
+    def __update_layers_viewport(self):
+        """Lets the layers realize only the clips in view."""
+        if not self.ges_timeline:
+            return
+
+        for ges_layer in self.ges_timeline.get_layers():
+            self.__update_layer_viewport(ges_layer.ui)
+
+    def __update_layer_viewport(self, layer):
+        page_size = self.hadj.get_page_size()
+        if not page_size:
+            # Not allocated yet, all the clips stay realized.
+            return
+
+        value = self.hadj.get_value()
+        margin = page_size * REALIZED_MARGIN_PAGES
+        start = self.pixel_to_ns(max(0, value - margin))
+        end = self.pixel_to_ns(value + page_size + margin)
+        layer.set_viewport(start, end)
+
+    def __update_previewers_viewport(self):
+        """Lets the previewers in view be generated first."""
+        start = self.pixel_to_ns(self.hadj.get_value())
+        end = self.pixel_to_ns(self.hadj.get_value() + self.hadj.get_page_size())
+        Previewer.manager.set_viewport(start, end, self.__last_position)
 
     def update_position(self):
         for ges_layer in self.ges_timeline.get_layers():
@@ -1262,6 +1303,7 @@ class Timeline(Gtk.EventBox, Zoomable, Loggable):
         """Adds widgets for controlling and showing the specified layer."""
         layer = FullLayer(ges_layer, self)
         ges_layer.ui = layer
+        self.__update_layer_viewport(layer)
 
         mini_layer = MiniLayer(ges_layer, self)
         ges_layer.mini_ui = mini_layer
@@ -1388,10 +1430,19 @@ class Timeline(Gtk.EventBox, Zoomable, Loggable):
             return
 
         self.update_snapping_distance()
-        self.zoomed_fitted = False
+        # The pass can be deferred until the timeline is mapped, so it
+        # cannot simply reset the flag set by set_best_zoom_ratio.
+        self.zoomed_fitted = Zoomable.zoomratio == self.__fitted_zoomratio
 
+        # Realize the clips in view before positioning them.
+        self.__update_layers_viewport()
         self.update_position()
         self.editor_state.set_value("zoom-level", Zoomable.get_current_zoom_level())
+        if self.__zoom_anchor:
+            position, x = self.__zoom_anchor
+            self.__zoom_anchor = None
+            self.hadj.set_value(self.ns_to_pixel(position) - x)
+        self.__update_previewers_viewport()
 
     def calc_best_zoom_ratio(self, mini=True):
         """Returns the zoom ratio so that the entire timeline is in (mini)view."""
@@ -1428,10 +1479,13 @@ class Timeline(Gtk.EventBox, Zoomable, Loggable):
                 return
 
         Zoomable.set_zoom_level(nearest_zoom_level)
+        # Update the widgets right away, so the scroll below is done
+        # with the new layout width.
+        Zoomable.apply_zoom()
         self.update_snapping_distance()
 
-        # Only do this at the very end, after updating the other widgets.
         self.log("Setting 'zoomed_fitted' to True")
+        self.__fitted_zoomratio = Zoomable.zoomratio
         self.zoomed_fitted = True
 
         self.hadj.set_value(0)
@@ -1670,10 +1724,7 @@ class TimelineContainer(Gtk.Grid, Zoomable, Loggable):
             proxy_uris = (self.app.proxy_manager.get_proxy_uri(asset),
                           self.app.proxy_manager.get_proxy_uri(asset, scaled=True))
 
-        for clip in self.timeline.clips():
-            if not isinstance(clip, GES.UriClip):
-                continue
-
+        for clip in self._project.target_clips.clips_of(asset.props.id):
             if not proxy:
                 if clip.get_asset().props.id in proxy_uris:
                     clip.set_asset(asset)
@@ -2330,12 +2381,12 @@ class TimelineContainer(Gtk.Grid, Zoomable, Loggable):
         if not layers:
             layers = self.ges_timeline.layers
         for layer in layers:
-            clips = layer.get_clips_in_interval(start, end)
-            for clip in clips:
-                if clip.start > start:
-                    edges.append(clip.start)
-                if clip.start + clip.duration < end:
-                    edges.append(clip.start + clip.duration)
+            if after is not None:
+                edge = layer.ui.clips_index.next_edge(after)
+            else:
+                edge = layer.ui.clips_index.previous_edge(before)
+            if edge is not None:
+                edges.append(edge)
 
         if after is not None:
             return min(edges)
@@ -0,0 +1,149 @@
+# -*- coding: utf-8 -*-
+# Pitivi video editor
+# Copyright (c) 2024, Pitivi contributors
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this program; if not, see <http://www.gnu.org/licenses/>.
+"""Keys and locations of the files generated for the media files."""
+import hashlib
+import os
+from gettext import gettext as _
+
+from pitivi.dialogs.prefs import PreferencesDialog
+from pitivi.settings import GlobalSettings
+
+GlobalSettings.add_config_section("cache")
+
+GlobalSettings.add_config_option("cache_by_content",
+                                 section="cache",
+                                 key="by-content",
+                                 default=False,
+                                 notify=True)
+PreferencesDialog.add_toggle_preference("cache_by_content",
+                                        section="_proxies",
+                                        label=_("Identify the media files by their content"),
+                                        description=_("Reuse the proxies, thumbnails and waveforms of the media files which have been moved or copied."))
+
+GlobalSettings.add_config_option("shared_cache_dir",
+                                 section="cache",
+                                 key="shared-dir",
+                                 default="",
+                                 notify=True)
+PreferencesDialog.add_text_preference("shared_cache_dir",
+                                      section="_proxies",
+                                      label=_("Shared cache directory"),
+                                      description=_("The directory where the proxies, thumbnails and waveforms are cached, for example on a network share used by a team. Leave empty to use the user cache."))
+
+# The size of the chunks hashed at the start and at the end of the files.
+FINGERPRINT_CHUNK_SIZE = 1024 * 1024
+
+
+class MediaCache:
+    """Decides how the files generated for the media files are found.
+
+    By default they are identified by the path and the modification time
+    of the media file. When identified by content, a fingerprint of the
+    media file is used instead, so relocated or duplicated files reuse
+    the files already generated.
+
+    Attributes:
+        by_content (bool): Whether to identify the files by their content.
+        shared_dir (str): The directory containing the cache shared by the
+            projects and possibly by the machines, or empty for the user
+            cache.
+    """
+
+    by_content = False
+    shared_dir = ""
+
+    # The fingerprints by (path, size, mtime).
+    _fingerprints = {}
+
+    @classmethod
+    def configure(cls, settings):
+        """Follows the specified settings."""
+        cls.__settings_changed_cb(settings)
+        settings.connect("cache_by_contentChanged", cls.__settings_changed_cb)
+        settings.connect("shared_cache_dirChanged", cls.__settings_changed_cb)
+
+    @classmethod
+    def __settings_changed_cb(cls, settings):
+        cls.by_content = settings.cache_by_content
+        cls.shared_dir = os.path.expanduser(settings.shared_cache_dir)
+
+    @classmethod
+    def shared_directory(cls, *subdirs):
+        """Gets the shared cache directory.
+
+        Returns:
+            Optional[str]: The directory, or None if no shared cache is used.
+        """
+        if not cls.shared_dir:
+            return None
+
+        path = os.path.join(cls.shared_dir, *subdirs)
+        os.makedirs(path, exist_ok=True)
+        return path
+
+    @classmethod
+    def fingerprint(cls, path):
+        """Computes a fingerprint of the content of the specified file.
+
+        Only the size and the chunks at the start and at the end of the
+        file are hashed, which is enough for identifying media files.
+
+        Raises:
+            OSError: The file cannot be read.
+        """
+        stat = os.stat(path)
+        key = (path, stat.st_size, stat.st_mtime_ns)
+        fingerprint = cls._fingerprints.get(key)
+        if fingerprint:
+            return fingerprint
+
+        file_hash = hashlib.sha256(str(stat.st_size).encode("UTF-8"))
+        with open(path, "rb") as media_file:
+            file_hash.update(media_file.read(FINGERPRINT_CHUNK_SIZE))
+            if stat.st_size > FINGERPRINT_CHUNK_SIZE:
+                media_file.seek(max(FINGERPRINT_CHUNK_SIZE, stat.st_size - FINGERPRINT_CHUNK_SIZE))
+                file_hash.update(media_file.read(FINGERPRINT_CHUNK_SIZE))
+
+        fingerprint = file_hash.hexdigest()
+        cls._fingerprints[key] = fingerprint
+        return fingerprint
+
+    @classmethod
+    def content_key(cls, path):
+        """Gets the fingerprint of the file when identifying by content.
+
+        Returns:
+            Optional[str]: The fingerprint, or None when the files are
+            identified by their path or the file cannot be read.
+        """
+        if not cls.by_content:
+            return None
+
+        try:
+            return cls.fingerprint(path)
+        except OSError:
+            return None
+
+    @classmethod
+    def filename(cls, path, extension):
+        """Generates the cache filename for the specified media file."""
+        fingerprint = cls.content_key(path)
+        if fingerprint:
+            return "{}.{}".format(fingerprint, extension)
+
+        path_hash = hashlib.sha256(path.encode("UTF-8")).hexdigest()
+        return "{}_{}_{}.{}".format(os.path.basename(path), path_hash, os.path.getmtime(path), extension)
@@ -0,0 +1,457 @@
+# -*- coding: utf-8 -*-
+# Pitivi video editor
+# Copyright (c) 2024, Pitivi contributors
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this program; if not, see <http://www.gnu.org/licenses/>.
+"""Rendering of a project in chunks, by parallel processes."""
+import bisect
+import multiprocessing
+import os
+import queue
+import shutil
+import tempfile
+
+from gi.repository import GES
+from gi.repository import GLib
+from gi.repository import GObject
+from gi.repository import Gst
+from gi.repository import GstPbutils
+
+from pitivi.utils.loggable import Loggable
+from pitivi.utils.misc import path_from_uri
+from pitivi.utils.renderworker import render_chunk
+
+# The minimum duration of a chunk, so the processes are worth starting.
+MIN_CHUNK_DURATION = 10 * Gst.SECOND
+
+# How far from the ideal cut a clip start can be to be used as cut instead,
+# relative to the duration of a chunk.
+CUT_SNAPPING_RATIO = 0.25
+
+# The interval between the progress updates, in milliseconds.
+POSITION_UPDATE_INTERVAL = 500
+
+
+def compute_cut_points(ges_timeline, n_chunks, framerate=None):
+    """Splits the timeline in ranges to be rendered separately.
+
+    Each chunk is encoded from scratch, so it starts with a keyframe and the
+    GOPs of the concatenated file are aligned on the cuts. To avoid wasting
+    keyframes, a cut is moved to the start of a clip when one is close, since
+    the picture changes there anyway. The cuts are aligned on frames so no
+    frame is lost or duplicated.
+
+    Args:
+        ges_timeline (GES.Timeline): The timeline to be rendered.
+        n_chunks (int): The desired number of chunks.
+        framerate (Optional[Gst.Fraction]): The framerate of the rendered
+            video, or None if there is no video.
+
+    Returns:
+        List[int]: The boundaries of the chunks, starting with 0 and
+        ending with the duration of the timeline.
+    """
+    duration = ges_timeline.props.duration
+    n_chunks = min(n_chunks, duration // MIN_CHUNK_DURATION)
+    if n_chunks < 2:
+        return [0, duration]
+
+    clip_starts = sorted({clip.props.start
+                          for layer in ges_timeline.get_layers()
+                          for clip in layer.get_clips()})
+    chunk_duration = duration / n_chunks
+    cut_points = [0]
+    for i in range(1, n_chunks):
+        cut = int(chunk_duration * i)
+        index = bisect.bisect_left(clip_starts, cut)
+        neighbours = clip_starts[max(0, index - 1):index + 1]
+        if neighbours:
+            nearest = min(neighbours, key=lambda start, cut=cut: abs(start - cut))
+            if abs(nearest - cut) <= chunk_duration * CUT_SNAPPING_RATIO:
+                cut = nearest
+
+        if framerate and framerate.num:
+            frame = Gst.util_uint64_scale_round(cut, framerate.num, framerate.denom * Gst.SECOND)
+            cut = Gst.util_uint64_scale_round(frame, framerate.denom * Gst.SECOND, framerate.num)
+
+        if cut_points[-1] < cut < duration:
+            cut_points.append(cut)
+    cut_points.append(duration)
+    return cut_points
+
+
+def load_project(project_uri):
+    """Loads a saved project, blocking until done.
+
+    Returns:
+        (GES.Project, GES.Timeline): The project and its timeline.
+
+    Raises:
+        GLib.Error: The project or one of its assets cannot be loaded.
+    """
+    loop = GLib.MainLoop()
+    errors = []
+
+    def loaded_cb(unused_project, unused_timeline):
+        loop.quit()
+
+    def error_loading_cb(unused_project, unused_timeline, error):
+        errors.append(error)
+        loop.quit()
+
+    def error_loading_asset_cb(unused_project, error, unused_id, unused_type):
+        errors.append(error)
+
+    project = GES.Project.new(project_uri)
+    project.connect("loaded", loaded_cb)
+    project.connect("error-loading", error_loading_cb)
+    project.connect("error-loading-asset", error_loading_asset_cb)
+    ges_timeline = project.extract()
+    loop.run()
+    if errors:
+        raise errors[0]
+
+    return project, ges_timeline
+
+
+def find_encoding_profile(project, profile_name):
+    """Gets the encoding profile of a project by its name.
+
+    Raises:
+        GLib.Error: The project has no such encoding profile.
+    """
+    for container_profile in project.list_encoding_profiles():
+        if container_profile.get_name() == profile_name:
+            return container_profile
+
+    raise GLib.Error("The project has no %s encoding profile" % profile_name)
+
+
+def _profile_track_type(profile):
+    if isinstance(profile, GstPbutils.EncodingVideoProfile):
+        return GES.TrackType.VIDEO
+    if isinstance(profile, GstPbutils.EncodingAudioProfile):
+        return GES.TrackType.AUDIO
+    return GES.TrackType.UNKNOWN
+
+
+def _drop_until_flushed_cb(unused_pad, info):
+    if info.type & (Gst.PadProbeType.BUFFER | Gst.PadProbeType.BUFFER_LIST):
+        return Gst.PadProbeReturn.DROP
+
+    if info.get_event().type == Gst.EventType.FLUSH_STOP:
+        return Gst.PadProbeReturn.REMOVE
+
+    return Gst.PadProbeReturn.OK
+
+
+def render_range(project_uri, profile_name, output_uri, start, stop, position_cb=None,
+                 track_types=None):
+    """Renders a range of a saved project, blocking until done.
+
+    The pipeline is not prerolled before seeking to the range, the data
+    produced before the seek is dropped before reaching the encoders, so
+    the rendered file contains only the frames of the range.
+
+    Args:
+        project_uri (str): The URI of the saved project.
+        profile_name (str): The name of the encoding profile of the project
+            to be used.
+        output_uri (str): The URI of the file to be rendered.
+        start (int): The start of the range, in nanoseconds.
+        stop (int): The end of the range, in nanoseconds.
+        position_cb (Optional[function]): Called periodically with the
+            position of the pipeline.
+        track_types (Optional[GES.TrackType]): The types of the tracks to
+            be rendered, or None for all of them.
+
+    Raises:
+        GLib.Error: The project cannot be loaded or rendered.
+    """
+    project, ges_timeline = load_project(project_uri)
+    container_profile = find_encoding_profile(project, profile_name)
+    if track_types is not None:
+        for track in ges_timeline.get_tracks():
+            if not track.props.track_type & track_types:
+                ges_timeline.remove_track(track)
+        for profile in container_profile.get_profiles():
+            if not _profile_track_type(profile) & track_types:
+                profile.set_enabled(False)
+
+    pipeline = GES.Pipeline()
+    pipeline.set_timeline(ges_timeline)
+    pipeline.set_render_settings(output_uri, container_profile)
+    pipeline.set_mode(GES.PipelineFlags.RENDER)
+
+    for track in ges_timeline.get_tracks():
+        pad = ges_timeline.get_pad_for_track(track)
+        if pad:
+            pad.add_probe(Gst.PadProbeType.BUFFER | Gst.PadProbeType.BUFFER_LIST |
+                          Gst.PadProbeType.EVENT_FLUSH,
+                          _drop_until_flushed_cb)
+    # Nothing reaches the sinks before the seek, so they cannot preroll.
+    for sink in pipeline.iterate_sinks():
+        if sink.find_property("async"):
+            sink.set_property("async", False)
+
+    loop = GLib.MainLoop()
+    errors = []
+
+    def bus_message_cb(unused_bus, message):
+        if message.type == Gst.MessageType.EOS:
+            loop.quit()
+        elif message.type == Gst.MessageType.ERROR:
+            error, unused_details = message.parse_error()
+            errors.append(error)
+            loop.quit()
+
+    def update_position_cb():
+        res, position = pipeline.query_position(Gst.Format.TIME)
+        if res and position_cb:
+            position_cb(position)
+        return True
+
+    bus = pipeline.get_bus()
+    bus.add_signal_watch()
+    bus.connect("message", bus_message_cb)
+    timeout_id = GLib.timeout_add(POSITION_UPDATE_INTERVAL, update_position_cb)
+    pipeline.set_state(Gst.State.PAUSED)
+    pipeline.get_state(Gst.CLOCK_TIME_NONE)
+    pipeline.seek(1.0, Gst.Format.TIME,
+                  Gst.SeekFlags.FLUSH | Gst.SeekFlags.ACCURATE,
+                  Gst.SeekType.SET, start, Gst.SeekType.SET, stop)
+    pipeline.set_state(Gst.State.PLAYING)
+    try:
+        loop.run()
+    finally:
+        GLib.source_remove(timeout_id)
+        pipeline.set_state(Gst.State.NULL)
+        bus.remove_signal_watch()
+
+    if errors:
+        raise errors[0]
+
+
+class ParallelRender(GObject.Object, Loggable):
+    """Renders chunks of a project in parallel processes and concatenates them.
+
+    The project must be saved at `project_uri` with the encoding profile
+    before starting. The chunks are rendered into a temporary directory,
+    then remuxed without re-encoding into the output file.
+
+    The audio encoders add priming samples at the start of a stream and
+    padding at its end, which would leave gaps at the cuts, so when there
+    is also video, the chunks have only video and the audio is rendered in
+    a single pass by another process, then muxed with the joined chunks.
+    Without video, the audio would be chunked, so it is better rendered
+    with a single pipeline.
+
+    Attributes:
+        project_uri (str): Where the project to be rendered must be saved.
+        output_uri (str): The URI of the rendered file.
+        profile_name (str): The name of the encoding profile used by the
+            processes.
+        muxer (str): The name of the factory of the muxer of the output file.
+        cut_points (List[int]): The boundaries of the chunks.
+        processes (int): The maximum number of processes rendering in parallel.
+    """
+
+    __gsignals__ = {
+        "position": (GObject.SignalFlags.RUN_LAST, None, (GObject.TYPE_UINT64,)),
+        "done": (GObject.SignalFlags.RUN_LAST, None, ()),
+        "error": (GObject.SignalFlags.RUN_LAST, None, (str,)),
+    }
+
+    def __init__(self, output_uri, container_profile, cut_points, processes):
+        GObject.Object.__init__(self)
+        Loggable.__init__(self)
+        self.output_uri = output_uri
+        self.profile_name = container_profile.get_name()
+        self.muxer = container_profile.get_preset_name()
+        self.cut_points = cut_points
+        self.processes = processes
+
+        self.__directory = tempfile.mkdtemp(prefix="pitivi-render-")
+        self.project_uri = Gst.filename_to_uri(os.path.join(self.__directory, "project.xges"))
+        extension = os.path.splitext(path_from_uri(output_uri))[1]
+        self.__chunk_paths = [os.path.join(self.__directory, "chunk-%04d%s" % (index, extension))
+                              for index in range(len(cut_points) - 1)]
+
+        track_types = {_profile_track_type(profile)
+                       for profile in container_profile.get_profiles()
+                       if profile.is_enabled()}
+        chunk_track_types = None
+        self.__audio_path = None
+        if {GES.TrackType.AUDIO, GES.TrackType.VIDEO} <= track_types:
+            chunk_track_types = GES.TrackType.VIDEO
+            self.__audio_path = os.path.join(self.__directory, "audio%s" % extension)
+        # The (start, stop, track types, path) of the files to be rendered.
+        self.__jobs = [(start, stop, chunk_track_types, path)
+                       for start, stop, path in zip(cut_points, cut_points[1:], self.__chunk_paths)]
+        if self.__audio_path:
+            self.__jobs.append((cut_points[0], cut_points[-1], GES.TrackType.AUDIO,
+                                self.__audio_path))
+
+        self.__context = multiprocessing.get_context("spawn")
+        self.__queue = None
+        self.__pending_chunks = []
+        # The running processes by chunk index.
+        self.__workers = {}
+        # The rendered duration by chunk index.
+        self.__rendered = {}
+        self.__poll_id = 0
+        self.__concat_pipeline = None
+
+    def start(self):
+        """Starts rendering the chunks."""
+        self.info("Rendering %d chunks with %d processes", len(self.__chunk_paths), self.processes)
+        self.__queue = self.__context.Queue()
+        self.__pending_chunks = list(range(len(self.__jobs)))
+        self.__start_pending_workers()
+        self.__poll_id = GLib.timeout_add(POSITION_UPDATE_INTERVAL, self.__poll_workers_cb)
+
+    def cancel(self):
+        """Stops the processes and removes the rendered chunks."""
+        if self.__poll_id:
+            GLib.source_remove(self.__poll_id)
+            self.__poll_id = 0
+
+        self.__pending_chunks = []
+        for process in self.__workers.values():
+            process.terminate()
+            process.join()
+        self.__workers = {}
+
+        if self.__concat_pipeline:
+            self.__concat_pipeline.set_state(Gst.State.NULL)
+            self.__concat_pipeline.get_bus().remove_signal_watch()
+            self.__concat_pipeline = None
+
+        shutil.rmtree(self.__directory, ignore_errors=True)
+
+    def rendered_size(self):
+        """Gets the size of the chunks rendered so far, in bytes."""
+        size = 0
+        for unused_start, unused_stop, unused_track_types, path in self.__jobs:
+            try:
+                size += os.path.getsize(path)
+            except OSError:
+                pass
+        return size
+
+    def __start_pending_workers(self):
+        while self.__pending_chunks and len(self.__workers) < self.processes:
+            index = self.__pending_chunks.pop(0)
+            start, stop, track_types, path = self.__jobs[index]
+            self.debug("Rendering chunk %d: %s - %s", index, Gst.TIME_ARGS(start), Gst.TIME_ARGS(stop))
+            # The flags are passed as int, the spawned process cannot
+            # unpickle them before initializing the modules.
+            process = self.__context.Process(
+                target=render_chunk,
+                args=(index, self.project_uri, self.profile_name, Gst.filename_to_uri(path),
+                      start, stop, None if track_types is None else int(track_types),
+                      self.__queue),
+                daemon=True)
+            process.start()
+            self.__workers[index] = process
+
+    def __poll_workers_cb(self):
+        while True:
+            try:
+                kind, index, value = self.__queue.get_nowait()
+            except queue.Empty:
+                break
+
+            start, stop, unused_track_types, unused_path = self.__jobs[index]
+            if kind == "position":
+                self.__rendered[index] = min(max(value - start, 0), stop - start)
+            elif kind == "done":
+                self.__rendered[index] = stop - start
+                self.__workers.pop(index).join()
+            else:
+                self.__fail("Failed rendering %s - %s: %s" %
+                            (Gst.TIME_ARGS(start), Gst.TIME_ARGS(stop), value))
+                return False
+
+        for index, process in self.__workers.items():
+            if process.exitcode:
+                self.__fail("The process rendering chunk %d exited with %d" %
+                            (index, process.exitcode))
+                return False
+
+        # The progress of the audio, rendered in one pass, is not counted.
+        self.emit("position", sum(duration for index, duration in self.__rendered.items()
+                                  if self.__jobs[index][2] != GES.TrackType.AUDIO))
+
+        self.__start_pending_workers()
+        if self.__workers:
+            return True
+
+        self.__poll_id = 0
+        self.__concatenate()
+        return False
+
+    def __fail(self, message):
+        self.error("%s", message)
+        self.cancel()
+        self.emit("error", message)
+
+    def __concatenate(self):
+        self.debug("Concatenating %d chunks into %s", len(self.__chunk_paths), self.output_uri)
+        pipeline = Gst.Pipeline.new("concatenate")
+        splitmuxsrc = Gst.ElementFactory.make("splitmuxsrc", None)
+        muxer = Gst.ElementFactory.make(self.muxer, None)
+        filesink = Gst.ElementFactory.make("filesink", None)
+        filesink.props.location = path_from_uri(self.output_uri)
+        for element in (splitmuxsrc, muxer, filesink):
+            pipeline.add(element)
+        muxer.link(filesink)
+
+        splitmuxsrc.connect("format-location", self.__format_location_cb)
+        splitmuxsrc.connect("pad-added", self.__pad_added_cb, muxer)
+
+        if self.__audio_path:
+            filesrc = Gst.ElementFactory.make("filesrc", None)
+            filesrc.props.location = self.__audio_path
+            parsebin = Gst.ElementFactory.make("parsebin", None)
+            pipeline.add(filesrc)
+            pipeline.add(parsebin)
+            filesrc.link(parsebin)
+            parsebin.connect("pad-added", self.__pad_added_cb, muxer)
+
+        bus = pipeline.get_bus()
+        bus.add_signal_watch()
+        bus.connect("message", self.__concat_bus_message_cb)
+        self.__concat_pipeline = pipeline
+        pipeline.set_state(Gst.State.PLAYING)
+
+    def __format_location_cb(self, unused_splitmuxsrc):
+        return self.__chunk_paths
+
+    def __pad_added_cb(self, unused_element, pad, muxer):
+        sinkpad = muxer.get_compatible_pad(pad, None)
+        if not sinkpad:
+            self.warning("The muxer cannot take the %s stream", pad.get_name())
+            return
+
+        pad.link(sinkpad)
+
+    def __concat_bus_message_cb(self, unused_bus, message):
+        if message.type == Gst.MessageType.EOS:
+            self.info("Rendered %s", self.output_uri)
+            self.cancel()
+            self.emit("done")
+        elif message.type == Gst.MessageType.ERROR:
+            error, unused_details = message.parse_error()
+            self.__fail("Failed concatenating the chunks: %s" % error.message)
@@ -50,6 +50,16 @@ class PipelineError(Exception):
     pass
 
 
+def create_cpu_throttling_clock(cpu_usage):
+    """Creates a clock making a pipeline use at most the specified CPU usage."""
+    # This line is necessary so we can instantiate GstTranscoder's
+    # GstCpuThrottlingClock below.
+    Gst.ElementFactory.make("uritranscodebin", None)
+    clock = GObject.new(GObject.type_from_name("GstCpuThrottlingClock"))
+    clock.props.cpu_usage = cpu_usage
+    return clock
+
+
 class SimplePipeline(GObject.Object, Loggable):
     """High-level pipeline.
 
@@ -623,7 +633,7 @@ class Pipeline(GES.Pipeline, SimplePipeline):
                        format_ns(position), e)
 
     def _bus_message_cb(self, bus, message):
-        if message.type == Gst.MessageType.ASYNC_DONE:
+        if message.type == Gst.MessageType.ASYNC_DONE and self.app.gui:
             self.app.gui.editor.timeline_ui.timeline.update_visible_overlays()
 
         if message.type == Gst.MessageType.ASYNC_DONE and\
@@ -14,7 +14,13 @@
 #
 # You should have received a copy of the GNU Lesser General Public
 # License along with this program; if not, see <http://www.gnu.org/licenses/>.
+import contextlib
+import fcntl
+import json
 import os
+import shutil
+import socket
+import threading
 import time
 from fractions import Fraction
 from gettext import gettext as _
@@ -31,9 +37,13 @@ from pitivi.check import GstDependency
 from pitivi.configure import get_gstpresets_dir
 from pitivi.dialogs.prefs import PreferencesDialog
 from pitivi.settings import GlobalSettings
+from pitivi.settings import xdg_cache_home
 from pitivi.utils.loggable import Loggable
+from pitivi.utils.mediacache import MediaCache
 from pitivi.utils.misc import ASSET_DURATION_META
 from pitivi.utils.misc import asset_get_duration
+from pitivi.utils.pipeline import create_cpu_throttling_clock
+from pitivi.utils.system import SystemLoadTracker
 # Remove check when we depend on Gst >= 1.20
 HAS_GST_1_19 = GstDependency("Gst", apiversion="1.0", version_required="1.19").check()
 
@@ -112,6 +122,468 @@ def create_encoding_profile_simple(container_caps, audio_caps, video_caps):
     return container_profile
 
 
+def _process_is_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+class ProxyJobQueue(Loggable):
+    """Persistent record of the transcoding jobs.
+
+    The jobs are saved in a JSON file shared by the processes creating
+    proxies, so the jobs interrupted by quitting can be resumed when their
+    assets are loaded again. The proxies being created by a process which
+    is not running anymore are deleted, as the containers we use cannot be
+    resumed.
+
+    Each job is owned by the process which recorded it, identified by its
+    host name and PID. A process only rewrites its own jobs, and only claims
+    the jobs of the dead processes of the same host, so the proxies being
+    created by the other running processes, possibly on other hosts sharing
+    the cache directory, are left alone. The file is accessed while holding
+    a lock and it is rewritten at most once per main loop iteration.
+
+    Attributes:
+        path (str): The path of the JSON file.
+    """
+
+    def __init__(self, path):
+        Loggable.__init__(self)
+        self.path = path
+        self.owner = {"host": socket.gethostname(), "pid": os.getpid()}
+        # The running or pending jobs, by the URI of the proxy being created.
+        self._jobs = {}
+        # The jobs interrupted last time, by the URI of their proxy.
+        self._interrupted = {}
+        self.__save_id = 0
+        self.__load()
+
+    def __is_dead(self, job):
+        owner = job.get("owner")
+        if not owner:
+            # Recorded by an older version.
+            return True
+
+        if owner["host"] != self.owner["host"]:
+            return False
+
+        return owner["pid"] == self.owner["pid"] or not _process_is_alive(owner["pid"])
+
+    @contextlib.contextmanager
+    def __locked_jobs(self):
+        """Gets the jobs in the file, while holding the lock of the file."""
+        with open(self.path + ".lock", "w", encoding="UTF-8") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                try:
+                    with open(self.path, "r", encoding="UTF-8") as file:
+                        jobs = json.load(file)
+                except FileNotFoundError:
+                    jobs = {}
+                except (json.decoder.JSONDecodeError, ValueError) as e:
+                    self.warning("Proxy jobs could not be read: %s", e)
+                    jobs = {}
+                yield jobs
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def __write(self, jobs):
+        """Replaces the jobs of this process in the file with the current ones."""
+        jobs = {part_uri: job for part_uri, job in jobs.items()
+                if job.get("owner") != self.owner}
+        for own_jobs in (self._interrupted, self._jobs):
+            for part_uri, job in own_jobs.items():
+                job["owner"] = self.owner
+                jobs[part_uri] = job
+
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="UTF-8") as file:
+            json.dump(jobs, file)
+        os.replace(tmp_path, self.path)
+
+    def __load(self):
+        try:
+            with self.__locked_jobs() as jobs:
+                for part_uri, job in list(jobs.items()):
+                    if not self.__is_dead(job):
+                        continue
+
+                    del jobs[part_uri]
+                    for uri in job["parts"]:
+                        try:
+                            os.unlink(Gst.uri_get_location(uri))
+                            self.info("Deleted interrupted proxy %s", uri)
+                        except FileNotFoundError:
+                            pass
+
+                    if os.path.exists(Gst.uri_get_location(job["uri"])):
+                        self._interrupted[part_uri] = job
+                # Claim the interrupted jobs.
+                self.__write(jobs)
+        except OSError as e:
+            self.warning("Proxy jobs could not be loaded: %s", e)
+
+    def __save(self):
+        if not self.__save_id:
+            self.__save_id = GLib.idle_add(self.__save_cb)
+
+    def __save_cb(self):
+        self.__save_id = 0
+        self.flush()
+        return False
+
+    def flush(self):
+        """Writes the pending changes to the file."""
+        if self.__save_id:
+            GLib.source_remove(self.__save_id)
+            self.__save_id = 0
+
+        try:
+            with self.__locked_jobs() as jobs:
+                self.__write(jobs)
+        except OSError as e:
+            self.warning("Proxy jobs could not be saved: %s", e)
+
+    def __len__(self):
+        return len(self._jobs)
+
+    def add(self, transcoder, asset, scaled):
+        """Records the job of the specified transcoder."""
+        parts = [transcoder.props.dest_uri]
+        if isinstance(transcoder, ProxyPairTranscoder):
+            parts.append(transcoder.props.hq_dest_uri)
+        self._jobs[transcoder.props.dest_uri] = {
+            "uri": asset.props.id,
+            "scaled": scaled,
+            "force": bool(asset.force_proxying),
+            "duration": asset.get_duration(),
+            "parts": parts,
+        }
+        self.__save()
+
+    def remove(self, transcoder):
+        """Forgets the job of the specified transcoder."""
+        if self._jobs.pop(transcoder.props.dest_uri, None):
+            self.__save()
+
+    def duration(self, transcoder):
+        """Gets the duration of the asset transcoded by the transcoder."""
+        job = self._jobs.get(transcoder.props.dest_uri)
+        return job["duration"] if job else 0
+
+    def pop_interrupted(self, uri):
+        """Forgets the jobs interrupted last time for the specified asset.
+
+        Returns:
+            List[dict]: The jobs, each having the `scaled` and `force`
+            keys for resuming them.
+        """
+        part_uris = [part_uri for part_uri, job in self._interrupted.items()
+                     if job["uri"] == uri]
+        jobs = [self._interrupted.pop(part_uri) for part_uri in part_uris]
+        if jobs:
+            self.__save()
+        return jobs
+
+
+class ProxyPairTranscoder(GObject.Object, Loggable):
+    """Transcoder creating a HQ proxy and a scaled proxy of an asset at once.
+
+    The asset is decoded once and each raw stream goes through its filter,
+    if any, then it is teed into the encoders of both proxies. It exposes the
+    parts of the `GstTranscoder.Transcoder` API used by the `ProxyManager`.
+
+    Attributes:
+        video_filter (Gst.Element): The element filtering the raw video.
+        audio_filter (Gst.Element): The element filtering the raw audio.
+    """
+
+    __gsignals__ = {
+        "position-updated": (GObject.SignalFlags.RUN_LAST, None, (GObject.TYPE_UINT64,)),
+        "done": (GObject.SignalFlags.RUN_LAST, None, ()),
+        "error": (GObject.SignalFlags.RUN_LAST, None, (object, object)),
+    }
+
+    src_uri = GObject.Property(type=str)
+    # The scaled proxy being created.
+    dest_uri = GObject.Property(type=str)
+    # The HQ proxy being created.
+    hq_dest_uri = GObject.Property(type=str)
+    position_update_interval = GObject.Property(type=int, default=1000)
+    position = GObject.Property(type=GObject.TYPE_UINT64)
+    duration = GObject.Property(type=GObject.TYPE_UINT64, default=Gst.CLOCK_TIME_NONE)
+
+    def __init__(self, src_uri, hq_dest_uri, hq_profile, dest_uri, profile):
+        GObject.Object.__init__(self)
+        Loggable.__init__(self)
+        self.props.src_uri = src_uri
+        self.props.hq_dest_uri = hq_dest_uri
+        self.props.dest_uri = dest_uri
+        self.video_filter = None
+        self.audio_filter = None
+
+        self.pipeline = Gst.Pipeline.new(None)
+        decode = Gst.ElementFactory.make("uridecodebin", None)
+        decode.props.uri = src_uri
+        decode.connect("pad-added", self.__pad_added_cb)
+        self.pipeline.add(decode)
+
+        self.__encoders = []
+        for uri, encoding_profile in ((hq_dest_uri, hq_profile), (dest_uri, profile)):
+            encodebin = Gst.ElementFactory.make("encodebin", None)
+            encodebin.props.profile = encoding_profile
+            filesink = Gst.ElementFactory.make("filesink", None)
+            filesink.props.location = Gst.uri_get_location(uri)
+            self.pipeline.add(encodebin)
+            self.pipeline.add(filesink)
+            encodebin.link(filesink)
+            self.__encoders.append(encodebin)
+
+        self.__linked_media_types = set()
+        self.__position_update_id = None
+        self.__clock = None
+
+    def set_cpu_usage(self, cpu_usage):
+        if self.__clock:
+            self.__clock.props.cpu_usage = cpu_usage
+            return
+
+        self.__clock = create_cpu_throttling_clock(cpu_usage)
+        self.pipeline.use_clock(self.__clock)
+
+    def run_async(self):
+        bus = self.pipeline.get_bus()
+        bus.add_signal_watch()
+        bus.connect("message", self.__bus_message_cb)
+        self.pipeline.set_state(Gst.State.PLAYING)
+        self.__position_update_id = GLib.timeout_add(self.props.position_update_interval,
+                                                     self.__update_position_cb)
+
+    def cancel(self):
+        """Stops the transcoding."""
+        if self.__position_update_id:
+            GLib.source_remove(self.__position_update_id)
+            self.__position_update_id = None
+
+        bus = self.pipeline.get_bus()
+        bus.remove_signal_watch()
+        bus.disconnect_by_func(self.__bus_message_cb)
+        self.pipeline.set_state(Gst.State.NULL)
+
+    def __pad_added_cb(self, unused_decode, pad):
+        caps = pad.get_current_caps() or pad.query_caps(None)
+        media_type = caps[0].get_name()
+        if media_type == "video/x-raw":
+            element_filter = self.video_filter
+        elif media_type == "audio/x-raw":
+            element_filter = self.audio_filter
+        else:
+            media_type = None
+
+        if media_type is None or media_type in self.__linked_media_types:
+            # Like GstTranscoder, ignore the other streams.
+            fakesink = Gst.ElementFactory.make("fakesink", None)
+            self.pipeline.add(fakesink)
+            fakesink.sync_state_with_parent()
+            pad.link(fakesink.get_static_pad("sink"))
+            return
+        self.__linked_media_types.add(media_type)
+
+        tee = Gst.ElementFactory.make("tee", None)
+        self.pipeline.add(tee)
+        tee.sync_state_with_parent()
+        if element_filter:
+            self.pipeline.add(element_filter)
+            element_filter.sync_state_with_parent()
+            pad.link(element_filter.get_static_pad("sink"))
+            element_filter.link(tee)
+        else:
+            pad.link(tee.get_static_pad("sink"))
+
+        for encodebin in self.__encoders:
+            queue = Gst.ElementFactory.make("queue", None)
+            self.pipeline.add(queue)
+            queue.sync_state_with_parent()
+            tee.link(queue)
+            encoder_pad = encodebin.emit("request-pad", caps)
+            if not encoder_pad or queue.get_static_pad("src").link(encoder_pad) != Gst.PadLinkReturn.OK:
+                self.warning("Failed to link %s to the encoder", media_type)
+
+    def __update_position_cb(self):
+        res, duration = self.pipeline.query_duration(Gst.Format.TIME)
+        if res:
+            self.props.duration = duration
+        res, position = self.pipeline.query_position(Gst.Format.TIME)
+        if res:
+            self.props.position = position
+            self.emit("position-updated", position)
+        return True
+
+    def __bus_message_cb(self, unused_bus, message):
+        if message.type == Gst.MessageType.EOS:
+            self.cancel()
+            self.emit("done")
+        elif message.type == Gst.MessageType.ERROR:
+            error, details = message.parse_error()
+            self.cancel()
+            self.emit("error", error, details)
+
+
+class TranscodingController(Loggable):
+    """Adapts the transcoding concurrency to the measured throughput.
+
+    Periodically measures the real-time factor of each running transcoder,
+    the CPU usage and the I/O wait of the system, then decides:
+     - the number of parallel jobs, climbing towards the one transcoding
+       the most media seconds per second and backing off when the disk
+       or the CPU are saturated,
+     - the CPU cap of each job, lowered for the slowest jobs while the
+       CPU is saturated and raised back when it's not.
+
+    The `num_transcoding_jobs` and `max_cpu_usage` settings are the upper
+    limits. Each decision is logged with the measurements it's based on.
+
+    Attributes:
+        jobs (int): The number of transcoders which should be running.
+    """
+
+    # The interval in seconds between the decisions.
+    PERIOD = 5
+    # The I/O wait percentage above which the jobs are disk bound.
+    IOWAIT_LIMIT = 20
+    # The CPU usage percentage above which the CPU is saturated.
+    CPU_LIMIT = 90
+    # The relative change of the throughput considered significant.
+    TOLERANCE = 0.05
+    # The number of decisions to keep the number of jobs after backing off.
+    HOLD_PERIODS = 2
+
+    def __init__(self, settings, load_tracker=None):
+        Loggable.__init__(self)
+        self.settings = settings
+        self.load_tracker = load_tracker or SystemLoadTracker()
+        self.jobs = settings.num_transcoding_jobs
+        # The CPU cap set on each running transcoder.
+        self._cpu_usages = {}
+        # The position in seconds of each running transcoder at the last update.
+        self.__positions = {}
+        self.__last_time = None
+        self.__last_throughput = None
+        self.__last_step = 0
+        self.__hold = 0
+
+    def reset(self):
+        """Forgets the measurements, when no transcoder is running."""
+        self._cpu_usages = {}
+        self.__positions = {}
+        self.__last_time = None
+        self.__last_throughput = None
+        self.__last_step = 0
+        self.__hold = 0
+        self.load_tracker.load()
+
+    def update(self, transcoders, now=None):
+        """Measures the progress of the transcoders and adapts the limits.
+
+        Args:
+            transcoders (List): The running transcoders.
+            now (Optional[float]): The current monotonic time in seconds.
+        """
+        if now is None:
+            now = time.monotonic()
+        positions = {transcoder: transcoder.props.position / Gst.SECOND
+                     for transcoder in transcoders}
+        last_positions, self.__positions = self.__positions, positions
+        last_time, self.__last_time = self.__last_time, now
+        load = self.load_tracker.load()
+        if last_time is None or now <= last_time:
+            return
+
+        elapsed = now - last_time
+        factors = {transcoder: max(0, position - last_positions[transcoder]) / elapsed
+                   for transcoder, position in positions.items()
+                   if transcoder in last_positions}
+        if not factors:
+            return
+
+        throughput = sum(factors.values())
+        cpu, iowait = load if load else (None, None)
+        max_jobs = max(1, self.settings.num_transcoding_jobs)
+        step, reason = self.__decide_step(len(transcoders), max_jobs, throughput, cpu, iowait)
+        jobs = min(max(1, self.jobs + step), max_jobs)
+        self.info("Transcoding at %.2fx with %d jobs, CPU %s%%, I/O wait %s%%, "
+                  "job factors %s: %s, %d -> %d jobs",
+                  throughput, len(transcoders),
+                  "?" if cpu is None else "%.0f" % cpu,
+                  "?" if iowait is None else "%.0f" % iowait,
+                  ", ".join("%.2fx" % factor for factor in factors.values()),
+                  reason, self.jobs, jobs)
+        self.__last_step = jobs - self.jobs
+        self.__last_throughput = throughput
+        self.jobs = jobs
+
+        self.__adapt_cpu_usages(factors, cpu)
+
+    def __decide_step(self, running, max_jobs, throughput, cpu, iowait):
+        last_step = self.__last_step
+        last_throughput = self.__last_throughput
+        if iowait is not None and iowait >= self.IOWAIT_LIMIT:
+            self.__hold = self.HOLD_PERIODS
+            return -1, "disk bound"
+
+        if cpu is not None and cpu >= self.CPU_LIMIT and \
+                not (last_step > 0 and throughput > last_throughput * (1 + self.TOLERANCE)):
+            self.__hold = self.HOLD_PERIODS
+            return -1, "CPU saturated"
+
+        if self.__hold:
+            self.__hold -= 1
+            return 0, "holding"
+
+        if last_step and throughput < last_throughput * (1 - self.TOLERANCE):
+            self.__hold = self.HOLD_PERIODS
+            return -last_step, "throughput dropped, reverting"
+
+        if last_step and throughput > last_throughput * (1 + self.TOLERANCE):
+            return last_step, "throughput improved, continuing"
+
+        if self.jobs >= max_jobs:
+            return 0, "at the maximum"
+
+        if running >= self.jobs:
+            return 1, "probing for more throughput"
+
+        return 0, "not enough jobs queued"
+
+    def __adapt_cpu_usages(self, factors, cpu):
+        max_cpu_usage = self.settings.max_cpu_usage
+        min_cpu_usage = max(1, max_cpu_usage // 4)
+        saturated = cpu is not None and cpu >= self.CPU_LIMIT
+        mean_factor = sum(factors.values()) / len(factors)
+
+        cpu_usages = {}
+        for transcoder, factor in factors.items():
+            cpu_usage = self._cpu_usages.get(transcoder, max_cpu_usage)
+            if saturated and factor < mean_factor:
+                new_cpu_usage = max(min_cpu_usage, int(cpu_usage * 0.75))
+            elif not saturated:
+                new_cpu_usage = min(max_cpu_usage, max(cpu_usage + 1, int(cpu_usage * 1.25)))
+            else:
+                new_cpu_usage = min(cpu_usage, max_cpu_usage)
+
+            if new_cpu_usage != cpu_usage:
+                self.debug("CPU cap of %s: %d%% -> %d%%",
+                           transcoder.props.src_uri, cpu_usage, new_cpu_usage)
+                transcoder.set_cpu_usage(new_cpu_usage)
+            cpu_usages[transcoder] = new_cpu_usage
+        self._cpu_usages = cpu_usages
+
+
 class ProxyManager(GObject.Object, Loggable):
     """Transcodes assets and manages proxies."""
 
@@ -159,6 +631,12 @@ class ProxyManager(GObject.Object, Loggable):
         self._start_proxying_time = 0
         self.__running_transcoders = []
         self.__pending_transcoders = []
+        self.jobs = ProxyJobQueue(os.path.join(xdg_cache_home("proxies"), "jobs.json"))
+        # The time spent and the media seconds transcoded, for all the jobs.
+        self.__transcoding_time = 0
+        self.__transcoded_seconds = 0
+        self.controller = TranscodingController(app.settings)
+        self.__controller_id = None
         # The scaled proxy transcoders waiting for their corresponding shadow
         # HQ proxy transcoder to finish.
         self.__waiting_transcoders = []
@@ -178,7 +656,14 @@ class ProxyManager(GObject.Object, Loggable):
             self.error("Not supporting any proxy formats!")
             return
 
-    def _scale_asset_resolution(self, asset, max_width, max_height):
+    def scale_asset_resolution(self, asset, max_width, max_height):
+        """Gets the size of the scaled proxy of the asset.
+
+        The size fits in the specified maximum size, keeping the aspect ratio.
+
+        Returns:
+            (int, int): The width and height of the scaled proxy.
+        """
         stream = asset.get_info().get_video_streams()[0]
         width = stream.get_width()
         height = stream.get_height()
@@ -329,12 +814,18 @@ class ProxyManager(GObject.Object, Loggable):
 
         return uri
 
-    def get_proxy_uri(self, asset, scaled=False):
+    def get_proxy_uri(self, asset, scaled=False, max_size=None):
         """Gets the URI of the corresponding proxy file for the specified asset.
 
         The name looks like:
             <filename>.<file_size>[.<proxy_resolution>].<proxy_extension>
 
+        Args:
+            asset (GES.UriClipAsset): The asset.
+            scaled (Optional[bool]): Whether to get the scaled proxy.
+            max_size (Optional[Tuple[int, int]]): The maximum resolution of
+                the scaled proxy, by default the one of the current project.
+
         Returns:
             str: The URI or None if it can't be computed for any reason.
         """
@@ -353,9 +844,12 @@ class ProxyManager(GObject.Object, Loggable):
             if not asset.get_info().get_video_streams():
                 return None
 
-            max_w = self.app.project_manager.current_project.scaled_proxy_width
-            max_h = self.app.project_manager.current_project.scaled_proxy_height
-            t_width, t_height = self._scale_asset_resolution(asset, max_w, max_h)
+            if max_size:
+                max_w, max_h = max_size
+            else:
+                max_w = self.app.project_manager.current_project.scaled_proxy_width
+                max_h = self.app.project_manager.current_project.scaled_proxy_height
+            t_width, t_height = self.scale_asset_resolution(asset, max_w, max_h)
             proxy_res = "%sx%s" % (t_width, t_height)
             return "%s.%s.%s.%s" % (asset.get_id(), file_size, proxy_res,
                                     self.scaled_proxy_extension)
@@ -376,7 +870,7 @@ class ProxyManager(GObject.Object, Loggable):
         stream = asset.get_info().get_video_streams()[0]
 
         asset_res = (stream.get_width(), stream.get_height())
-        target_res = self._scale_asset_resolution(asset,
+        target_res = self.scale_asset_resolution(asset,
                                                   self.app.project_manager.current_project.scaled_proxy_width,
                                                   self.app.project_manager.current_project.scaled_proxy_height)
 
@@ -430,6 +924,24 @@ class ProxyManager(GObject.Object, Loggable):
             self._start_proxying_time = time.time()
         transcoder.run_async()
         self.__running_transcoders.append(transcoder)
+        if not self.__controller_id:
+            self.controller.reset()
+            self.__controller_id = GLib.timeout_add_seconds(TranscodingController.PERIOD,
+                                                            self.__update_controller_cb)
+
+    def __update_controller_cb(self):
+        if not self.__running_transcoders:
+            self.__controller_id = None
+            return False
+
+        self.controller.update(self.__running_transcoders)
+        self.__start_pending_transcoders()
+        return True
+
+    def __start_pending_transcoders(self):
+        while self.__pending_transcoders and \
+                len(self.__running_transcoders) < self.controller.jobs:
+            self.__start_transcoder(self.__pop_pending_transcoder())
 
     def __assets_match(self, asset, proxy):
         if self.__asset_needs_transcoding(proxy):
@@ -441,7 +953,19 @@ class ProxyManager(GObject.Object, Loggable):
 
         return True
 
-    def __asset_loaded_cb(self, proxy, res, asset, transcoder):
+    def __load_proxy(self, proxy_uri, asset, transcoder, shadow=False):
+        # Make sure that if it first failed loading, the proxy is forced to
+        # be reloaded in the GES cache.
+        GES.Asset.needs_reload(GES.UriClip, proxy_uri)
+        GES.Asset.request_async(GES.UriClip, proxy_uri, None,
+                                self.__asset_loaded_cb, asset, transcoder, shadow)
+
+    def __asset_loaded_cb(self, proxy, res, asset, transcoder, shadow):
+        # The scaled proxy is loaded after its shadow HQ proxy.
+        scaled_transcoder = None
+        if shadow and isinstance(transcoder, ProxyPairTranscoder):
+            scaled_transcoder = transcoder
+
         try:
             GES.Asset.request_finish(res)
         except GLib.Error as e:
@@ -453,19 +977,11 @@ class ProxyManager(GObject.Object, Loggable):
 
             return
 
-        shadow = transcoder and self._is_shadow_transcoder(transcoder)
-
         if not transcoder:
             if not self.__assets_match(asset, proxy):
                 self.__create_transcoder(asset)
                 return
         else:
-            if transcoder.props.pipeline.props.video_filter:
-                transcoder.props.pipeline.props.video_filter.finalize()
-
-            if transcoder.props.pipeline.props.audio_filter:
-                transcoder.props.pipeline.props.audio_filter.finalize()
-
             del transcoder
 
         asset_duration = asset_get_duration(asset)
@@ -477,36 +993,36 @@ class ProxyManager(GObject.Object, Loggable):
                       asset.props.id, Gst.TIME_ARGS(asset_duration), Gst.TIME_ARGS(duration))
             asset.set_uint64(ASSET_DURATION_META, duration)
             proxy.set_uint64(ASSET_DURATION_META, duration)
-            target_uri = self.get_target_uri(asset)
-
-            for clip in self.app.project_manager.current_project.ges_timeline.iter_clips():
-                if not isinstance(clip, GES.UriClip):
-                    continue
-                if self.get_target_uri(clip.props.uri) == target_uri:
-                    if clip.props.in_point + clip.props.duration > duration:
-                        new_duration = duration - clip.props.in_point
-                        if new_duration > 0:
-                            self.warning("%s resetting duration to %s as"
-                                         " new proxy has a shorter duration",
-                                         clip, Gst.TIME_ARGS(new_duration))
-                            clip.set_duration(new_duration)
-                        else:
-                            new_inpoint = new_duration - clip.props.in_point
-                            self.error("%s resetting duration to %s"
-                                       " and inpoint to %s as the proxy"
-                                       " is shorter",
-                                       clip, Gst.TIME_ARGS(new_duration), Gst.TIME_ARGS(new_inpoint))
-                            clip.set_inpoint(new_inpoint)
-                            clip.set_duration(duration - new_inpoint)
-                        clip.set_max_duration(duration)
+            project = self.app.project_manager.current_project
+            for clip in project.target_clips.clips_of(asset.props.id):
+                if clip.props.in_point + clip.props.duration > duration:
+                    new_duration = duration - clip.props.in_point
+                    if new_duration > 0:
+                        self.warning("%s resetting duration to %s as"
+                                     " new proxy has a shorter duration",
+                                     clip, Gst.TIME_ARGS(new_duration))
+                        clip.set_duration(new_duration)
+                    else:
+                        new_inpoint = new_duration - clip.props.in_point
+                        self.error("%s resetting duration to %s"
+                                   " and inpoint to %s as the proxy"
+                                   " is shorter",
+                                   clip, Gst.TIME_ARGS(new_duration), Gst.TIME_ARGS(new_inpoint))
+                        clip.set_inpoint(new_inpoint)
+                        clip.set_duration(duration - new_inpoint)
+                    clip.set_max_duration(duration)
 
         if shadow:
             self.app.project_manager.current_project.finalize_proxy(proxy)
+            if scaled_transcoder:
+                scaled_proxy_uri = scaled_transcoder.props.dest_uri.rstrip(ProxyManager.part_suffix)
+                self.__load_proxy(scaled_proxy_uri, asset, scaled_transcoder)
         else:
             self.emit("proxy-ready", asset, proxy)
             self.__emit_progress(proxy, 100)
 
     def __transcoder_error_cb(self, _, error, unused_details, asset, transcoder):
+        self.jobs.remove(transcoder)
         self.emit("error-preparing-asset", asset, None, error)
 
     def __transcoder_done_cb(self, emitter, asset, transcoder):
@@ -517,23 +1033,27 @@ class ProxyManager(GObject.Object, Loggable):
         self.debug("Transcoder done with %s", asset.get_id())
 
         self.__running_transcoders.remove(transcoder)
-
-        proxy_uri = transcoder.props.dest_uri.rstrip(ProxyManager.part_suffix)
-        os.rename(Gst.uri_get_location(transcoder.props.dest_uri),
-                  Gst.uri_get_location(proxy_uri))
-
-        shadow = self._is_shadow_transcoder(transcoder)
-        second_transcoder = self._get_second_transcoder(transcoder)
-        if second_transcoder and not shadow:
-            # second_transcoder is the shadow for transcoder.
-            # Defer loading until the shadow transcoder finishes.
-            self.__waiting_transcoders.append([transcoder, asset])
+        self.jobs.remove(transcoder)
+
+        proxy_uris = self.finalize_transcoder(transcoder)
+        for uri in proxy_uris:
+            self.publish_proxy(asset, uri)
+        proxy_uri = proxy_uris[0]
+
+        if isinstance(transcoder, ProxyPairTranscoder):
+            hq_proxy_uri = proxy_uris[1]
+            # The scaled proxy is loaded when the HQ proxy is loaded.
+            self.__load_proxy(hq_proxy_uri, asset, transcoder, shadow=True)
+            shadow = False
         else:
-            # Make sure that if it first failed loading, the proxy is forced to
-            # be reloaded in the GES cache.
-            GES.Asset.needs_reload(GES.UriClip, proxy_uri)
-            GES.Asset.request_async(GES.UriClip, proxy_uri, None,
-                                    self.__asset_loaded_cb, asset, transcoder)
+            shadow = self._is_shadow_transcoder(transcoder)
+            second_transcoder = self._get_second_transcoder(transcoder)
+            if second_transcoder and not shadow:
+                # second_transcoder is the shadow for transcoder.
+                # Defer loading until the shadow transcoder finishes.
+                self.__waiting_transcoders.append([transcoder, asset])
+            else:
+                self.__load_proxy(proxy_uri, asset, transcoder, shadow)
 
         if shadow:
             # Finish deferred loading for waiting scaled proxy transcoder.
@@ -541,20 +1061,55 @@ class ProxyManager(GObject.Object, Loggable):
                 waiting_transcoder, waiting_asset = pair
                 if waiting_transcoder.props.src_uri == transcoder.props.src_uri:
                     proxy_uri = waiting_transcoder.props.dest_uri.rstrip(ProxyManager.part_suffix)
-                    GES.Asset.needs_reload(GES.UriClip, proxy_uri)
-                    GES.Asset.request_async(GES.UriClip, proxy_uri, None,
-                                            self.__asset_loaded_cb, waiting_asset, waiting_transcoder)
+                    self.__load_proxy(proxy_uri, waiting_asset, waiting_transcoder)
 
                     self.__waiting_transcoders.remove(pair)
                     break
 
-        try:
-            self.__start_transcoder(self.__pending_transcoders.pop())
-        except IndexError:
-            if not self.__running_transcoders:
-                self._transcoded_durations = {}
-                self._total_time_to_transcode = 0
-                self._start_proxying_time = 0
+        self.__start_pending_transcoders()
+        if not self.__running_transcoders:
+            self.__transcoding_time += time.time() - self._start_proxying_time
+            self.__transcoded_seconds += sum(self._transcoded_durations.values())
+            self.info("Transcoding queue empty, %s", self.stats)
+            self._transcoded_durations = {}
+            self._total_time_to_transcode = 0
+            self._start_proxying_time = 0
+
+    def __pop_pending_transcoder(self):
+        """Removes the pending transcoder to start next.
+
+        The assets used in the timeline come first, then the shortest ones.
+        """
+        timeline_uris = set()
+        project = self.app.project_manager.current_project
+        if project and project.target_clips:
+            timeline_uris = project.target_clips.targets()
+
+        transcoder = min(self.__pending_transcoders,
+                         key=lambda transcoder: (transcoder.props.src_uri not in timeline_uris,
+                                                 self.jobs.duration(transcoder)))
+        self.__pending_transcoders.remove(transcoder)
+        return transcoder
+
+    @property
+    def stats(self):
+        """Gets the state of the transcoding queue.
+
+        Returns:
+            dict: The number of `running` and `pending` jobs, and the
+            `throughput` in media seconds transcoded per second, since
+            the start.
+        """
+        transcoding_time = self.__transcoding_time
+        transcoded_seconds = self.__transcoded_seconds
+        if self._start_proxying_time:
+            transcoding_time += time.time() - self._start_proxying_time
+            transcoded_seconds += sum(self._transcoded_durations.values())
+        return {
+            "running": len(self.__running_transcoders),
+            "pending": len(self.__pending_transcoders),
+            "throughput": transcoded_seconds / transcoding_time if transcoding_time else 0,
+        }
 
     def __emit_progress(self, asset, creation_progress):
         """Handles the transcoding progress of the specified asset."""
@@ -626,7 +1181,8 @@ class ProxyManager(GObject.Object, Loggable):
             optimisation_ext = "." + self.hq_proxy_extension + ProxyManager.part_suffix
 
             scaling_transcoder = transcoder_uri.endswith(scaling_ext)
-            optimisation_transcoder = transcoder_uri.endswith(optimisation_ext)
+            optimisation_transcoder = transcoder_uri.endswith(optimisation_ext) or \
+                isinstance(transcoder, ProxyPairTranscoder)
 
             if transcoder.props.src_uri == asset.props.id:
                 if optimisation and optimisation_transcoder:
@@ -639,25 +1195,182 @@ class ProxyManager(GObject.Object, Loggable):
 
         return is_queued
 
-    def __create_transcoder(self, asset, scaled=False, shadow=False):
-        self._total_time_to_transcode += asset.get_duration() / Gst.SECOND
+    def create_transcoder(self, asset, proxy_uri, size=None, hq_proxy_uri=None):
+        """Creates a transcoder for creating proxies of the specified asset.
+
+        The transcoder also generates the thumbnails and the waveform of
+        the asset.
+
+        Args:
+            asset (GES.UriClipAsset): The asset to be transcoded.
+            proxy_uri (str): The URI of the proxy to create.
+            size (Optional[Tuple[int, int]]): The resolution of the proxy,
+                by default the one of the asset.
+            hq_proxy_uri (Optional[str]): The URI of a high-quality proxy
+                to create at the same time from the same decoded streams.
+
+        Returns:
+            Tuple: The transcoder and the object emitting its signals.
+        """
+        asset_uri = asset.get_id()
+        width, height = size or (None, None)
+        enc_profile = self.__get_encoding_profile(self.__encoding_target_file,
+                                                  asset, width, height)
+
+        if hq_proxy_uri:
+            hq_enc_profile = self.__get_encoding_profile(self.__encoding_target_file, asset)
+            signals_emitter = transcoder = ProxyPairTranscoder(
+                asset_uri, hq_proxy_uri + ProxyManager.part_suffix, hq_enc_profile,
+                proxy_uri + ProxyManager.part_suffix, enc_profile)
+            filters = transcoder
+        elif HAS_GST_1_19:
+            transcoder = GstTranscoder.Transcoder.new_full(
+                asset_uri, proxy_uri + ProxyManager.part_suffix, enc_profile)
+            signals_emitter = transcoder.get_signal_adapter(None)
+            filters = transcoder.props.pipeline.props
+        else:
+            dispatcher = GstTranscoder.TranscoderGMainContextSignalDispatcher.new()
+            signals_emitter = transcoder = GstTranscoder.Transcoder.new_full(
+                asset_uri, proxy_uri + ProxyManager.part_suffix, enc_profile,
+                dispatcher)
+            filters = transcoder.props.pipeline.props
+
+        info = asset.get_info()
+        if info.get_video_streams():
+            thumbnailbin = Gst.ElementFactory.make("teedthumbnailbin")
+            thumbnailbin.props.uri = asset.get_id()
+            filters.video_filter = thumbnailbin
+
+        if info.get_audio_streams():
+            waveformbin = Gst.ElementFactory.make("waveformbin")
+            waveformbin.props.uri = asset.get_id()
+            waveformbin.props.duration = asset.get_duration()
+            filters.audio_filter = waveformbin
+
+        transcoder.set_cpu_usage(self.app.settings.max_cpu_usage)
+        return transcoder, signals_emitter
+
+    @staticmethod
+    def finalize_transcoder(transcoder):
+        """Finalizes the filters of a finished transcoder and its proxies.
+
+        Returns:
+            List[str]: The URIs of the created proxies, the scaled proxy
+            first, if any.
+        """
+        if isinstance(transcoder, ProxyPairTranscoder):
+            filters = (transcoder.video_filter, transcoder.audio_filter)
+            part_uris = (transcoder.props.dest_uri, transcoder.props.hq_dest_uri)
+        else:
+            filters = (transcoder.props.pipeline.props.video_filter,
+                       transcoder.props.pipeline.props.audio_filter)
+            part_uris = (transcoder.props.dest_uri,)
+        for element_filter in filters:
+            if element_filter:
+                element_filter.finalize()
+
+        proxy_uris = []
+        for part_uri in part_uris:
+            proxy_uri = part_uri.rstrip(ProxyManager.part_suffix)
+            os.rename(Gst.uri_get_location(part_uri), Gst.uri_get_location(proxy_uri))
+            proxy_uris.append(proxy_uri)
+        return proxy_uris
+
+    def __cached_proxy_path(self, asset, proxy_uri):
+        """Gets the path of the proxy in the cache identifying files by content."""
         asset_uri = asset.get_id()
+        fingerprint = MediaCache.content_key(Gst.uri_get_location(asset_uri))
+        if not fingerprint or not proxy_uri.startswith(asset_uri + "."):
+            return None
+
+        # Skip the file size, the fingerprint covers it.
+        extension = proxy_uri[len(asset_uri):].split(".", 2)[2]
+        proxies_dir = MediaCache.shared_directory("proxies") or xdg_cache_home("proxies", "by-content")
+        return os.path.join(proxies_dir, "%s.%s" % (fingerprint, extension))
+
+    def link_cached_proxy(self, asset, proxy_uri):
+        """Reuses the proxy of an identical file, if any.
+
+        Args:
+            asset (GES.UriClipAsset): The asset needing a proxy.
+            proxy_uri (str): The URI where the proxy of the asset is expected.
+
+        Returns:
+            bool: Whether the proxy is now available at `proxy_uri`.
+        """
+        cached_path = self.__cached_proxy_path(asset, proxy_uri)
+        if not cached_path or not os.path.exists(cached_path):
+            return False
+
+        proxy_path = Gst.uri_get_location(proxy_uri)
+        try:
+            os.link(cached_path, proxy_path)
+        except OSError:
+            # The cache is on another file system.
+            try:
+                os.symlink(cached_path, proxy_path)
+            except OSError as e:
+                self.warning("Failed linking the cached proxy %s: %s", cached_path, e)
+                return False
+
+        self.info("Reusing the cached proxy %s for %s", cached_path, asset.get_id())
+        return True
+
+    def publish_proxy(self, asset, proxy_uri):
+        """Adds the proxy to the cache, for reusing it for identical files.
+
+        Args:
+            asset (GES.UriClipAsset): The asset.
+            proxy_uri (str): The URI of the proxy of the asset.
+
+        Returns:
+            Optional[threading.Thread]: The thread copying the proxy, if any.
+        """
+        cached_path = self.__cached_proxy_path(asset, proxy_uri)
+        if not cached_path or os.path.exists(cached_path):
+            return None
+
+        proxy_path = Gst.uri_get_location(proxy_uri)
+        try:
+            os.link(proxy_path, cached_path)
+            return None
+        except OSError:
+            pass
+
+        # The cache is on another file system, copy the proxy in the
+        # background, under a temporary name to hide it while incomplete.
+        def copy():
+            part_path = cached_path + ProxyManager.part_suffix
+            try:
+                shutil.copyfile(proxy_path, part_path)
+                os.replace(part_path, cached_path)
+            except OSError as e:
+                self.warning("Failed caching the proxy %s: %s", proxy_path, e)
+
+        thread = threading.Thread(target=copy, daemon=True)
+        thread.start()
+        return thread
+
+    def __create_transcoder(self, asset, scaled=False, shadow=False, with_shadow=False):
+        self._total_time_to_transcode += asset.get_duration() / Gst.SECOND
         proxy_uri = self.get_proxy_uri(asset, scaled=scaled)
 
-        if Gio.File.new_for_uri(proxy_uri).query_exists(None):
+        if Gio.File.new_for_uri(proxy_uri).query_exists(None) or \
+                self.link_cached_proxy(asset, proxy_uri):
+            if with_shadow:
+                self.__create_transcoder(asset, shadow=True)
             self.debug("Using proxy already generated: %s", proxy_uri)
             GES.Asset.request_async(GES.UriClip,
                                     proxy_uri, None,
                                     self.__asset_loaded_cb, asset,
-                                    None)
+                                    None, False)
             return
 
         self.debug("Creating a proxy for %s (strategy: %s, force: %s, scaled: %s)",
                    asset.get_id(), self.app.settings.proxying_strategy,
                    asset.force_proxying, scaled)
 
-        width = None
-        height = None
+        size = None
         if scaled:
             project = self.app.project_manager.current_project
             w = project.scaled_proxy_width
@@ -665,19 +1378,13 @@ class ProxyManager(GObject.Object, Loggable):
             if not project.has_scaled_proxy_size():
                 project.scaled_proxy_width = w
                 project.scaled_proxy_height = h
-            width, height = self._scale_asset_resolution(asset, w, h)
-        enc_profile = self.__get_encoding_profile(self.__encoding_target_file,
-                                                  asset, width, height)
+            size = self.scale_asset_resolution(asset, w, h)
 
-        if HAS_GST_1_19:
-            transcoder = GstTranscoder.Transcoder.new_full(
-                asset_uri, proxy_uri + ProxyManager.part_suffix, enc_profile)
-            signals_emitter = transcoder.get_signal_adapter(None)
-        else:
-            dispatcher = GstTranscoder.TranscoderGMainContextSignalDispatcher.new()
-            signals_emitter = transcoder = GstTranscoder.Transcoder.new_full(
-                asset_uri, proxy_uri + ProxyManager.part_suffix, enc_profile,
-                dispatcher)
+        hq_proxy_uri = None
+        if with_shadow:
+            # Decode the asset once for both the scaled proxy and its shadow.
+            hq_proxy_uri = self.get_proxy_uri(asset)
+        transcoder, signals_emitter = self.create_transcoder(asset, proxy_uri, size, hq_proxy_uri)
 
         if shadow:
             # Used to identify shadow transcoder
@@ -685,27 +1392,15 @@ class ProxyManager(GObject.Object, Loggable):
         else:
             transcoder.props.position_update_interval = 1000
 
-        info = asset.get_info()
-        if info.get_video_streams():
-            thumbnailbin = Gst.ElementFactory.make("teedthumbnailbin")
-            thumbnailbin.props.uri = asset.get_id()
-            transcoder.props.pipeline.props.video_filter = thumbnailbin
-
-        if info.get_audio_streams():
-            waveformbin = Gst.ElementFactory.make("waveformbin")
-            waveformbin.props.uri = asset.get_id()
-            waveformbin.props.duration = asset.get_duration()
-            transcoder.props.pipeline.props.audio_filter = waveformbin
-
-        transcoder.set_cpu_usage(self.app.settings.max_cpu_usage)
         signals_emitter.connect("position-updated",
                                 self.__proxying_position_changed_cb,
                                 asset, transcoder)
 
         signals_emitter.connect("done", self.__transcoder_done_cb, asset, transcoder)
         signals_emitter.connect("error", self.__transcoder_error_cb, asset, transcoder)
+        self.jobs.add(transcoder, asset, scaled)
 
-        if len(self.__running_transcoders) < self.app.settings.num_transcoding_jobs:
+        if len(self.__running_transcoders) < self.controller.jobs:
             self.__start_transcoder(transcoder)
         else:
             self.__pending_transcoders.append(transcoder)
@@ -725,6 +1420,9 @@ class ProxyManager(GObject.Object, Loggable):
                           transcoder.props.src_uri,
                           transcoder.__grefcount__)
                 self.__running_transcoders.remove(transcoder)
+                self.jobs.remove(transcoder)
+                if isinstance(transcoder, ProxyPairTranscoder):
+                    transcoder.cancel()
                 self.emit("asset-preparing-cancelled", asset)
 
         for transcoder in self.__pending_transcoders:
@@ -735,6 +1433,7 @@ class ProxyManager(GObject.Object, Loggable):
                 # will lead to its destruction (only reference)
                 # here, which means it will be stopped.
                 self.__pending_transcoders.remove(transcoder)
+                self.jobs.remove(transcoder)
                 self.emit("asset-preparing-cancelled", asset)
 
     def add_job(self, asset, scaled=False, shadow=False):
@@ -748,6 +1447,7 @@ class ProxyManager(GObject.Object, Loggable):
                 to shadow a scaled proxy.
         """
         force_proxying = asset.force_proxying
+        with_shadow = False
         video_streams = asset.get_info().get_video_streams()
         if video_streams:
             # Handle Automatic scaling
@@ -760,8 +1460,11 @@ class ProxyManager(GObject.Object, Loggable):
                     self.app.settings.proxying_strategy == ProxyingStrategy.NOTHING \
                     and not shadow and scaled:
                 hq_uri = self.app.proxy_manager.get_proxy_uri(asset)
-                if not Gio.File.new_for_uri(hq_uri).query_exists(None):
-                    self.add_job(asset, shadow=True)
+                if not Gio.File.new_for_uri(hq_uri).query_exists(None) and \
+                        not self.link_cached_proxy(asset, hq_uri) and \
+                        not self.is_asset_queued(asset, scaling=False) and \
+                        (force_proxying or self.__asset_needs_transcoding(asset)):
+                    with_shadow = True
         else:
             # Scaled proxy is not for audio assets
             scaled = False
@@ -774,11 +1477,82 @@ class ProxyManager(GObject.Object, Loggable):
             if not self.__asset_needs_transcoding(asset, scaled):
                 self.debug("Not proxying asset (proxying disabled: %s)",
                            self.proxying_unsupported)
+                if with_shadow:
+                    self.__create_transcoder(asset, shadow=True)
                 # Make sure to notify we do not need a proxy for that asset.
                 self.emit("proxy-ready", asset, None)
                 return
 
-        self.__create_transcoder(asset, scaled=scaled, shadow=shadow)
+        self.__create_transcoder(asset, scaled=scaled, shadow=shadow, with_shadow=with_shadow)
+
+
+class TargetClipsIndex(Loggable):
+    """Index of the URI clips of a timeline by the URI of their target asset.
+
+    Kept up to date as clips are added and removed, so the clips using an
+    asset or any of its proxies are found without going through all the
+    clips of the timeline.
+    """
+
+    def __init__(self, ges_timeline):
+        Loggable.__init__(self)
+        # The clips, by target URI.
+        self._clips = {}
+        # The target URI, by clip.
+        self._targets = {}
+
+        ges_timeline.connect("layer-added", self.__layer_added_cb)
+        ges_timeline.connect("layer-removed", self.__layer_removed_cb)
+        for ges_layer in ges_timeline.get_layers():
+            self.__layer_added_cb(ges_timeline, ges_layer)
+
+    def __len__(self):
+        return len(self._targets)
+
+    def targets(self):
+        """Gets the URIs of the assets used by the clips."""
+        return self._clips.keys()
+
+    def clips_of(self, uri):
+        """Gets the clips using the specified asset or any of its proxies.
+
+        Args:
+            uri (str): The URI of the asset or of one of its proxies.
+
+        Returns:
+            List[GES.UriClip]: The clips in the order they were added.
+        """
+        return list(self._clips.get(ProxyManager.get_target_uri(uri), ()))
+
+    def __layer_added_cb(self, unused_ges_timeline, ges_layer):
+        ges_layer.connect("clip-added", self.__clip_added_cb)
+        ges_layer.connect("clip-removed", self.__clip_removed_cb)
+        for ges_clip in ges_layer.get_clips():
+            self.__clip_added_cb(ges_layer, ges_clip)
+
+    def __layer_removed_cb(self, unused_ges_timeline, ges_layer):
+        ges_layer.disconnect_by_func(self.__clip_added_cb)
+        ges_layer.disconnect_by_func(self.__clip_removed_cb)
+        for ges_clip in ges_layer.get_clips():
+            self.__clip_removed_cb(ges_layer, ges_clip)
+
+    def __clip_added_cb(self, unused_ges_layer, ges_clip):
+        if not isinstance(ges_clip, GES.UriClip) or ges_clip in self._targets:
+            return
+
+        target_uri = ProxyManager.get_target_uri(ges_clip.props.uri)
+        self._targets[ges_clip] = target_uri
+        self._clips.setdefault(target_uri, {})[ges_clip] = None
+
+    def __clip_removed_cb(self, unused_ges_layer, ges_clip):
+        target_uri = self._targets.pop(ges_clip, None)
+        if target_uri is None:
+            return
+
+        clips = self._clips[target_uri]
+        del clips[ges_clip]
+        if not clips:
+            del self._clips[target_uri]
 
 
 def get_proxy_target(obj):
@@ -0,0 +1,321 @@
+# -*- coding: utf-8 -*-
+# Pitivi video editor
+# Copyright (c) 2024, Pitivi contributors
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this program; if not, see <http://www.gnu.org/licenses/>.
+"""Measurements of the rendering pipeline, for finding the bottlenecks."""
+import json
+import threading
+import time
+
+from gi.repository import GLib
+from gi.repository import Gst
+
+from pitivi.utils.loggable import Loggable
+from pitivi.utils.misc import path_from_uri
+
+# The interval between the samples of the encoding speed and of the queues.
+SAMPLE_INTERVAL = 1000
+
+# How long the position must stay unchanged to be considered a stall, in s.
+STALL_DURATION = 2
+
+# The elements whose processing time is measured, by their klass.
+MEASURED_KLASSES = ("Codec", "Converter", "Effect", "Filter", "Mixer", "Muxer")
+
+# The queue elements whose fill level is sampled.
+QUEUE_FACTORIES = ("queue", "queue2")
+
+
+class ElementStats:
+    """The buffers and the time spent by an element of the pipeline.
+
+    The time for each output buffer is measured from the latest input
+    buffer or the previous output buffer, whichever came last, so it covers
+    both the elements working in the upstream streaming thread and those
+    with their own thread, like the aggregators.
+
+    Attributes:
+        element (Gst.Element): The measured element.
+        buffers_in (int): The number of buffers received.
+        buffers_out (int): The number of buffers pushed.
+        processing_time (float): The time spent, in seconds.
+    """
+
+    def __init__(self, element):
+        self.element = element
+        self.buffers_in = 0
+        self.buffers_out = 0
+        self.processing_time = 0.0
+        self.__last_event = None
+        self.__lock = threading.Lock()
+
+    def buffer_in(self):
+        """Records a buffer received on a sink pad."""
+        with self.__lock:
+            self.buffers_in += 1
+            self.__last_event = time.perf_counter()
+
+    def buffer_out(self):
+        """Records a buffer pushed on a src pad."""
+        with self.__lock:
+            now = time.perf_counter()
+            self.buffers_out += 1
+            if self.__last_event is not None:
+                self.processing_time += now - self.__last_event
+            self.__last_event = now
+
+    def to_json(self):
+        """Gets the measurements, which can be serialized as JSON."""
+        factory = self.element.get_factory()
+        return {
+            "name": self.element.get_name(),
+            "parent": self.element.get_parent().get_name() if self.element.get_parent() else None,
+            "factory": factory.get_name() if factory else None,
+            "klass": factory.get_metadata("klass") if factory else None,
+            "buffers_in": self.buffers_in,
+            "buffers_out": self.buffers_out,
+            "processing_time": round(self.processing_time, 3),
+            "average_ms": round(self.processing_time * 1000 / self.buffers_out, 3)
+            if self.buffers_out else None,
+        }
+
+
+class RenderTelemetry(Loggable):
+    """Records the performance of a render, written as a JSON report.
+
+    Pad probes measure the time spent by the decoders, the effects, the
+    compositor, the encoders and the muxer. Every second the encoding speed
+    and the fill level of the queues are sampled, and the periods when the
+    position does not advance are recorded as stalls.
+
+    The probes are Python callbacks called for every buffer, so each of them
+    takes the GIL in a streaming thread. This serializes the streaming
+    threads and slows down the render being measured, so the absolute
+    timings are pessimistic and only their proportions are meaningful.
+
+    Attributes:
+        fps (List[List[float]]): The (elapsed seconds, video frames encoded
+            per second) samples.
+        queue_levels (dict): The (elapsed seconds, fill percent) samples
+            by queue name.
+        stalls (List[dict]): The periods when the position did not advance.
+    """
+
+    def __init__(self):
+        Loggable.__init__(self)
+        self.__pipeline = None
+        self.__deep_element_added_id = 0
+        self.__sample_id = 0
+        # The ElementStats of the measured elements by element.
+        self.__stats = {}
+        # The (pad, probe id) of the installed probes.
+        self.__probes = []
+        # The (element, handler id) of the pad-added handlers.
+        self.__pad_added_handlers = []
+        self.__queues = []
+        self.__video_frames = 0
+        self.__frames_lock = threading.Lock()
+
+        self.__time_started = None
+        self.__time_stopped = None
+        self.__last_sample = None
+        self.__last_position = None
+        self.__last_moved = None
+        self.__stall = None
+        self.__stall_started = None
+        self.fps = []
+        self.queue_levels = {}
+        self.stalls = []
+
+    def attach(self, pipeline):
+        """Starts measuring the specified pipeline.
+
+        Should be called before the pipeline starts playing, to count all
+        the buffers.
+        """
+        self.__pipeline = pipeline
+        for element in pipeline.iterate_recurse():
+            self.__instrument(element)
+        self.__deep_element_added_id = pipeline.connect("deep-element-added",
+                                                        self.__deep_element_added_cb)
+        self.__time_started = time.monotonic()
+        self.__last_sample = (self.__time_started, 0)
+        self.__last_moved = self.__time_started
+        self.__sample_id = GLib.timeout_add(SAMPLE_INTERVAL, self.__sample_cb)
+
+    def detach(self):
+        """Stops measuring, keeping the measurements for the report."""
+        if not self.__pipeline:
+            return
+
+        self.__time_stopped = time.monotonic()
+        self.__close_stall(self.__time_stopped)
+        self.__pipeline.disconnect(self.__deep_element_added_id)
+        GLib.source_remove(self.__sample_id)
+        for pad, probe_id in self.__probes:
+            pad.remove_probe(probe_id)
+        self.__probes = []
+        for element, handler_id in self.__pad_added_handlers:
+            element.disconnect(handler_id)
+        self.__pad_added_handlers = []
+        self.__pipeline = None
+
+    def report(self):
+        """Gets the measurements.
+
+        Returns:
+            dict: The report, which can be serialized as JSON.
+        """
+        stopped = self.__time_stopped or time.monotonic()
+        wall_time = stopped - self.__time_started if self.__time_started else 0
+        elements = sorted((stats.to_json() for stats in self.__stats.values()),
+                          key=lambda element: element["processing_time"],
+                          reverse=True)
+        return {
+            "wall_time": round(wall_time, 3),
+            "video_frames": self.__video_frames,
+            "average_fps": round(self.__video_frames / wall_time, 2) if wall_time else None,
+            "fps": self.fps,
+            "elements": elements,
+            "queues": self.queue_levels,
+            "stalls": self.stalls,
+        }
+
+    def write_report(self, output_uri, **fields):
+        """Writes the report next to the rendered file.
+
+        Args:
+            output_uri (str): The URI of the rendered file.
+            fields (dict): Additional values to be included in the report.
+
+        Returns:
+            str: The path of the report.
+        """
+        path = path_from_uri(output_uri) + ".report.json"
+        report = {"output": output_uri, **fields}
+        report.update(self.report())
+        with open(path, "w", encoding="UTF-8") as report_file:
+            json.dump(report, report_file, indent=2)
+        self.info("Wrote the render report %s", path)
+        return path
+
+    def __deep_element_added_cb(self, unused_pipeline, unused_bin, element):
+        self.__instrument(element)
+
+    def __instrument(self, element):
+        factory = element.get_factory()
+        if not factory:
+            return
+
+        if factory.get_name() in QUEUE_FACTORIES:
+            self.__queues.append(element)
+            return
+
+        klass = factory.get_metadata("klass") or ""
+        if not any(word in klass for word in MEASURED_KLASSES) or element in self.__stats:
+            return
+
+        stats = ElementStats(element)
+        self.__stats[element] = stats
+        counts_frames = "Encoder/Video" in klass
+        for pad in element.sinkpads:
+            self.__add_probe(pad, self.__sink_buffer_cb, stats, counts_frames)
+        for pad in element.srcpads:
+            self.__add_probe(pad, self.__src_buffer_cb, stats)
+        handler_id = element.connect("pad-added", self.__pad_added_cb, stats, counts_frames)
+        self.__pad_added_handlers.append((element, handler_id))
+
+    def __add_probe(self, pad, callback, *args):
+        # Calling the callback for each buffer takes the GIL.
+        probe_id = pad.add_probe(Gst.PadProbeType.BUFFER, callback, *args)
+        self.__probes.append((pad, probe_id))
+
+    def __pad_added_cb(self, unused_element, pad, stats, counts_frames):
+        if pad.get_direction() == Gst.PadDirection.SINK:
+            self.__add_probe(pad, self.__sink_buffer_cb, stats, counts_frames)
+        else:
+            self.__add_probe(pad, self.__src_buffer_cb, stats)
+
+    def __sink_buffer_cb(self, unused_pad, unused_info, stats, counts_frames):
+        stats.buffer_in()
+        if counts_frames:
+            with self.__frames_lock:
+                self.__video_frames += 1
+        return Gst.PadProbeReturn.OK
+
+    def __src_buffer_cb(self, unused_pad, unused_info, stats):
+        stats.buffer_out()
+        return Gst.PadProbeReturn.OK
+
+    def __sample_cb(self):
+        res, position = self.__pipeline.query_position(Gst.Format.TIME)
+        self.sample(time.monotonic(), position if res else None)
+        return True
+
+    def sample(self, now, position):
+        """Records the encoding speed, the queue levels and the stalls.
+
+        Args:
+            now (float): The monotonic time of the sample.
+            position (Optional[int]): The position of the pipeline.
+        """
+        elapsed = round(now - self.__time_started, 1)
+        last_time, last_frames = self.__last_sample
+        with self.__frames_lock:
+            frames = self.__video_frames
+        if now > last_time:
+            self.fps.append([elapsed, round((frames - last_frames) / (now - last_time), 2)])
+        self.__last_sample = (now, frames)
+
+        levels = {}
+        for queue in self.__queues:
+            level = self.__queue_level(queue)
+            levels[queue.get_name()] = level
+            self.queue_levels.setdefault(queue.get_name(), []).append([elapsed, level])
+
+        if position is None or position != self.__last_position:
+            self.__close_stall(now)
+            self.__last_position = position
+            self.__last_moved = now
+        elif not self.__stall and now - self.__last_moved >= STALL_DURATION:
+            self.__stall_started = self.__last_moved
+            self.__stall = {
+                "start": round(self.__last_moved - self.__time_started, 1),
+                "position": position,
+                # The queue levels tell which side of the pipeline blocks.
+                "queues": levels,
+            }
+
+    def __close_stall(self, now):
+        if not self.__stall:
+            return
+
+        self.__stall["duration"] = round(now - self.__stall_started, 1)
+        self.warning("Rendering stalled for %ss at %s", self.__stall["duration"],
+                     Gst.TIME_ARGS(self.__stall["position"]))
+        self.stalls.append(self.__stall)
+        self.__stall = None
+
+    @staticmethod
+    def __queue_level(queue):
+        """Gets the fill level of a queue, in percent."""
+        ratios = []
+        for current, maximum in (("current-level-time", "max-size-time"),
+                                 ("current-level-buffers", "max-size-buffers"),
+                                 ("current-level-bytes", "max-size-bytes")):
+            max_value = queue.get_property(maximum)
+            if max_value:
+                ratios.append(queue.get_property(current) / max_value)
+        return round(100 * max(ratios), 1) if ratios else 0
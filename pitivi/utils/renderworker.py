@@ -0,0 +1,63 @@
+# -*- coding: utf-8 -*-
+# Pitivi video editor
+# Copyright (c) 2024, Pitivi contributors
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this program; if not, see <http://www.gnu.org/licenses/>.
+"""Entry point of the processes rendering a chunk of a project.
+
+The processes are spawned without the app, so this module must not import
+the GObject introspection modules before they are initialized.
+"""
+from pitivi.check import initialize_modules
+
+
+def render_chunk(index, project_uri, profile_name, output_uri, start, stop, track_types, queue):
+    """Renders a range of a saved project in a worker process.
+
+    The progress and the outcome are reported through the queue as
+    `(kind, index, value)` tuples, where kind is "position", "done"
+    or "error".
+
+    Args:
+        index (int): The index of the chunk.
+        project_uri (str): The URI of the saved project.
+        profile_name (str): The name of the encoding profile to be used.
+        output_uri (str): The URI of the file to be rendered.
+        start (int): The start of the range, in nanoseconds.
+        stop (int): The end of the range, in nanoseconds.
+        track_types (Optional[int]): The GES.TrackType of the tracks to be
+            rendered, or None for all of them.
+        queue (multiprocessing.Queue): The queue read by the app.
+    """
+    initialize_modules(headless=True)
+    # pylint: disable=import-outside-toplevel
+    from gi.repository import GES
+    from gi.repository import GLib
+    from pitivi.utils import loggable
+    from pitivi.utils.parallelrender import render_range
+
+    loggable.init("PITIVI_DEBUG")
+
+    def position_cb(position):
+        queue.put(("position", index, position))
+
+    try:
+        if track_types is not None:
+            track_types = GES.TrackType(track_types)
+        render_range(project_uri, profile_name, output_uri, start, stop, position_cb,
+                     track_types)
+    except GLib.Error as e:
+        queue.put(("error", index, e.message))
+    else:
+        queue.put(("done", index, None))
@@ -152,3 +152,41 @@ class CPUUsageTracker:
     def reset(self):
         self.last_moment = datetime.datetime.now()
         self.last_usage = resource.getrusage(resource.RUSAGE_SELF)
+
+
+class SystemLoadTracker:
+    """Measures the CPU usage of the whole system, on Linux."""
+
+    def __init__(self):
+        self.last_times = self._read_times()
+
+    @staticmethod
+    def _read_times():
+        try:
+            with open("/proc/stat", encoding="UTF-8") as stat:
+                fields = stat.readline().split()
+        except OSError:
+            return None
+
+        # user, nice, system, idle, iowait, irq, softirq, steal
+        return [int(field) for field in fields[1:9]]
+
+    def load(self):
+        """Gets the CPU usage since the previous call.
+
+        Returns:
+            Optional[Tuple[float, float]]: The percentages of the CPU time
+            spent working and waiting for I/O, or None if unknown.
+        """
+        times = self._read_times()
+        last_times, self.last_times = self.last_times, times
+        if not times or not last_times:
+            return None
+
+        deltas = [time - last_time for time, last_time in zip(times, last_times)]
+        total = sum(deltas)
+        if total <= 0:
+            return None
+
+        idle, iowait = deltas[3], deltas[4]
+        return 100 * (total - idle - iowait) / total, 100 * iowait / total
@@ -15,10 +15,15 @@
 #
 # You should have received a copy of the GNU Lesser General Public
 # License along with this program; if not, see <http://www.gnu.org/licenses/>.
+import bisect
+import heapq
+import weakref
 from typing import Iterable
 from typing import Set
 
+from gi.repository import Gdk
 from gi.repository import GES
+from gi.repository import GLib
 from gi.repository import GObject
 from gi.repository import Gst
 from gi.repository import Gtk
@@ -34,6 +39,9 @@ UNSELECT = 1
 # Extend the selection with the given set.
 SELECT_ADD = 2
 
+# The zoom changes are applied before the next frame is drawn.
+ZOOM_UPDATE_PRIORITY = Gdk.PRIORITY_REDRAW - 1
+
 
 class TimelineError(Exception):
     """Base Exception for errors happening in `Timeline`s or `Clip`s."""
@@ -363,6 +371,144 @@ class EditingContext(GObject.Object, Loggable):
                         self.focus, self.focus.props.duration + self.focus.props.in_point)
 
 
+class IntervalIndex:
+    """Index of the time intervals of objects, for range queries.
+
+    The intervals are grouped by length, in buckets of lengths between
+    consecutive powers of two. In each bucket they are kept sorted by their
+    start, so the ones overlapping a time range are found with a binary
+    search starting at most one bucket length before the range. This way
+    a long interval does not slow down the queries on the short ones. The
+    starts and the ends are also kept sorted, for finding the closest edges.
+    """
+
+    def __init__(self):
+        # Maps the bit length of the intervals lengths to the sorted
+        # starts of the intervals and the objects in the same order.
+        self.__buckets = {}
+        # The starts and the ends of the intervals, sorted.
+        self.__starts = []
+        self.__ends = []
+        # The (start, end) interval of each object.
+        self.__extents = {}
+
+    def __len__(self):
+        return len(self.__extents)
+
+    def __contains__(self, item):
+        return item in self.__extents
+
+    def add(self, item, start, end):
+        """Adds an object covering the specified interval.
+
+        Args:
+            item (object): The hashable object to be indexed.
+            start (int): The start of the interval.
+            end (int): The end of the interval, excluded.
+        """
+        if item in self.__extents:
+            self.remove(item)
+
+        starts, items = self.__buckets.setdefault((end - start).bit_length(), ([], []))
+        index = bisect.bisect_right(starts, start)
+        starts.insert(index, start)
+        items.insert(index, item)
+        bisect.insort(self.__starts, start)
+        bisect.insort(self.__ends, end)
+        self.__extents[item] = (start, end)
+
+    def remove(self, item):
+        """Removes an object from the index."""
+        start, end = self.__extents.pop(item)
+        level = (end - start).bit_length()
+        starts, items = self.__buckets[level]
+        index = bisect.bisect_left(starts, start)
+        while items[index] != item:
+            index += 1
+        del starts[index]
+        del items[index]
+        if not items:
+            del self.__buckets[level]
+        del self.__starts[bisect.bisect_left(self.__starts, start)]
+        del self.__ends[bisect.bisect_left(self.__ends, end)]
+
+    def update(self, item, start, end):
+        """Updates the interval covered by an indexed object."""
+        if self.__extents.get(item) != (start, end):
+            self.add(item, start, end)
+
+    def get_extent(self, item):
+        """Gets the (start, end) interval of an indexed object."""
+        return self.__extents[item]
+
+    def __query(self, first_start, last_start, end_test):
+        """Gets the objects starting in the range and passing the end test.
+
+        Args:
+            first_start (Callable[[int, List[int]], int]): Gets the index of
+                the first start to consider in the bucket of the specified
+                level.
+            last_start (Callable[[List[int]], int]): Gets the index after
+                the last start to consider in the bucket.
+            end_test (Callable[[int], bool]): Checks the end of an interval.
+
+        Returns:
+            List[object]: The objects, sorted by the start of their interval.
+        """
+        results = []
+        for level, (starts, items) in self.__buckets.items():
+            first = first_start(level, starts)
+            last = last_start(starts)
+            results.append([item for item in items[first:last]
+                            if end_test(self.__extents[item][1])])
+        return list(heapq.merge(*results, key=lambda item: self.__extents[item][0]))
+
+    def overlapping(self, start, end):
+        """Gets the objects whose interval overlaps the specified range.
+
+        Args:
+            start (int): The start of the range.
+            end (int): The end of the range, excluded.
+
+        Returns:
+            List[object]: The objects, sorted by the start of their interval.
+        """
+        # The intervals in a bucket are shorter than 1 << level.
+        return self.__query(
+            lambda level, starts: bisect.bisect_right(starts, start - (1 << level)),
+            lambda starts: bisect.bisect_left(starts, end),
+            lambda item_end: item_end > start)
+
+    def containing(self, position):
+        """Gets the objects whose interval contains the position, ends included.
+
+        Returns:
+            List[object]: The objects, sorted by the start of their interval.
+        """
+        return self.__query(
+            lambda level, starts: bisect.bisect_right(starts, position - (1 << level)),
+            lambda starts: bisect.bisect_right(starts, position),
+            lambda item_end: item_end >= position)
+
+    def next_edge(self, position):
+        """Gets the closest start or end after the position, if any."""
+        edges = []
+        for values in (self.__starts, self.__ends):
+            index = bisect.bisect_right(values, position)
+            if index < len(values):
+                edges.append(values[index])
+        return min(edges, default=None)
+
+    def previous_edge(self, position):
+        """Gets the closest start or end before the position, if any."""
+        edges = []
+        for values in (self.__starts, self.__ends):
+            index = bisect.bisect_left(values, position)
+            if index > 0:
+                edges.append(values[index - 1])
+        return max(edges, default=None)
+
+
 # -------------------------- Interfaces ----------------------------------------#
 
 
@@ -386,6 +532,11 @@ class Zoomable:
     . set_zoom_ratio
     Instance Methods
     . zoom_changed()
+
+    The zoom ratio changes right away, but the instances are notified in a
+    single pass before the next frame is drawn, so the zoom changes done
+    in the meantime, for example when scrolling fast, are coalesced. The
+    widgets not mapped are notified when they get mapped.
     """
 
     sigid = None
@@ -396,6 +547,10 @@ class Zoomable:
     zoom_range = max_zoom - min_zoom
     _cur_zoom = 20
     zoomratio = None
+    _update_id = 0
+    # The handlers of the "map" signal of the widgets to be notified when
+    # mapped, by widget.
+    _map_handler_ids = weakref.WeakKeyDictionary()
 
     app = None
 
@@ -418,13 +573,44 @@ class Zoomable:
     def remove_instance(cls, instance):
         cls._instances.remove(instance)
 
+    @classmethod
+    def has_instance(cls, instance):
+        """Checks whether the instance is notified of the zoom changes."""
+        return instance in cls._instances
+
     @classmethod
     def set_zoom_ratio(cls, ratio):
         ratio = min(max(cls.min_zoom, ratio), cls.max_zoom)
         if cls.zoomratio != ratio:
             cls.zoomratio = ratio
-            for inst in cls._instances:
-                inst.zoom_changed()
+            if not cls._update_id:
+                cls._update_id = GLib.idle_add(cls.__update_cb, priority=ZOOM_UPDATE_PRIORITY)
+
+    @classmethod
+    def apply_zoom(cls):
+        """Notifies the instances of the pending zoom change right away."""
+        if cls._update_id:
+            GLib.source_remove(cls._update_id)
+            cls.__update_cb()
+
+    @classmethod
+    def __update_cb(cls):
+        cls._update_id = 0
+        for inst in list(cls._instances):
+            if isinstance(inst, Gtk.Widget) and not inst.get_mapped():
+                # Out of view, notified when it gets mapped.
+                if inst not in cls._map_handler_ids:
+                    cls._map_handler_ids[inst] = inst.connect("map", cls.__instance_map_cb)
+                continue
+
+            inst.zoom_changed()
+        return False
+
+    @classmethod
+    def __instance_map_cb(cls, inst):
+        inst.disconnect(cls._map_handler_ids.pop(inst))
+        if inst in cls._instances:
+            inst.zoom_changed()
 
     @classmethod
     def set_zoom_level(cls, level):
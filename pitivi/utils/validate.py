@@ -380,12 +380,14 @@ def zoom_func(scenario, action):
     {"zoom-fit": timeline.ui.set_best_zoom_ratio,
      "zoom-out": Zoomable.zoom_out,
      "zoom-in": Zoomable.zoom_in}[action.type]()
+    Zoomable.apply_zoom()
 
     return True
 
 
 def set_zoom_level_func(scenario, action):
     Zoomable.set_zoom_level(action.structure["level"])
+    Zoomable.apply_zoom()
 
     return True
 
@@ -0,0 +1,103 @@
+# -*- coding: utf-8 -*-
+# Pitivi video editor
+# Copyright (c) 2024, Pitivi contributors
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this program; if not, see <http://www.gnu.org/licenses/>.
+"""Benchmark of the parallel rendering.
+
+Renders a saved project with a single pipeline, then in chunks rendered by
+parallel processes, and compares the wall times. The rendering settings are
+those of the first encoding profile saved in the project.
+
+Run with: python3 -m tests.benchmark_render PROJECT.xges [PROCESSES]
+"""
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+from gi.repository import GLib
+from gi.repository import Gst
+from gi.repository import GstPbutils
+
+from pitivi.render import CHUNKS_PER_PROCESS
+from pitivi.utils.parallelrender import compute_cut_points
+from pitivi.utils.parallelrender import load_project
+from pitivi.utils.parallelrender import ParallelRender
+from pitivi.utils.parallelrender import render_range
+
+
+def get_framerate(container_profile):
+    """Gets the framerate of the rendered video, if any."""
+    for profile in container_profile.get_profiles():
+        if not isinstance(profile, GstPbutils.EncodingVideoProfile):
+            continue
+        restriction = profile.get_restriction()
+        if restriction and not restriction.is_empty():
+            res, num, denom = restriction[0].get_fraction("framerate")
+            if res:
+                return Gst.Fraction(num, denom)
+    return None
+
+
+def render_single(project_uri, profile_name, output_uri, duration):
+    """Returns the duration of rendering with a single pipeline."""
+    start = time.monotonic()
+    render_range(project_uri, profile_name, output_uri, 0, duration)
+    return time.monotonic() - start
+
+
+def render_parallel(project_path, output_uri, container_profile, cut_points, processes):
+    """Returns the duration of rendering in parallel processes."""
+    loop = GLib.MainLoop()
+    parallel_render = ParallelRender(output_uri, container_profile, cut_points, processes)
+    shutil.copyfile(project_path, Gst.uri_get_location(parallel_render.project_uri))
+
+    def error_cb(unused_parallel_render, message):
+        print(message, file=sys.stderr)
+        loop.quit()
+
+    parallel_render.connect("done", lambda unused_parallel_render: loop.quit())
+    parallel_render.connect("error", error_cb)
+    start = time.monotonic()
+    parallel_render.start()
+    loop.run()
+    return time.monotonic() - start
+
+
+def main(project_path, processes):
+    project_uri = Gst.filename_to_uri(os.path.abspath(project_path))
+    project, ges_timeline = load_project(project_uri)
+    container_profile = project.list_encoding_profiles()[0]
+    duration = ges_timeline.props.duration
+    cut_points = compute_cut_points(ges_timeline, processes * CHUNKS_PER_PROCESS,
+                                    get_framerate(container_profile))
+    print(f"{Gst.TIME_ARGS(duration)} timeline, {len(cut_points) - 1} chunks, "
+          f"{processes} processes")
+
+    extension = container_profile.get_file_extension() or "out"
+    with tempfile.TemporaryDirectory() as temp_dir:
+        single_uri = Gst.filename_to_uri(os.path.join(temp_dir, "single." + extension))
+        single = render_single(project_uri, container_profile.get_name(), single_uri, duration)
+        print(f"{'single pipeline':>20}: {single:.1f}s")
+
+        parallel_uri = Gst.filename_to_uri(os.path.join(temp_dir, "parallel." + extension))
+        parallel = render_parallel(project_path, parallel_uri,
+                                   container_profile, cut_points, processes)
+        print(f"{'parallel':>20}: {parallel:.1f}s, {single / parallel:.2f}x faster")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1], int(sys.argv[2]) if len(sys.argv) > 2 else max(2, (os.cpu_count() or 1) // 4))
@@ -0,0 +1,103 @@
+# -*- coding: utf-8 -*-
+# Pitivi video editor
+# Copyright (c) 2024, Pitivi contributors
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this program; if not, see <http://www.gnu.org/licenses/>.
+# pylint: disable=protected-access
+"""Benchmark of the ruler drawing during playback.
+
+Shows a timeline in an offscreen window and draws the ruler for a series of
+positions, as when playing. The static content of the ruler is reused and
+only the playhead area is painted, as the app does, and then everything is
+drawn for each position, as before the static content was cached.
+
+Run with: python3 -m tests.benchmark_ruler [ZOOM_LEVELS...]
+"""
+import sys
+import time
+
+import cairo
+from gi.repository import Gst
+from gi.repository import Gtk
+
+from pitivi.utils.timeline import Zoomable
+from tests import common
+
+POSITIONS = 500
+
+
+def flush_events():
+    while Gtk.events_pending():
+        Gtk.main_iteration()
+
+
+def create_ruler():
+    """Shows a timeline and returns its ruler."""
+    timeline_container = common.create_timeline_container()
+    window = Gtk.OffscreenWindow()
+    window.set_size_request(1600, 600)
+    window.add(timeline_container)
+    window.show_all()
+    flush_events()
+    return window, timeline_container.ruler
+
+
+def draw_cached(ruler, context):
+    """Returns the average time to paint the moved playhead, in ms."""
+    start = time.perf_counter()
+    for i in range(POSITIONS):
+        ruler._pipeline_position_cb(None, i * Gst.SECOND // 25)
+        context.save()
+        context.rectangle(*ruler._get_playhead_area())
+        context.clip()
+        ruler.do_draw(context)
+        context.restore()
+    return (time.perf_counter() - start) * 1000 / POSITIONS
+
+
+def draw_full(ruler, context):
+    """Returns the average time to draw everything, in ms."""
+    start = time.perf_counter()
+    for i in range(POSITIONS):
+        ruler.position = i * Gst.SECOND // 25
+        drawing_context = cairo.Context(ruler.pixbuf)
+        ruler.draw_background(drawing_context)
+        ruler.draw_ruler(drawing_context)
+        ruler.draw_position(drawing_context)
+        ruler.pixbuf.flush()
+        context.set_source_surface(ruler.pixbuf, 0.0, 0.0)
+        context.paint()
+    return (time.perf_counter() - start) * 1000 / POSITIONS
+
+
+def main(zoom_levels):
+    window, ruler = create_ruler()
+    surface = cairo.ImageSurface(cairo.FORMAT_ARGB32, ruler.get_allocated_width(),
+                                 ruler.get_allocated_height())
+    context = cairo.Context(surface)
+    for level in zoom_levels:
+        Zoomable.set_zoom_level(level)
+        Zoomable.apply_zoom()
+        flush_events()
+        cached = draw_cached(ruler, context)
+        full = draw_full(ruler, context)
+        # Recreate the buffer, as the playhead has been drawn on it.
+        ruler.do_configure_event(None)
+        print(f"zoom level {level:>3}: {cached:.3f} ms per position when cached, "
+              f"{full:.3f} ms when drawing everything")
+    window.destroy()
+
+
+if __name__ == "__main__":
+    main([int(arg) for arg in sys.argv[1:]] or [20, 50, 80, 100])
@@ -0,0 +1,176 @@
+# -*- coding: utf-8 -*-
+# Pitivi video editor
+# Copyright (c) 2024, Pitivi contributors
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this program; if not, see <http://www.gnu.org/licenses/>.
+"""Benchmark of the time range queries in the timeline UI.
+
+Builds a synthetic timeline with test clips on a few layers and compares
+the former scans over all the clips with the `IntervalIndex` queries, for
+finding the clips at a position and the closest clip edge. Also measures
+the queries on a layer with one long clip among many short ones, which
+should not be slower than without the long clip.
+
+Run with: python3 -m tests.benchmark_timeline [CLIPS]
+"""
+import random
+import sys
+import time
+
+from gi.repository import GES
+from gi.repository import Gst
+
+from pitivi.utils.timeline import IntervalIndex
+
+LAYERS = 4
+QUERIES = 1000
+
+
+def create_timeline(n_clips):
+    """Creates a timeline with back-to-back test clips of random durations."""
+    rng = random.Random(0)
+    ges_timeline = GES.Timeline.new_audio_video()
+    ges_layers = [ges_timeline.append_layer() for unused_i in range(LAYERS)]
+    ends = [0] * LAYERS
+    for i in range(n_clips):
+        layer_index = i % LAYERS
+        duration = rng.randint(1, 10) * Gst.SECOND
+        ges_clip = GES.TestClip.new()
+        ges_clip.props.start = ends[layer_index]
+        ges_clip.props.duration = duration
+        ges_layers[layer_index].add_clip(ges_clip)
+        ends[layer_index] += duration
+    return ges_timeline
+
+
+def create_indexes(ges_timeline):
+    """Indexes the clips of each layer, as the layers widgets do."""
+    indexes = []
+    for ges_layer in ges_timeline.get_layers():
+        index = IntervalIndex()
+        for ges_clip in ges_layer.get_clips():
+            index.add(ges_clip, ges_clip.props.start,
+                      ges_clip.props.start + ges_clip.props.duration)
+        indexes.append(index)
+    return indexes
+
+
+def clips_at_scan(ges_timeline, position):
+    """The former `Timeline.get_sources_at_position` loop."""
+    clips = []
+    for ges_layer in ges_timeline.get_layers():
+        for ges_clip in ges_layer.get_clips():
+            start = ges_clip.props.start
+            if start <= position <= start + ges_clip.props.duration:
+                clips.append(ges_clip)
+    return clips
+
+
+def clips_at_index(indexes, position):
+    clips = []
+    for index in indexes:
+        clips.extend(index.containing(position))
+    return clips
+
+
+def next_edge_scan(ges_timeline, position):
+    """The former `TimelineContainer.first_clip_edge` loop."""
+    end = ges_timeline.props.duration
+    edges = [end]
+    for ges_layer in ges_timeline.get_layers():
+        for ges_clip in ges_layer.get_clips_in_interval(position, end):
+            if ges_clip.props.start > position:
+                edges.append(ges_clip.props.start)
+            if ges_clip.props.start + ges_clip.props.duration < end:
+                edges.append(ges_clip.props.start + ges_clip.props.duration)
+    return min(edges)
+
+
+def next_edge_index(ges_timeline, indexes, position):
+    edges = [ges_timeline.props.duration]
+    for index in indexes:
+        edge = index.next_edge(position)
+        if edge is not None:
+            edges.append(edge)
+    return min(edges)
+
+
+def long_clip_case(n_clips):
+    """Compares the viewport queries with and without a long interval."""
+    index = IntervalIndex()
+    for i in range(n_clips):
+        index.add(i, i * Gst.SECOND, (i + 1) * Gst.SECOND)
+
+    rng = random.Random(2)
+    viewports = [(start, start + 10 * Gst.SECOND)
+                 for start in (rng.randrange(n_clips) * Gst.SECOND for unused_i in range(QUERIES))]
+
+    def query(viewport):
+        return index.overlapping(*viewport)
+
+    short_time, short_results = measure(query, viewports)
+    index.add("long", 0, n_clips * Gst.SECOND)
+    long_time, long_results = measure(query, viewports)
+    assert [results + ["long"] for results in short_results] == \
+        [sorted(results, key=lambda item: item == "long") for results in long_results]
+    print(f"{'long clip':>20}: {n_clips} short clips {short_time:.3f} ms, "
+          f"with a long clip {long_time:.3f} ms")
+
+
+def measure(func, positions):
+    """Returns the average duration of a query, in ms, and the results."""
+    start = time.perf_counter()
+    results = [func(position) for position in positions]
+    return (time.perf_counter() - start) * 1000 / len(positions), results
+
+
+def main(n_clips):
+    ges_timeline = create_timeline(n_clips)
+
+    start = time.perf_counter()
+    indexes = create_indexes(ges_timeline)
+    print(f"{n_clips} clips on {LAYERS} layers, "
+          f"indexed in {(time.perf_counter() - start) * 1000:.1f} ms")
+
+    rng = random.Random(1)
+    duration = ges_timeline.props.duration
+    positions = [rng.randrange(duration) for unused_i in range(QUERIES)]
+
+    for name, scan, indexed in (
+            ("clips at position",
+             lambda position: clips_at_scan(ges_timeline, position),
+             lambda position: clips_at_index(indexes, position)),
+            ("next clip edge",
+             lambda position: next_edge_scan(ges_timeline, position),
+             lambda position: next_edge_index(ges_timeline, indexes, position))):
+        scan_time, scan_results = measure(scan, positions)
+        index_time, index_results = measure(indexed, positions)
+        assert scan_results == index_results, name
+        print(f"{name:>20}: scan {scan_time:.3f} ms, index {index_time:.3f} ms, "
+              f"{scan_time / index_time:.0f}x faster")
+
+    # Moving clips updates the index, as when editing.
+    ges_clips = ges_timeline.get_layers()[0].get_clips()
+    start = time.perf_counter()
+    for ges_clip in rng.sample(ges_clips, min(QUERIES, len(ges_clips))):
+        indexes[0].update(ges_clip, ges_clip.props.start + 1,
+                          ges_clip.props.start + ges_clip.props.duration + 1)
+    print(f"{'index update':>20}: "
+          f"{(time.perf_counter() - start) * 1000 / QUERIES:.3f} ms")
+
+    long_clip_case(n_clips)
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 10000)
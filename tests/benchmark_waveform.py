@@ -0,0 +1,111 @@
+# -*- coding: utf-8 -*-
+# Pitivi video editor
+# Copyright (c) 2024, Pitivi contributors
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this program; if not, see <http://www.gnu.org/licenses/>.
+"""Benchmark of the waveform peaks accumulation.
+
+Compares `WaveformPeaks` with the nested lists implementation it replaced,
+feeding both the level values of a stream with some missing samples.
+
+Run with: python3 -m tests.benchmark_waveform [HOURS]
+"""
+import random
+import sys
+import time
+import tracemalloc
+
+import numpy
+
+from pitivi.timeline.previewers import SAMPLE_DURATION
+from pitivi.timeline.previewers import WaveformPeaks
+
+
+class ListsWaveformPeaks:
+    """The former implementation, working on nested lists."""
+
+    def __init__(self, n_samples):
+        self.n_samples = n_samples
+        self.peaks = None
+        self.prev_pos = 0
+
+    def add(self, pos, rms):
+        if self.peaks is None:
+            self.peaks = [[0] * self.n_samples for unused_channel in rms]
+
+        if pos >= len(self.peaks[0]):
+            return False
+
+        for i, val in enumerate(rms):
+            if val < 0:
+                val = 10 ** (val / 20) * 100
+            else:
+                val = self.peaks[i][pos - 1]
+
+            unknowns = range(self.prev_pos + 1, pos)
+            if unknowns:
+                prev_val = self.peaks[i][self.prev_pos]
+                linear_const = (val - prev_val) / len(unknowns)
+                for temppos in unknowns:
+                    self.peaks[i][temppos] = self.peaks[i][temppos - 1] + linear_const
+
+            self.peaks[i][pos] = val
+
+        self.prev_pos = pos
+        return True
+
+    def finish(self):
+        if len(self.peaks) > 1:
+            return (numpy.array(self.peaks[0]) + numpy.array(self.peaks[1])) / 2
+        return numpy.array(self.peaks[0])
+
+
+def generate_levels(n_samples):
+    """Generates the (position, rms) pairs posted by the level element."""
+    rng = random.Random(0)
+    levels = []
+    for pos in range(n_samples):
+        # Drop some samples to exercise the interpolation.
+        if rng.random() < 0.01:
+            continue
+        levels.append((pos, [rng.uniform(-90, -1)]))
+    return levels
+
+
+def run(accumulator_class, n_samples, levels):
+    """Returns the duration and the memory peak of accumulating the levels."""
+    tracemalloc.start()
+    start = time.perf_counter()
+    accumulator = accumulator_class(n_samples)
+    for pos, rms in levels:
+        accumulator.add(pos, rms)
+    accumulator.finish()
+    duration = time.perf_counter() - start
+    unused_current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return duration, peak
+
+
+def main(hours):
+    n_samples = int(hours * 3600 * 10 ** 9 / SAMPLE_DURATION)
+    levels = generate_levels(n_samples)
+    print(f"{hours}h of audio, {n_samples} samples")
+    for accumulator_class in (ListsWaveformPeaks, WaveformPeaks):
+        duration, peak = run(accumulator_class, n_samples, levels)
+        print(f"{accumulator_class.__name__:>20}: {duration:.2f}s, "
+              f"peak memory {peak / 1024 / 1024:.1f} MB")
+
+
+if __name__ == "__main__":
+    main(float(sys.argv[1]) if len(sys.argv) > 1 else 1)
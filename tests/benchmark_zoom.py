@@ -0,0 +1,90 @@
+# -*- coding: utf-8 -*-
+# Pitivi video editor
+# Copyright (c) 2024, Pitivi contributors
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this program; if not, see <http://www.gnu.org/licenses/>.
+"""Benchmark of the zoom latency against the number of clips.
+
+Shows timelines with an increasing number of test clips in an offscreen
+window and zooms in and out, as when scrolling with Ctrl pressed. The zoom
+changes are applied once per frame, as the app does, and then once per
+scroll event, as before they were coalesced.
+
+Run with: python3 -m tests.benchmark_zoom [CLIPS...]
+"""
+import sys
+import time
+
+from gi.repository import GES
+from gi.repository import Gst
+from gi.repository import Gtk
+
+from pitivi.utils.timeline import Zoomable
+from tests import common
+
+# The number of scroll events handled before a frame is drawn.
+EVENTS_PER_FRAME = 4
+ZOOM_STEPS = 40
+
+
+def flush_events():
+    while Gtk.events_pending():
+        Gtk.main_iteration()
+
+
+def create_timeline(n_clips):
+    """Shows a timeline with back-to-back test clips."""
+    timeline_container = common.create_timeline_container()
+    ges_layer = timeline_container.timeline.ges_timeline.append_layer()
+    for i in range(n_clips):
+        ges_clip = GES.TestClip.new()
+        ges_clip.props.start = i * Gst.SECOND
+        ges_clip.props.duration = Gst.SECOND
+        ges_layer.add_clip(ges_clip)
+
+    window = Gtk.OffscreenWindow()
+    window.set_size_request(1600, 600)
+    window.add(timeline_container)
+    window.show_all()
+    flush_events()
+    return window
+
+
+def zoom(coalesced):
+    """Returns the average time of a zoom step, in ms."""
+    levels = [50 + step % 10 if step % 20 < 10 else 60 - step % 10
+              for step in range(ZOOM_STEPS)]
+    start = time.perf_counter()
+    for step, level in enumerate(levels, 1):
+        Zoomable.set_zoom_level(level)
+        if not coalesced:
+            Zoomable.apply_zoom()
+        if step % EVENTS_PER_FRAME == 0:
+            flush_events()
+    flush_events()
+    return (time.perf_counter() - start) * 1000 / ZOOM_STEPS
+
+
+def main(clip_counts):
+    for n_clips in clip_counts:
+        window = create_timeline(n_clips)
+        per_frame = zoom(coalesced=True)
+        per_event = zoom(coalesced=False)
+        print(f"{n_clips:>6} clips: {per_frame:.1f} ms per zoom step when coalesced, "
+              f"{per_event:.1f} ms when applied per scroll event")
+        window.destroy()
+
+
+if __name__ == "__main__":
+    main([int(arg) for arg in sys.argv[1:]] or [100, 1000, 4000, 8000])
@@ -436,6 +436,7 @@ class TestCase(unittest.TestCase, Loggable):
             self.gccollect()
             self.gcverify()
         Zoomable.set_zoom_level(self.__zoom_level)
+        Zoomable.apply_zoom()
 
     # override run() to save a reference to the test result object
     def run(self, result=None):
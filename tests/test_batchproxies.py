@@ -0,0 +1,81 @@
+# -*- coding: utf-8 -*-
+# Pitivi video editor
+# Copyright (c) 2024, Pitivi contributors
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this program; if not, see <http://www.gnu.org/licenses/>.
+"""Tests for the batchproxies module."""
+import os
+import tempfile
+
+from gi.repository import GES
+from gi.repository import Gst
+
+from pitivi.batchproxies import BatchProxies
+from pitivi.batchproxies import collect_uris
+from pitivi.headless import HeadlessApp
+from pitivi.timeline.previewers import get_wavefile_location_for_uri
+from pitivi.timeline.previewers import ThumbnailCache
+from tests import common
+
+
+class TestCollectUris(common.TestCase):
+    """Tests for the collect_uris function."""
+
+    def test_directory(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            os.mkdir(os.path.join(temp_dir, "sub"))
+            for name in ("b.mov", "a.ogg", "a.ogg.123.proxy.mov",
+                         "b.mov.5.10x10.scaledproxy.mov.part", "sub/c.mkv"):
+                with open(os.path.join(temp_dir, name), "w", encoding="UTF-8"):
+                    pass
+
+            uris = collect_uris([temp_dir, os.path.join(temp_dir, "b.mov")])
+            self.assertListEqual(uris, [Gst.filename_to_uri(os.path.join(temp_dir, name))
+                                        for name in ("a.ogg", "b.mov", "sub/c.mkv")])
+
+    def test_project(self):
+        with tempfile.NamedTemporaryFile("w", suffix=".xges", encoding="UTF-8") as xges:
+            xges.write("""<ges version='0.7'>
+  <project properties='properties;' metadatas='metadatas;'>
+    <ressources>
+      <asset id='file:///a.ogg' extractable-type-name='GESUriClip' properties='properties;' metadatas='metadatas;'/>
+      <asset id='file:///b.mov.5.proxy.mov' extractable-type-name='GESUriClip' properties='properties;' metadatas='metadatas;'/>
+      <asset id='agingtv' extractable-type-name='GESEffect' properties='properties;' metadatas='metadatas;'/>
+    </ressources>
+  </project>
+</ges>""")
+            xges.flush()
+
+            self.assertListEqual(collect_uris([xges.name]), ["file:///a.ogg", "file:///b.mov"])
+
+
+class TestBatchProxies(common.TestCase):
+    """Tests for the BatchProxies class."""
+
+    def test_missing_previews(self):
+        """Checks the previews are created even when the proxies exist."""
+        sample_name = "1sec_simpsons_trailer.mp4"
+        with common.cloned_sample(sample_name):
+            uri = common.get_sample_uri(sample_name)
+            batch = BatchProxies(HeadlessApp(), [uri], high_quality=True, max_size=None, jobs=1)
+            asset = GES.UriClipAsset.request_sync(uri)
+            proxy_uri = batch.proxy_manager.get_proxy_uri(asset)
+            with open(Gst.uri_get_location(proxy_uri), "w", encoding="UTF-8"):
+                pass
+            self.assertFalse(os.path.exists(get_wavefile_location_for_uri(uri)))
+
+            self.assertEqual(batch.run(), 0)
+
+            self.assertTrue(ThumbnailCache.get(uri).positions)
+            self.assertTrue(os.path.exists(get_wavefile_location_for_uri(uri)))
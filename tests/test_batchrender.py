@@ -0,0 +1,134 @@
+# -*- coding: utf-8 -*-
+# Pitivi video editor
+# Copyright (c) 2024, Pitivi contributors
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this program; if not, see <http://www.gnu.org/licenses/>.
+"""Tests for the batchrender module."""
+import contextlib
+import io
+import json
+import os
+import tempfile
+from unittest import mock
+
+from gi.repository import Gst
+
+from pitivi.batchrender import HeadlessRender
+from pitivi.batchrender import print_event
+from pitivi.headless import HeadlessApp
+from pitivi.render import ProxyRendering
+from pitivi.utils.rendertelemetry import RenderTelemetry
+from tests import common
+
+
+XGES = """<ges version='0.7'>
+  <project properties='properties;' metadatas='metadatas, format-version=(string)0.7;'>
+    <encoding-profiles>
+      <encoding-profile name='pitivi-profile' description='Pitivi encoding profile' type='container' preset-name='webmmux' format='video/webm' >
+        <stream-profile parent='pitivi-profile' id='0' type='video' presence='0' format='video/x-vp8, profile=(string){ 0, 1, 2, 3 }' preset-name='vp8enc' restriction='video/x-raw, width=(int)320, height=(int)136, framerate=(fraction)24/1, pixel-aspect-ratio=(fraction)1/1' pass='0' variableframerate='0' />
+        <stream-profile parent='pitivi-profile' id='1' type='audio' presence='0' format='audio/x-vorbis, rate=(int)[ 1, 200000 ], channels=(int)[ 1, 255 ]' preset-name='vorbisenc' restriction='audio/x-raw, rate=(int)48000, channels=(int)2' />
+      </encoding-profile>
+    </encoding-profiles>
+    <ressources>
+      <asset id='%(uri)s' extractable-type-name='GESUriClip' />
+    </ressources>
+    <timeline>
+      <track caps='video/x-raw' track-type='4' track-id='0' />
+      <track caps='audio/x-raw' track-type='2' track-id='1' />
+      <layer priority='0'>
+        <clip id='0' asset-id='%(uri)s' type-name='GESUriClip' layer-priority='0' track-types='6' start='0' duration='1000000000' inpoint='0' rate='0' />
+      </layer>
+    </timeline>
+  </project>
+</ges>"""
+
+
+class TestHeadlessRender(common.TestCase):
+    """Tests for the HeadlessRender class."""
+
+    def render(self, app, preset=None):
+        """Renders a sample project with the tool.
+
+        Returns:
+            Tuple[int, List[dict], str]: The exit status of the tool, the
+            events it printed and the path of the rendered file.
+        """
+        project_uri = self.create_project_file_from_xges(
+            XGES % {"uri": common.get_sample_uri("1sec_simpsons_trailer.mp4")})
+        self.addCleanup(os.remove, Gst.uri_get_location(project_uri))
+        temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(temp_dir.cleanup)
+        output_path = os.path.join(temp_dir.name, "out.webm")
+
+        render = HeadlessRender(app, Gst.filename_to_uri(output_path), preset,
+                                ProxyRendering.NEVER, 1)
+        stdout = io.StringIO()
+        with contextlib.redirect_stdout(stdout):
+            exitcode = render.run(project_uri)
+
+        events = [json.loads(line) for line in stdout.getvalue().splitlines()]
+        return exitcode, events, output_path
+
+    def test_render(self):
+        exitcode, events, output_path = self.render(HeadlessApp())
+
+        self.assertEqual(exitcode, 0)
+        *progress_events, done_event = events
+        self.assertEqual(done_event["event"], "done", events)
+        self.assertEqual(done_event["output"], Gst.filename_to_uri(output_path))
+        self.assertNotIn("report", done_event)
+        self.assertTrue(progress_events)
+        for event in progress_events:
+            self.assertEqual(event["event"], "progress")
+            self.assertEqual(event["duration"], Gst.SECOND)
+            self.assertLessEqual(event["fraction"], 1.0)
+        fractions = [event["fraction"] for event in progress_events]
+        self.assertListEqual(fractions, sorted(fractions))
+        self.assertGreater(os.path.getsize(output_path), 0)
+
+    def test_unknown_preset(self):
+        exitcode, events, output_path = self.render(HeadlessApp(), preset="nonexistent")
+
+        self.assertEqual(exitcode, 1)
+        self.assertEqual(len(events), 1, events)
+        self.assertEqual(events[0]["event"], "error")
+        self.assertIn("No nonexistent preset", events[0]["message"])
+        self.assertFalse(os.path.exists(output_path))
+
+    def test_report_write_failure(self):
+        app = HeadlessApp()
+        app.settings.render_report = True
+
+        with mock.patch.object(RenderTelemetry, "write_report") as write_report:
+            write_report.side_effect = OSError("Read-only file system")
+            exitcode, events, unused_output_path = self.render(app)
+
+        self.assertEqual(exitcode, 0)
+        write_report.assert_called_once()
+        done_event = events[-1]
+        self.assertEqual(done_event["event"], "done", events)
+        self.assertEqual(done_event["report_error"], "Read-only file system")
+        self.assertNotIn("report", done_event)
+
+
+class TestPrintEvent(common.TestCase):
+    """Tests for the print_event function."""
+
+    def test_event_first(self):
+        stdout = io.StringIO()
+        with contextlib.redirect_stdout(stdout):
+            print_event("progress", position=1, duration=2)
+
+        self.assertEqual(stdout.getvalue(),
+                         '{"event": "progress", "position": 1, "duration": 2}\n')
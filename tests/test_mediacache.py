@@ -0,0 +1,68 @@
+# -*- coding: utf-8 -*-
+# Pitivi video editor
+# Copyright (c) 2024, Pitivi contributors
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this program; if not, see <http://www.gnu.org/licenses/>.
+"""Tests for the utils.mediacache module."""
+import os
+import shutil
+import tempfile
+from unittest import mock
+
+from pitivi.utils.mediacache import FINGERPRINT_CHUNK_SIZE
+from pitivi.utils.mediacache import MediaCache
+from tests import common
+
+
+class TestMediaCache(common.TestCase):
+    """Tests for the MediaCache class."""
+
+    def test_filename(self):
+        """Checks the copied files share the cache files by content only."""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            path = os.path.join(temp_dir, "a.mov")
+            with open(path, "wb") as media_file:
+                media_file.write(os.urandom(3 * FINGERPRINT_CHUNK_SIZE))
+            copy_path = os.path.join(temp_dir, "b.mov")
+            shutil.copyfile(path, copy_path)
+
+            with mock.patch.object(MediaCache, "by_content", False):
+                self.assertNotEqual(MediaCache.filename(path, "thumbs"),
+                                    MediaCache.filename(copy_path, "thumbs"))
+
+            with mock.patch.object(MediaCache, "by_content", True):
+                self.assertEqual(MediaCache.filename(path, "thumbs"),
+                                 MediaCache.filename(copy_path, "thumbs"))
+
+                # Changing the middle of the file is not detected.
+                with open(copy_path, "r+b") as media_file:
+                    media_file.seek(FINGERPRINT_CHUNK_SIZE + 1)
+                    media_file.write(b"x")
+                self.assertEqual(MediaCache.fingerprint(path), MediaCache.fingerprint(copy_path))
+
+                # Changing the end of the file is detected.
+                with open(copy_path, "ab") as media_file:
+                    media_file.write(b"x")
+                self.assertNotEqual(MediaCache.filename(path, "wave.npy"),
+                                    MediaCache.filename(copy_path, "wave.npy"))
+
+    def test_shared_directory(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            with mock.patch.object(MediaCache, "shared_dir", ""):
+                self.assertIsNone(MediaCache.shared_directory("thumbs"))
+
+            with mock.patch.object(MediaCache, "shared_dir", temp_dir):
+                path = MediaCache.shared_directory("thumbs")
+                self.assertEqual(path, os.path.join(temp_dir, "thumbs"))
+                self.assertTrue(os.path.isdir(path))
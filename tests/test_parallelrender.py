@@ -0,0 +1,193 @@
+# -*- coding: utf-8 -*-
+# Pitivi video editor
+# Copyright (c) 2024, Pitivi contributors
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this program; if not, see <http://www.gnu.org/licenses/>.
+"""Tests for the utils.parallelrender module."""
+import os
+import tempfile
+from unittest import skipUnless
+
+from gi.repository import GES
+from gi.repository import GLib
+from gi.repository import Gst
+from gi.repository import GstPbutils
+
+from pitivi.utils.parallelrender import compute_cut_points
+from pitivi.utils.parallelrender import ParallelRender
+from pitivi.utils.parallelrender import render_range
+from tests import common
+
+
+class TestComputeCutPoints(common.TestCase):
+    """Tests for the compute_cut_points function."""
+
+    def create_timeline(self, *clip_durations):
+        ges_timeline = GES.Timeline.new_audio_video()
+        layer = ges_timeline.append_layer()
+        start = 0
+        for duration in clip_durations:
+            clip = GES.TestClip()
+            clip.props.start = start
+            clip.props.duration = duration
+            layer.add_clip(clip)
+            start += duration
+        return ges_timeline
+
+    def test_short_timeline(self):
+        ges_timeline = self.create_timeline(15 * Gst.SECOND)
+        self.assertListEqual(compute_cut_points(ges_timeline, 4),
+                             [0, 15 * Gst.SECOND])
+
+    def test_snapping(self):
+        ges_timeline = self.create_timeline(38 * Gst.SECOND, 42 * Gst.SECOND)
+        cut_points = compute_cut_points(ges_timeline, 4)
+        # The middle cut moves to the start of the second clip.
+        self.assertListEqual(cut_points, [0, 20 * Gst.SECOND, 38 * Gst.SECOND,
+                                          60 * Gst.SECOND, 80 * Gst.SECOND])
+
+    def test_frame_alignment(self):
+        ges_timeline = self.create_timeline(50 * Gst.SECOND)
+        framerate = Gst.Fraction(30000, 1001)
+        cut_points = compute_cut_points(ges_timeline, 2, framerate)
+        self.assertEqual(len(cut_points), 3)
+        frame_duration = Gst.SECOND * 1001 / 30000
+        frames = cut_points[1] / frame_duration
+        self.assertAlmostEqual(frames, round(frames), delta=0.01)
+        self.assertLess(abs(cut_points[1] - 25 * Gst.SECOND), frame_duration)
+
+
+class TestParallelRender(common.TestCase):
+    """Tests for the ParallelRender class."""
+
+    def create_profile(self, framerate, audio=False):
+        container_profile = GstPbutils.EncodingContainerProfile.new(
+            "test-profile", None, Gst.Caps("video/x-matroska"), None)
+        container_profile.set_preset_name("matroskamux")
+        container_profile.add_profile(GstPbutils.EncodingVideoProfile.new(
+            Gst.Caps("image/jpeg"), None,
+            Gst.Caps("video/x-raw,framerate=%d/1" % framerate), 0))
+        if audio:
+            container_profile.add_profile(GstPbutils.EncodingAudioProfile.new(
+                Gst.Caps("audio/x-vorbis"), None, Gst.Caps("audio/x-raw"), 0))
+        return container_profile
+
+    def save_project(self, project_uri, container_profile, duration, framerate, audio=False):
+        project = GES.Project.new(None)
+        ges_timeline = project.extract()
+        track = GES.VideoTrack.new()
+        track.set_restriction_caps(Gst.Caps("video/x-raw,width=64,height=48,framerate=%d/1"
+                                            % framerate))
+        ges_timeline.add_track(track)
+        if audio:
+            ges_timeline.add_track(GES.AudioTrack.new())
+        layer = ges_timeline.append_layer()
+        clip = GES.TestClip()
+        clip.props.duration = duration
+        layer.add_clip(clip)
+
+        project.add_encoding_profile(container_profile)
+        project.save(ges_timeline, project_uri, None, True)
+
+    def render(self, output_path, duration, framerate, audio=False):
+        container_profile = self.create_profile(framerate, audio)
+        parallel_render = ParallelRender(Gst.filename_to_uri(output_path), container_profile,
+                                         [0, Gst.SECOND, duration], 2)
+        self.save_project(parallel_render.project_uri, container_profile, duration, framerate,
+                          audio)
+
+        mainloop = common.create_main_loop()
+        errors = []
+
+        def error_cb(unused_parallel_render, message):
+            errors.append(message)
+            mainloop.quit()
+
+        parallel_render.connect("done", lambda unused_parallel_render: mainloop.quit())
+        parallel_render.connect("error", error_cb)
+        parallel_render.start()
+        mainloop.run(timeout_seconds=60)
+        self.assertListEqual(errors, [])
+
+    def buffers(self, path, description):
+        """Gets the (pts, duration) of the buffers reaching the sink."""
+        pipeline = Gst.parse_launch("filesrc name=src ! matroskademux name=demux " + description)
+        pipeline.get_by_name("src").props.location = path
+        buffers = []
+        pipeline.get_by_name("sink").connect(
+            "handoff",
+            lambda unused_sink, buffer, unused_pad: buffers.append((buffer.pts, buffer.duration)))
+        pipeline.set_state(Gst.State.PLAYING)
+        message = pipeline.get_bus().timed_pop_filtered(
+            10 * Gst.SECOND, Gst.MessageType.EOS | Gst.MessageType.ERROR)
+        pipeline.set_state(Gst.State.NULL)
+        self.assertEqual(message.type, Gst.MessageType.EOS)
+        return buffers
+
+    @skipUnless(all(Gst.ElementFactory.find(name)
+                    for name in ("jpegenc", "matroskamux", "matroskademux")),
+                "jpegenc, matroskamux or matroskademux missing")
+    def test_chunks_joined(self):
+        """Checks the joined chunks have all the frames, once."""
+        framerate = 30
+        duration = 2 * Gst.SECOND
+        with tempfile.TemporaryDirectory() as temp_dir:
+            output_path = os.path.join(temp_dir, "output.mkv")
+            self.render(output_path, duration, framerate)
+
+            discoverer = GstPbutils.Discoverer.new(5 * Gst.SECOND)
+            info = discoverer.discover_uri(Gst.filename_to_uri(output_path))
+            frame_duration = Gst.SECOND // framerate
+            self.assertAlmostEqual(info.get_duration(), duration, delta=frame_duration)
+
+            buffers = self.buffers(output_path, "! fakesink name=sink signal-handoffs=true")
+            self.assertEqual(len(buffers), duration // frame_duration)
+            for index, (timestamp, unused_duration) in enumerate(buffers):
+                # The timestamps are rounded to the millisecond by the muxer.
+                self.assertAlmostEqual(timestamp, index * frame_duration,
+                                       delta=Gst.MSECOND, msg="Frame %d" % index)
+
+    @skipUnless(all(Gst.ElementFactory.find(name)
+                    for name in ("jpegenc", "vorbisenc", "vorbisdec", "parsebin",
+                                 "matroskamux", "matroskademux")),
+                "jpegenc, vorbisenc, vorbisdec, parsebin, matroskamux or matroskademux missing")
+    def test_audio_continuous(self):
+        """Checks the audio has no gap at the cut between the chunks."""
+        framerate = 30
+        duration = 2 * Gst.SECOND
+        with tempfile.TemporaryDirectory() as temp_dir:
+            output_path = os.path.join(temp_dir, "output.mkv")
+            self.render(output_path, duration, framerate, audio=True)
+
+            buffers = self.buffers(output_path,
+                                   "demux.video_0 ! queue ! fakesink "
+                                   "demux.audio_0 ! queue ! vorbisdec ! "
+                                   "fakesink name=sink signal-handoffs=true")
+            self.assertTrue(buffers)
+            self.assertAlmostEqual(buffers[0][0], 0, delta=Gst.MSECOND)
+            for (pts, buffer_duration), (next_pts, unused_duration) in zip(buffers, buffers[1:]):
+                # The timestamps are rounded to the millisecond by the muxer.
+                self.assertAlmostEqual(next_pts, pts + buffer_duration, delta=Gst.MSECOND,
+                                       msg="Gap at %s" % Gst.TIME_ARGS(pts + buffer_duration))
+            end = buffers[-1][0] + buffers[-1][1]
+            self.assertAlmostEqual(end, duration, delta=50 * Gst.MSECOND)
+
+    def test_missing_profile(self):
+        """Checks the chunks are not rendered with another profile."""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            project_uri = Gst.filename_to_uri(os.path.join(temp_dir, "project.xges"))
+            self.save_project(project_uri, self.create_profile(30), Gst.SECOND, 30)
+            output_uri = Gst.filename_to_uri(os.path.join(temp_dir, "output.mkv"))
+            with self.assertRaises(GLib.Error):
+                render_range(project_uri, "other-profile", output_uri, 0, Gst.SECOND)
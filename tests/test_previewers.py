@@ -19,20 +19,32 @@
 import functools
 import os
 import tempfile
+import threading
 from unittest import mock
 
 import numpy
 from gi.repository import Gdk
 from gi.repository import GdkPixbuf
 from gi.repository import GES
+from gi.repository import GLib
 from gi.repository import Gst
 
+from pitivi.timeline.previewers import AssetPreviewer
 from pitivi.timeline.previewers import delete_all_files_in_dir
 from pitivi.timeline.previewers import get_wavefile_location_for_uri
+from pitivi.timeline.previewers import MAX_PENDING_WAVEFORM_TILES
+from pitivi.timeline.previewers import PixbufCache
 from pitivi.timeline.previewers import Previewer
+from pitivi.timeline.previewers import PreviewGeneratorManager
 from pitivi.timeline.previewers import THUMB_HEIGHT
+from pitivi.timeline.previewers import THUMB_LEVELS
 from pitivi.timeline.previewers import THUMB_PERIOD
 from pitivi.timeline.previewers import ThumbnailCache
+from pitivi.timeline.previewers import ThumbnailStore
+from pitivi.timeline.previewers import WaveformCache
+from pitivi.timeline.previewers import WaveformPeaks
+from pitivi.timeline.previewers import WaveformTileCache
+from pitivi.utils.mediacache import MediaCache
 from pitivi.utils.timeline import EditingContext
 from pitivi.utils.timeline import Zoomable
 from tests import common
@@ -142,9 +154,10 @@ class TestVideoPreviewer(TestPreviewers):
 
         mainloop.run()
 
+        # The queues are sorted coarse-to-fine.
         expected_queues = (
-            [[0, 500000000, 1000000000, 1500000000]] * 12 +
-            [[500000000, 1000000000, 1500000000]] * 12 +
+            [[0, 1000000000, 500000000, 1500000000]] * 12 +
+            [[1000000000, 500000000, 1500000000]] * 12 +
             [[1000000000, 1500000000]] * 12 +
             [[1500000000]] * 12
         )
@@ -178,6 +191,22 @@ class TestVideoPreviewer(TestPreviewers):
             self.assertListEqual(xs, expected_xs)
 
 
+class TestAssetPreviewer(common.TestCase):
+    """Tests for the `AssetPreviewer` class."""
+
+    def test_should_thumbnail_linearly(self):
+        """Checks when the missing range is decoded instead of seeking."""
+        def should_thumbnail_linearly(queue):
+            previewer = mock.Mock(queue=queue)
+            return AssetPreviewer._should_thumbnail_linearly(previewer)
+
+        self.assertFalse(should_thumbnail_linearly([]))
+        self.assertFalse(should_thumbnail_linearly([THUMB_PERIOD * i for i in range(7)]))
+        self.assertTrue(should_thumbnail_linearly([THUMB_PERIOD * i for i in range(8)]))
+        self.assertTrue(should_thumbnail_linearly([4 * THUMB_PERIOD * i for i in range(8)]))
+        self.assertFalse(should_thumbnail_linearly([8 * THUMB_PERIOD * i for i in range(8)]))
+
+
 class TestAudioPreviewer(TestPreviewers):
     """Tests for the `AudioPreviewer` class."""
 
@@ -201,9 +230,118 @@ class TestAudioPreviewer(TestPreviewers):
         self.assertTrue(os.path.exists(wavefile), wavefile)
 
         with open(wavefile, "rb") as fsamples:
-            samples = list(numpy.load(fsamples))
+            samples = numpy.load(fsamples)
+
+        self.assertEqual(samples.dtype, numpy.float32)
+        self.assertEqual(list(samples), list(numpy.array(SIMPSON_WAVFORM_VALUES, dtype=numpy.float32)))
+
+    def test_waveform_peaks(self):
+        """Checks the unknown peaks are interpolated."""
+        peaks = WaveformPeaks(10)
+        self.assertTrue(peaks.add(2, [-40.0]))
+        self.assertTrue(peaks.add(3, [0.0]))
+        self.assertTrue(peaks.add(4, [-20.0, -40.0]))
+        self.assertTrue(peaks.add(6, [-40.0]))
+        self.assertFalse(peaks.add(10, [-40.0]))
+
+        self.assertListEqual(peaks.finish().tolist(),
+                             [0, 0.5, 1, 3.25, 5.5, 3.25, 1, 0, 0, 0])
+
+    def test_waveform_cache_levels(self):
+        """Checks the peaks are decimated for drawing."""
+        waveform = WaveformCache("file:///some/asset", numpy.array([1, 3, 2, 2, 5], dtype=numpy.float32))
+        self.assertEqual(len(waveform), 5)
+        self.assertEqual(waveform.max_value, 5)
+
+        # One sample per pixel.
+        mins, maxs, rms = waveform.peaks(1, 4, 3)
+        self.assertListEqual(rms.tolist(), [3, 2, 2])
+        self.assertIs(rms.base, waveform.samples)
+        self.assertIs(mins.base, waveform.samples)
+        self.assertIs(maxs.base, waveform.samples)
+
+        # Two samples per pixel.
+        mins, maxs, rms = waveform.peaks(0, 5, 2)
+        self.assertListEqual(mins.tolist(), [1, 2, 5])
+        self.assertListEqual(maxs.tolist(), [3, 2, 5])
+        self.assertListEqual(rms.tolist(), [numpy.sqrt(numpy.float32(5)), 2, 5])
+
+        # Five samples per pixel.
+        mins, maxs, rms = waveform.peaks(0, 5, 1)
+        self.assertListEqual(mins.tolist(), [1, 5])
+        self.assertListEqual(maxs.tolist(), [3, 5])
+
+    def test_waveform_tiles_lru(self):
+        """Checks the least recently used tiles are evicted."""
+        tiles = WaveformTileCache(300)
+        surfaces = [mock.Mock() for unused_i in range(3)]
+        tiles.set(("uri1", 0), surfaces[0], 100)
+        tiles.set(("uri1", 1), surfaces[1], 100)
+        tiles.set(("uri2", 0), surfaces[2], 100)
+        self.assertIs(tiles.get(("uri1", 0)), surfaces[0])
+
+        tiles.set(("uri2", 1), mock.Mock(), 100)
+        self.assertEqual(len(tiles), 3)
+        self.assertEqual(tiles.size, 300)
+        self.assertIsNone(tiles.get(("uri1", 1)))
+
+        tiles.remove_uri("uri2")
+        self.assertEqual(len(tiles), 1)
+        self.assertEqual(tiles.size, 100)
+
+    def test_waveform_tiles_failed_render(self):
+        """Checks the tiles are still rendered after a rendering fails."""
+        tiles = WaveformTileCache(1024 * 1024)
+        widget = mock.Mock()
+        surface = mock.Mock()
+        handled = threading.Event()
+
+        def fill_surface(samples, *unused_args):
+            if samples is None:
+                raise ValueError("Bad dimensions")
+            return surface
+
+        def idle_add(callback, *args):
+            callback(*args)
+            handled.set()
+
+        with mock.patch("pitivi.timeline.previewers.renderer.fill_surface", fill_surface), \
+                mock.patch.object(GLib, "idle_add", idle_add):
+            tiles.request(("uri", 0), widget, None, None, 10, 10, 1)
+            self.assertTrue(handled.wait(5))
+            self.assertIsNone(tiles.get(("uri", 0)))
+            self.assertNotIn(("uri", 0), tiles._pending)
+
+            handled.clear()
+            tiles.request(("uri", 1), widget, numpy.zeros(10), numpy.zeros(10), 10, 10, 1)
+            self.assertTrue(handled.wait(5))
+            self.assertIs(tiles.get(("uri", 1)), surface)
+            widget.queue_draw.assert_called_once_with()
+
+    def test_waveform_tiles_stale_requests(self):
+        """Checks the oldest requests are dropped when too many are waiting."""
+        tiles = WaveformTileCache(1024 * 1024)
+        # Pretend the worker is busy.
+        tiles._worker = mock.Mock()
+        widget = mock.Mock()
+        for index in range(MAX_PENDING_WAVEFORM_TILES + 1):
+            tiles.request(("uri", index), widget, None, None, 10, 10, 1)
+
+        self.assertEqual(len(tiles._jobs), MAX_PENDING_WAVEFORM_TILES)
+        self.assertNotIn(("uri", 0), tiles._pending)
+        self.assertIn(("uri", 1), tiles._pending)
+
+    def test_waveform_cache_shared(self):
+        """Checks the waveform of an asset is loaded once."""
+        sample_name = "1sec_simpsons_trailer.mp4"
+        with common.cloned_sample(sample_name):
+            self.check_import([sample_name])
 
-        self.assertEqual(samples, SIMPSON_WAVFORM_VALUES)
+            sample_uri = common.get_sample_uri(sample_name)
+            waveform = WaveformCache.get(sample_uri)
+            self.assertIsNotNone(waveform)
+            self.assertIs(WaveformCache.get(sample_uri), waveform)
+            self.assertIsInstance(waveform.samples, numpy.memmap)
 
     @common.setup_timeline
     def test_waveform_offset(self):
@@ -218,22 +356,132 @@ class TestAudioPreviewer(TestPreviewers):
         def set_source_surface(surface, offset_x, offset_y):
             offsets.append(offset_x)
 
-        samples = list(range(99))
+        waveform = WaveformCache("file:///some/asset", numpy.arange(99, dtype=numpy.float32))
         for previewer in audio_previewers:
-            previewer.samples = samples
-            with mock.patch.object(Gdk, "cairo_get_clip_rectangle") as cairo_get_clip_rectangle:
+            previewer.waveform = waveform
+            tiles = WaveformTileCache(1024 * 1024)
+            with mock.patch.object(WaveformCache, "tiles", tiles), \
+                    mock.patch.object(tiles, "request") as request, \
+                    mock.patch.object(Gdk, "cairo_get_clip_rectangle") as cairo_get_clip_rectangle:
                 cairo_get_clip_rectangle.return_value = (True, mock.Mock(x=0, width=10000))
-                from pitivi.timeline import previewers
-                with mock.patch.object(previewers.renderer, "fill_surface") as fill_surface:
-                    context = mock.Mock()
-                    context.set_source_surface = set_source_surface
-                    previewer.do_draw(context)
-            fill_surface.assert_called_once_with(samples, 949, -1)
+                context = mock.Mock()
+                context.set_source_surface = set_source_surface
+
+                # The missing tiles are requested, nothing is drawn.
+                previewer.do_draw(context)
+                self.assertEqual(len(offsets), audio_previewers.index(previewer))
+                widths = []
+                for args, unused_kwargs in request.call_args_list:
+                    unused_key, widget, maxs, mins, width, height, scale = args
+                    self.assertIs(widget, previewer)
+                    self.assertIs(maxs.base, waveform.samples)
+                    self.assertIs(mins.base, waveform.samples)
+                    self.assertEqual((height, scale), (-1, -1 / 98))
+                    widths.append(width)
+                self.assertListEqual(widths, [256, 256, 256, 181])
+
+                # Only the rendered tiles are drawn.
+                tiles.set(request.call_args_list[0][0][0], mock.Mock(), 0)
+                previewer.do_draw(context)
 
         expected_offsets = [0, -20, -40, -59, -79, -99, -119, -138, -158, -178]
         self.assertListEqual(offsets, expected_offsets)
 
 
+class TestPreviewGeneratorManager(common.TestCase):
+    """Tests for the `PreviewGeneratorManager` class."""
+
+    def test_parallel_previewers(self):
+        """Checks the previewers run in parallel, by priority."""
+        manager = PreviewGeneratorManager()
+        manager.max_jobs = 2
+
+        previewers = [mock.Mock(track_type=GES.TrackType.VIDEO, priority=priority)
+                      for priority in (0, 0, 1, 0)]
+        for previewer in previewers:
+            manager.add_previewer(previewer)
+        # Adding again a queued previewer has no effect.
+        manager.add_previewer(previewers[2])
+
+        self.assertEqual(previewers[0].start_generation.call_count, 1)
+        self.assertEqual(previewers[1].start_generation.call_count, 1)
+        previewers[2].start_generation.assert_not_called()
+        previewers[3].start_generation.assert_not_called()
+
+        done_cb = previewers[0].connect.call_args[0][1]
+        done_cb(previewers[0])
+        previewers[2].start_generation.assert_not_called()
+        self.assertEqual(previewers[3].start_generation.call_count, 1)
+
+        done_cb(previewers[1])
+        self.assertEqual(previewers[2].start_generation.call_count, 1)
+
+    def test_viewport_priority(self):
+        """Checks the previewers in view are generated first."""
+        manager = PreviewGeneratorManager()
+        manager.max_jobs = 1
+
+        def create_previewer(start):
+            previewer = mock.Mock(track_type=GES.TrackType.VIDEO, priority=0)
+            previewer.ges_elem.props.start = start
+            previewer.ges_elem.props.duration = 10 * Gst.SECOND
+            previewer.stop_generation.side_effect = lambda: done_cb(previewer)
+            return previewer
+
+        done_cb = None
+        offscreen = create_previewer(100 * Gst.SECOND)
+        far_offscreen = create_previewer(200 * Gst.SECOND)
+        visible = create_previewer(0)
+        manager.add_previewer(offscreen)
+        done_cb = offscreen.connect.call_args[0][1]
+        manager.add_previewer(far_offscreen)
+        manager.add_previewer(visible)
+        visible.start_generation.assert_not_called()
+
+        with mock.patch.object(GLib, "idle_add") as idle_add:
+            manager.set_viewport(0, 20 * Gst.SECOND, 0)
+            rerank_cb = idle_add.call_args[0][0]
+        rerank_cb()
+
+        # The off-screen previewer has been interrupted to let the visible
+        # previewer run first.
+        offscreen.stop_generation.assert_called_once_with()
+        self.assertEqual(visible.start_generation.call_count, 1)
+
+        done_cb(visible)
+        self.assertEqual(offscreen.start_generation.call_count, 2)
+        far_offscreen.start_generation.assert_not_called()
+
+    def test_paused(self):
+        """Checks the paused previewers are resumed and free their slots."""
+        manager = PreviewGeneratorManager()
+        manager.max_jobs = 1
+
+        running = mock.Mock(track_type=GES.TrackType.VIDEO, priority=0)
+        queued = mock.Mock(track_type=GES.TrackType.VIDEO, priority=0)
+        manager.add_previewer(running)
+        manager.add_previewer(queued)
+        done_cb = running.connect.call_args[0][1]
+
+        with manager.paused():
+            running.pause_generation.assert_called_once_with()
+        # The paused previewer has been resumed.
+        self.assertEqual(running.start_generation.call_count, 2)
+        queued.start_generation.assert_not_called()
+
+        # When it's done, the next previewer starts.
+        done_cb(running)
+        self.assertEqual(queued.start_generation.call_count, 1)
+
+        # A new previewer starts after the interrupted ones are done.
+        new = mock.Mock(track_type=GES.TrackType.VIDEO, priority=0)
+        queued.stop_generation.side_effect = lambda: done_cb(queued)
+        with manager.paused(interrupt=True):
+            queued.stop_generation.assert_called_once_with()
+        manager.add_previewer(new)
+        self.assertEqual(new.start_generation.call_count, 1)
+
+
 class TestPreviewer(common.TestCase):
     """Tests for the `Previewer` class."""
 
@@ -253,6 +501,22 @@ class TestPreviewer(common.TestCase):
         self.assertEqual(run_thumb_interval(2 * THUMB_PERIOD - 1), 2 * THUMB_PERIOD)
         self.assertEqual(run_thumb_interval(2 * THUMB_PERIOD), 2 * THUMB_PERIOD)
 
+        self.assertEqual(run_thumb_interval(2 * THUMB_PERIOD + 1), 4 * THUMB_PERIOD)
+        self.assertEqual(run_thumb_interval(3 * THUMB_PERIOD), 4 * THUMB_PERIOD)
+
+        coarsest = THUMB_PERIOD * 2 ** (THUMB_LEVELS - 1)
+        self.assertEqual(run_thumb_interval(coarsest), coarsest)
+        self.assertEqual(run_thumb_interval(coarsest + 1), 2 * coarsest)
+        self.assertEqual(run_thumb_interval(3 * coarsest), 3 * coarsest)
+
+    def test_thumb_level(self):
+        """Checks the `thumb_level` method."""
+        self.assertEqual(Previewer.thumb_level(THUMB_PERIOD), 0)
+        self.assertEqual(Previewer.thumb_level(3 * THUMB_PERIOD), 0)
+        self.assertEqual(Previewer.thumb_level(2 * THUMB_PERIOD), 1)
+        self.assertEqual(Previewer.thumb_level(12 * THUMB_PERIOD), 2)
+        self.assertEqual(Previewer.thumb_level(0), THUMB_LEVELS - 1)
+
 
 class TestThumbnailCache(BaseTestMediaLibrary):
     """Tests for the ThumbnailCache class."""
@@ -304,11 +568,156 @@ class TestThumbnailCache(BaseTestMediaLibrary):
                 self.assertTrue(Gst.SECOND in thumb_cache)
                 self.assertIsNotNone(thumb_cache[Gst.SECOND])
                 thumb_cache.commit()
+                ThumbnailCache.pixbuf_cache.remove_uri(sample_uri)
 
                 thumb_cache = ThumbnailCache(sample_uri)
                 self.assertTrue(Gst.SECOND in thumb_cache)
                 self.assertIsNotNone(thumb_cache[Gst.SECOND])
 
+    def test_nearest_position_and_scaling(self):
+        """Checks the thumbnails can be reused for other positions and heights."""
+        with tempfile.TemporaryDirectory() as tmpdirname:
+            with mock.patch("pitivi.timeline.previewers.xdg_cache_home") as xdg_cache_home:
+                xdg_cache_home.return_value = tmpdirname
+                sample_uri = common.get_sample_uri("1sec_simpsons_trailer.mp4")
+                thumb_cache = ThumbnailCache(sample_uri)
+                self.assertIsNone(thumb_cache.nearest_position(0, Gst.SECOND))
+
+                pixbuf = GdkPixbuf.Pixbuf.new(GdkPixbuf.Colorspace.RGB, False, 8,
+                                              2 * THUMB_HEIGHT, THUMB_HEIGHT)
+                thumb_cache[2 * Gst.SECOND] = pixbuf
+                thumb_cache[4 * Gst.SECOND] = pixbuf
+                self.assertEqual(thumb_cache.nearest_position(Gst.SECOND, Gst.SECOND), 2 * Gst.SECOND)
+                self.assertEqual(thumb_cache.nearest_position(5 * Gst.SECOND, Gst.SECOND), 4 * Gst.SECOND)
+                self.assertIsNone(thumb_cache.nearest_position(7 * Gst.SECOND, Gst.SECOND))
+
+                scaled = thumb_cache.get_pixbuf(2 * Gst.SECOND, 2 * THUMB_HEIGHT)
+                self.assertEqual((scaled.props.width, scaled.props.height),
+                                 (4 * THUMB_HEIGHT, 2 * THUMB_HEIGHT))
+                self.assertIs(thumb_cache.get_pixbuf(2 * Gst.SECOND, 2 * THUMB_HEIGHT), scaled)
+                ThumbnailCache.pixbuf_cache.remove_uri(sample_uri)
+
+    def test_decoded_pixbufs_cached(self):
+        """Checks a thumbnail is decoded only once."""
+        with tempfile.TemporaryDirectory() as tmpdirname:
+            with mock.patch("pitivi.timeline.previewers.xdg_cache_home") as xdg_cache_home:
+                xdg_cache_home.return_value = tmpdirname
+                sample_uri = common.get_sample_uri("1sec_simpsons_trailer.mp4")
+                thumb_cache = ThumbnailCache(sample_uri)
+                pixbuf = GdkPixbuf.Pixbuf.new(GdkPixbuf.Colorspace.RGB, False, 8, 20, 10)
+                thumb_cache[0] = pixbuf
+                ThumbnailCache.pixbuf_cache.remove_uri(sample_uri)
+
+                with mock.patch.object(GdkPixbuf.PixbufLoader, "new",
+                                       wraps=GdkPixbuf.PixbufLoader.new) as new_loader:
+                    pixbuf = thumb_cache[0]
+                    self.assertIs(thumb_cache[0], pixbuf)
+                    self.assertEqual(new_loader.call_count, 1)
+                ThumbnailCache.pixbuf_cache.remove_uri(sample_uri)
+
+    def test_shared_store(self):
+        """Checks the caches of all the assets share the same store."""
+        with tempfile.TemporaryDirectory() as tmpdirname:
+            with mock.patch("pitivi.timeline.previewers.xdg_cache_home") as xdg_cache_home:
+                xdg_cache_home.return_value = tmpdirname
+                cache1 = ThumbnailCache(common.get_sample_uri("1sec_simpsons_trailer.mp4"))
+                cache2 = ThumbnailCache(common.get_sample_uri("tears_of_steel.webm"))
+                self.assertIs(cache1.store, cache2.store)
+
+                pixbuf = GdkPixbuf.Pixbuf.new(GdkPixbuf.Colorspace.RGB, False, 8, 20, 10)
+                cache1[0] = pixbuf
+                self.assertIn(0, cache1)
+                self.assertNotIn(0, cache2)
+                db_files = [name for name in os.listdir(os.path.dirname(cache1.store.path))
+                            if name.endswith(".db")]
+                self.assertEqual(db_files, ["thumbs.db"])
+
+    def test_shared_cache_dir(self):
+        """Checks the thumbnails are published in the shared cache directory."""
+        with tempfile.TemporaryDirectory() as local_dir1, \
+                tempfile.TemporaryDirectory() as local_dir2, \
+                tempfile.TemporaryDirectory() as shared_dir, \
+                mock.patch.object(MediaCache, "shared_dir", shared_dir):
+            sample_uri = common.get_sample_uri("1sec_simpsons_trailer.mp4")
+            with mock.patch("pitivi.timeline.previewers.xdg_cache_home") as xdg_cache_home:
+                xdg_cache_home.return_value = local_dir1
+                thumb_cache = ThumbnailCache(sample_uri)
+                self.assertTrue(thumb_cache.store.path.startswith(local_dir1))
+                pixbuf = GdkPixbuf.Pixbuf.new(GdkPixbuf.Colorspace.RGB, False, 8, 20, 10)
+                thumb_cache[Gst.SECOND] = pixbuf
+                thumb_cache.commit()
+                ThumbnailCache.pixbuf_cache.remove_uri(sample_uri)
+
+            shared_path = thumb_cache.shared_path()
+            self.assertTrue(shared_path.startswith(shared_dir))
+            self.assertListEqual(os.listdir(os.path.dirname(shared_path)),
+                                 [os.path.basename(shared_path)])
+            mtime = os.stat(shared_path).st_mtime_ns
+
+            # Another machine imports the thumbnails in its own store.
+            with mock.patch("pitivi.timeline.previewers.xdg_cache_home") as xdg_cache_home:
+                xdg_cache_home.return_value = local_dir2
+                thumb_cache = ThumbnailCache(sample_uri)
+                self.assertTrue(thumb_cache.store.path.startswith(local_dir2))
+                self.assertIn(Gst.SECOND, thumb_cache)
+                self.assertEqual(thumb_cache[Gst.SECOND].props.width, 20)
+                thumb_cache.commit()
+                ThumbnailCache.pixbuf_cache.remove_uri(sample_uri)
+
+            # The shared file is not touched when using the thumbnails.
+            self.assertEqual(os.stat(shared_path).st_mtime_ns, mtime)
+
+
+class TestPixbufCache(common.TestCase):
+    """Tests for the PixbufCache class."""
+
+    def test_lru(self):
+        """Checks the least recently used pixbufs are evicted first."""
+        cache = PixbufCache(300)
+        pixbufs = [mock.Mock(get_byte_length=mock.Mock(return_value=100)) for unused_i in range(4)]
+        for i, pixbuf in enumerate(pixbufs[:3]):
+            cache.set(("uri", i, THUMB_HEIGHT), pixbuf)
+        self.assertEqual(cache.size, 300)
+
+        self.assertIs(cache.get(("uri", 0, THUMB_HEIGHT)), pixbufs[0])
+        cache.set(("uri", 3, THUMB_HEIGHT), pixbufs[3])
+        self.assertEqual(cache.size, 300)
+        self.assertIsNone(cache.get(("uri", 1, THUMB_HEIGHT)))
+        self.assertIs(cache.get(("uri", 0, THUMB_HEIGHT)), pixbufs[0])
+        self.assertEqual((cache.hits, cache.misses), (2, 1))
+
+        cache.remove_uri("uri")
+        self.assertEqual(len(cache), 0)
+        self.assertEqual(cache.size, 0)
+
+
+class TestThumbnailStore(common.TestCase):
+    """Tests for the ThumbnailStore class."""
+
+    def test_eviction(self):
+        """Checks the least recently used assets are evicted first."""
+        with tempfile.TemporaryDirectory() as tmpdirname:
+            store = ThumbnailStore(os.path.join(tmpdirname, "thumbs.db"), 300)
+            asset1 = store.asset_id("asset1")
+            asset2 = store.asset_id("asset2")
+            asset3 = store.asset_id("asset3")
+            self.assertEqual(store.asset_id("asset3"), asset3)
+
+            store.set(asset1, 0, b"1" * 50)
+            store.set(asset1, 0, b"1" * 100)
+            store.set(asset2, 0, b"2" * 100)
+            store.set(asset3, 0, b"3" * 100)
+            self.assertEqual(store.total_size, 300)
+            store.commit()
+            self.assertEqual(store.positions(asset1), {0})
+
+            store.set(asset3, Gst.SECOND, b"3" * 100)
+            store.commit(protected_ids={asset2})
+            self.assertEqual(store.total_size, 300)
+            self.assertIsNone(store.get(asset1, 0))
+            self.assertEqual(store.get(asset2, 0), b"2" * 100)
+            self.assertEqual(store.positions(asset3), {0, Gst.SECOND})
+
 
 class TestFunctions(BaseTestMediaLibrary):
     """Tests for the standalone functions."""
@@ -444,6 +444,33 @@ class TestProjectLoading(common.TestCase):
         self.assertEqual(row.thumb_decorator.state,
                          AssetThumbnail.PROXIED)
 
+    def test_resume_interrupted_proxy_jobs(self):
+        """Checks the interrupted proxying jobs are resumed only with a GUI."""
+        uri = common.get_sample_uri("1sec_simpsons_trailer.mp4")
+        proj_uri = self.create_project_file_from_xges("""<ges version='0.3'>
+            <project properties='properties;' metadatas='metadatas;'>
+                <ressources>
+                    <asset id='%s' extractable-type-name='GESUriClip' />
+                </ressources>
+            </project>
+            </ges>""" % uri)
+
+        for gui in (None, mock.Mock()):
+            app = common.create_pitivi(proxying_strategy=ProxyingStrategy.NOTHING)
+            app.gui = gui
+            mainloop = common.create_main_loop()
+            app.project_manager.connect("new-project-loaded",
+                                        lambda *unused_args, mainloop=mainloop: mainloop.quit())
+            with mock.patch.object(app.proxy_manager.jobs, "pop_interrupted",
+                                   return_value=[]) as pop_interrupted:
+                app.project_manager.load_project(proj_uri)
+                mainloop.run()
+
+            if gui:
+                pop_interrupted.assert_called_once_with(uri)
+            else:
+                pop_interrupted.assert_not_called()
+
     def test_loading_project_with_moved_asset(self):
         """Loads a project with moved asset."""
         app = common.create_pitivi(proxying_strategy=ProxyingStrategy.NOTHING)
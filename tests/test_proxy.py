@@ -16,10 +16,21 @@
 # License along with this program; if not, see <http://www.gnu.org/licenses/>.
 """Tests for the utils.proxy module."""
 # pylint: disable=protected-access
+import json
+import os
+import socket
+import tempfile
 from unittest import mock
 
 from gi.repository import GES
+from gi.repository import GLib
+from gi.repository import Gst
 
+from pitivi.utils.proxy import ProxyJobQueue
+from pitivi.utils.proxy import ProxyManager
+from pitivi.utils.proxy import ProxyPairTranscoder
+from pitivi.utils.proxy import TargetClipsIndex
+from pitivi.utils.proxy import TranscodingController
 from tests import common
 
 
@@ -37,11 +48,11 @@ class TestProxyManager(common.TestCase):
         asset = mock.Mock()
         asset.get_info().get_video_streams.return_value = [stream]
 
-        result = manager._scale_asset_resolution(asset, max_res[0], max_res[1])
+        result = manager.scale_asset_resolution(asset, max_res[0], max_res[1])
         self.assertEqual(result, expected_res)
 
     def test_scale_asset_resolution(self):
-        """Checks the _scale_asset_resolution method."""
+        """Checks the scale_asset_resolution method."""
         self._check_scale_asset_resolution((1920, 1080), (100, 100), (96, 54))
         self._check_scale_asset_resolution((1080, 1920), (100, 100), (54, 96))
         self._check_scale_asset_resolution((1000, 1000), (100, 100), (100, 100))
@@ -78,7 +89,7 @@ class TestProxyManager(common.TestCase):
 
         asset = mock.Mock()
         asset.get_id.return_value = asset_uri
-        with mock.patch.object(manager, "_scale_asset_resolution") as s_res:
+        with mock.patch.object(manager, "scale_asset_resolution") as s_res:
             s_res.return_value = scaled_res
             with mock.patch("pitivi.utils.proxy.Gio.File") as gio:
                 gio.new_for_uri.return_value = gio
@@ -144,3 +155,231 @@ class TestProxyManager(common.TestCase):
                 matches.return_value = True
                 self.assertTrue(manager.asset_can_be_proxied(video, scaled=True))
                 self.assertTrue(manager.asset_can_be_proxied(video))
+
+    def test_pair_transcoder(self):
+        """Checks the HQ and the scaled proxies are created at once."""
+        sample_name = "30fps_numeroted_frames_red.mkv"
+        with common.cloned_sample(sample_name):
+            app = common.create_pitivi_mock()
+            manager = app.proxy_manager
+            asset = GES.UriClipAsset.request_sync(common.get_sample_uri(sample_name))
+            proxy_uri = manager.get_proxy_uri(asset, scaled=True)
+            hq_proxy_uri = manager.get_proxy_uri(asset)
+            transcoder, signals_emitter = manager.create_transcoder(
+                asset, proxy_uri, (80, 60), hq_proxy_uri)
+            self.assertIsInstance(transcoder, ProxyPairTranscoder)
+
+            mainloop = common.create_main_loop()
+            signals_emitter.connect("done", lambda unused_transcoder: mainloop.quit())
+            transcoder.run_async()
+            mainloop.run(timeout_seconds=20)
+
+            proxy_uris = ProxyManager.finalize_transcoder(transcoder)
+            self.assertListEqual(proxy_uris, [proxy_uri, hq_proxy_uri])
+            proxy = GES.UriClipAsset.request_sync(proxy_uri)
+            stream = proxy.get_info().get_video_streams()[0]
+            self.assertEqual((stream.get_width(), stream.get_height()), (80, 60))
+            hq_proxy = GES.UriClipAsset.request_sync(hq_proxy_uri)
+            stream = hq_proxy.get_info().get_video_streams()[0]
+            asset_stream = asset.get_info().get_video_streams()[0]
+            self.assertEqual((stream.get_width(), stream.get_height()),
+                             (asset_stream.get_width(), asset_stream.get_height()))
+            self.assertEqual(hq_proxy.get_duration(), proxy.get_duration())
+
+    def _load_pair_proxies(self, hq_error=None):
+        app = common.create_pitivi_mock()
+        manager = app.proxy_manager
+        asset = mock.Mock()
+        transcoder = mock.Mock(spec=ProxyPairTranscoder)
+        transcoder.props.dest_uri = "file:///a.mp4.1.80x60.scaledproxy.mov" + ProxyManager.part_suffix
+        hq_proxy = mock.Mock()
+        error_cb = mock.Mock()
+        manager.connect("error-preparing-asset", error_cb)
+
+        with mock.patch.object(manager, "_ProxyManager__load_proxy") as load_proxy, \
+                mock.patch.object(GES.Asset, "request_finish", side_effect=hq_error), \
+                mock.patch("pitivi.utils.proxy.asset_get_duration", return_value=Gst.SECOND):
+            manager._ProxyManager__asset_loaded_cb(hq_proxy, mock.Mock(), asset, transcoder, True)
+        return app, load_proxy, error_cb, hq_proxy, asset, transcoder
+
+    def test_pair_proxies_loading(self):
+        """Checks the scaled proxy is loaded after the HQ proxy."""
+        app, load_proxy, error_cb, hq_proxy, asset, transcoder = self._load_pair_proxies()
+
+        error_cb.assert_not_called()
+        app.project_manager.current_project.finalize_proxy.assert_called_once_with(hq_proxy)
+        load_proxy.assert_called_once_with("file:///a.mp4.1.80x60.scaledproxy.mov",
+                                           asset, transcoder)
+
+    def test_pair_proxies_hq_failure(self):
+        """Checks the scaled proxy is not loaded when the HQ proxy fails."""
+        error = GLib.Error("Failed loading the HQ proxy")
+        app, load_proxy, error_cb, hq_proxy, asset, unused_transcoder = \
+            self._load_pair_proxies(hq_error=error)
+
+        error_cb.assert_called_once_with(app.proxy_manager, asset, hq_proxy, error)
+        app.project_manager.current_project.finalize_proxy.assert_not_called()
+        load_proxy.assert_not_called()
+
+
+class TestProxyJobQueue(common.TestCase):
+    """Tests for the ProxyJobQueue class."""
+
+    def test_interrupted_jobs(self):
+        """Checks the jobs left when quitting can be resumed."""
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, "jobs.json")
+            source_uri = Gst.filename_to_uri(os.path.join(tmpdir, "a.mp4"))
+            part_uri = source_uri + ".1.proxy.mov.part"
+            for uri in (source_uri, part_uri):
+                with open(Gst.uri_get_location(uri), "w", encoding="UTF-8"):
+                    pass
+
+            jobs = ProxyJobQueue(path)
+            transcoder = mock.Mock()
+            transcoder.props.dest_uri = part_uri
+            asset = mock.Mock(force_proxying=True)
+            asset.props.id = source_uri
+            asset.get_duration.return_value = Gst.SECOND
+            jobs.add(transcoder, asset, scaled=False)
+            self.assertEqual(len(jobs), 1)
+            self.assertEqual(jobs.duration(transcoder), Gst.SECOND)
+            self.assertListEqual(jobs.pop_interrupted(source_uri), [])
+            jobs.flush()
+
+            # Restart.
+            jobs = ProxyJobQueue(path)
+            self.assertEqual(len(jobs), 0)
+            self.assertFalse(os.path.exists(Gst.uri_get_location(part_uri)))
+            self.assertTrue(os.path.exists(Gst.uri_get_location(source_uri)))
+            interrupted = jobs.pop_interrupted(source_uri)
+            self.assertEqual(len(interrupted), 1)
+            self.assertFalse(interrupted[0]["scaled"])
+            self.assertTrue(interrupted[0]["force"])
+
+            # The resumed jobs are forgotten.
+            jobs.flush()
+            jobs = ProxyJobQueue(path)
+            self.assertListEqual(jobs.pop_interrupted(source_uri), [])
+
+    def test_jobs_of_other_processes(self):
+        """Checks the jobs of the running processes are left alone."""
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, "jobs.json")
+            source_uri = Gst.filename_to_uri(os.path.join(tmpdir, "a.mp4"))
+            part_uris = [source_uri + ".%d.proxy.mov.part" % i for i in range(3)]
+            for uri in [source_uri] + part_uris:
+                with open(Gst.uri_get_location(uri), "w", encoding="UTF-8"):
+                    pass
+
+            host = socket.gethostname()
+            owners = [{"host": host, "pid": os.getppid()},
+                      {"host": host + ".other", "pid": os.getpid()},
+                      {"host": host, "pid": 2 ** 22 + 1}]
+            with open(path, "w", encoding="UTF-8") as file:
+                json.dump({part_uri: {"uri": source_uri, "scaled": False, "force": False,
+                                      "duration": Gst.SECOND, "parts": [part_uri],
+                                      "owner": owner}
+                           for part_uri, owner in zip(part_uris, owners)}, file)
+
+            with mock.patch("pitivi.utils.proxy._process_is_alive",
+                            side_effect=lambda pid: pid == os.getppid()):
+                jobs = ProxyJobQueue(path)
+
+            # Only the job of the dead process of this host is interrupted.
+            self.assertListEqual([os.path.exists(Gst.uri_get_location(uri))
+                                  for uri in part_uris],
+                                 [True, True, False])
+            self.assertEqual(len(jobs.pop_interrupted(source_uri)), 1)
+
+            # The jobs are saved when idle, keeping those of the other processes.
+            transcoder = mock.Mock()
+            transcoder.props.dest_uri = source_uri + ".3.proxy.mov.part"
+            asset = mock.Mock(force_proxying=False)
+            asset.props.id = source_uri
+            asset.get_duration.return_value = Gst.SECOND
+            jobs.add(transcoder, asset, scaled=False)
+            jobs.remove(transcoder)
+            jobs.add(transcoder, asset, scaled=True)
+            with open(path, "r", encoding="UTF-8") as file:
+                self.assertNotIn(transcoder.props.dest_uri, json.load(file))
+
+            common.create_main_loop().run(until_empty=True)
+            with open(path, "r", encoding="UTF-8") as file:
+                saved_jobs = json.load(file)
+            self.assertSetEqual(set(saved_jobs),
+                                {part_uris[0], part_uris[1], transcoder.props.dest_uri})
+            self.assertTrue(saved_jobs[transcoder.props.dest_uri]["scaled"])
+            self.assertEqual(saved_jobs[transcoder.props.dest_uri]["owner"], jobs.owner)
+
+
+class TestTargetClipsIndex(common.TestCase):
+    """Tests for the TargetClipsIndex class."""
+
+    def test_clips_of(self):
+        ges_timeline = GES.Timeline.new_audio_video()
+        ges_layer = ges_timeline.append_layer()
+        clip1 = self.add_clip(ges_layer, 0)
+        index = TargetClipsIndex(ges_timeline)
+        clip2 = self.add_clip(ges_layer, 20)
+        uri = common.get_sample_uri("tears_of_steel.webm")
+        self.assertListEqual(index.clips_of(uri), [clip1, clip2])
+        self.assertListEqual(index.clips_of(uri + ".123.proxy.mov"), [clip1, clip2])
+        self.assertListEqual(list(index.targets()), [uri])
+
+        ges_layer2 = ges_timeline.append_layer()
+        clip1.move_to_layer(ges_layer2)
+        self.assertEqual(len(index), 2)
+        self.assertSetEqual(set(index.clips_of(uri)), {clip1, clip2})
+
+        ges_layer.remove_clip(clip2)
+        self.assertListEqual(index.clips_of(uri), [clip1])
+
+        ges_timeline.remove_layer(ges_layer2)
+        self.assertListEqual(index.clips_of(uri), [])
+        self.assertEqual(len(index), 0)
+
+
+class TestTranscodingController(common.TestCase):
+    """Tests for the TranscodingController class."""
+
+    def test_adapt(self):
+        """Checks the concurrency follows the throughput and the load."""
+        settings = mock.Mock(num_transcoding_jobs=4, max_cpu_usage=40)
+        load_tracker = mock.Mock()
+        load_tracker.load.return_value = (50, 0)
+        controller = TranscodingController(settings, load_tracker)
+        controller.jobs = 2
+        transcoders = [mock.Mock(), mock.Mock()]
+
+        def update(now, positions):
+            for transcoder, position in zip(transcoders, positions):
+                transcoder.props.position = position * Gst.SECOND
+            controller.update(transcoders, now)
+
+        update(0, (0, 0))
+        self.assertEqual(controller.jobs, 2)
+
+        # More jobs are tried while the machine is not saturated.
+        update(5, (10, 10))
+        self.assertEqual(controller.jobs, 3)
+
+        # The throughput dropped so the previous step is reverted.
+        update(10, (15, 15))
+        self.assertEqual(controller.jobs, 2)
+
+        # The CPU is saturated so the slowest job is capped.
+        load_tracker.load.return_value = (95, 0)
+        update(15, (25, 17))
+        self.assertEqual(controller.jobs, 1)
+        transcoders[0].set_cpu_usage.assert_not_called()
+        transcoders[1].set_cpu_usage.assert_called_once_with(30)
+
+        # The disk is saturated.
+        load_tracker.load.return_value = (50, 30)
+        controller.jobs = 3
+        update(20, (35, 27))
+        self.assertEqual(controller.jobs, 2)
+
+        # The CPU cap is raised back when the CPU is not saturated.
+        transcoders[1].set_cpu_usage.assert_called_with(37)
@@ -27,8 +27,10 @@ from gi.repository import Gst
 from gi.repository import GstPbutils
 from gi.repository import Gtk
 
+from pitivi.render import _clip_can_pass_through
 from pitivi.render import Encoders
 from pitivi.render import extension_for_muxer
+from pitivi.render import find_passthrough_segments
 from pitivi.render import PresetsManager
 from pitivi.render import Quality
 from pitivi.render import quality_adapters
@@ -197,6 +199,66 @@ class TestRender(BaseTestMediaLibrary):
         with mock.patch.object(Gtk.Builder, "__new__", return_value=MockedBuilder()):
             return RenderDialog(project.app, project)
 
+    def test_find_passthrough_segments(self):
+        """Checks the segments which can be remuxed are detected."""
+        project = self.create_simple_project()
+        layer1, = project.ges_timeline.get_layers()
+        clip1, = layer1.get_clips()
+        asset = clip1.get_asset()
+        clip1.set_duration(Gst.SECOND)
+        layer2 = project.ges_timeline.append_layer()
+        layer2.add_asset(asset, Gst.SECOND // 2, 0, Gst.SECOND, GES.TrackType.UNKNOWN)
+        clip3 = layer1.add_asset(asset, 2 * Gst.SECOND, 0, Gst.SECOND, GES.TrackType.UNKNOWN)
+        clip3.add_top_effect(GES.Effect.new("agingtv"), 0)
+
+        with mock.patch("pitivi.render._clip_can_pass_through",
+                        side_effect=lambda clip, *args: not clip.get_top_effects()):
+            segments = find_passthrough_segments(project)
+
+        self.assertListEqual(segments, [
+            (0, Gst.SECOND // 2, True),
+            # Overlapping clips.
+            (Gst.SECOND // 2, Gst.SECOND, False),
+            (Gst.SECOND, Gst.SECOND * 3 // 2, True),
+            # A gap, then a clip with an effect.
+            (Gst.SECOND * 3 // 2, 3 * Gst.SECOND, False)])
+
+    def test_clip_can_pass_through(self):
+        """Checks the streams having the render settings can be remuxed."""
+        project = self.create_simple_project()
+        layer, = project.ges_timeline.get_layers()
+        clip, = layer.get_clips()
+        info = clip.get_asset().get_info()
+        video_stream, = info.get_video_streams()
+        audio_stream, = info.get_audio_streams()
+        width, height = video_stream.get_width(), video_stream.get_height()
+        project.videowidth = width
+        project.videoheight = height
+        project.videorate = Gst.Fraction(video_stream.get_framerate_num(),
+                                         video_stream.get_framerate_denom())
+        project.audiorate = audio_stream.get_sample_rate()
+        project.audiochannels = audio_stream.get_channels()
+        source = clip.find_track_element(None, GES.VideoUriSource)
+        for name, value in (("posx", 0), ("posy", 0), ("width", width), ("height", height)):
+            source.set_child_property(name, value)
+        video_caps = video_stream.get_caps()
+        audio_caps = audio_stream.get_caps()
+
+        self.assertTrue(_clip_can_pass_through(clip, GES.TrackType.VIDEO, video_caps, project))
+        self.assertTrue(_clip_can_pass_through(clip, GES.TrackType.AUDIO, audio_caps, project))
+
+        # Other formats.
+        self.assertFalse(_clip_can_pass_through(clip, GES.TrackType.VIDEO,
+                                                Gst.Caps("video/x-h264"), project))
+        self.assertFalse(_clip_can_pass_through(clip, GES.TrackType.AUDIO,
+                                                Gst.Caps("audio/mpeg"), project))
+
+        # Other settings.
+        project.videowidth = width // 2
+        self.assertFalse(_clip_can_pass_through(clip, GES.TrackType.VIDEO, video_caps, project))
+        project.audiorate = audio_stream.get_sample_rate() // 2
+        self.assertFalse(_clip_can_pass_through(clip, GES.TrackType.AUDIO, audio_caps, project))
+
     def test_launching_rendering(self):
         """Checks no exception is raised when clicking the render button."""
         project = self.create_simple_project()
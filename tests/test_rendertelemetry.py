@@ -0,0 +1,62 @@
+# -*- coding: utf-8 -*-
+# Pitivi video editor
+# Copyright (c) 2024, Pitivi contributors
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this program; if not, see <http://www.gnu.org/licenses/>.
+"""Tests for the utils.rendertelemetry module."""
+from unittest import mock
+
+from gi.repository import Gst
+
+from pitivi.utils.rendertelemetry import RenderTelemetry
+from tests import common
+
+
+class TestRenderTelemetry(common.TestCase):
+    """Tests for the RenderTelemetry class."""
+
+    def test_elements(self):
+        pipeline = Gst.parse_launch("videotestsrc num-buffers=30 ! queue name=queue0 ! "
+                                    "videoconvert name=convert ! fakesink")
+        telemetry = RenderTelemetry()
+        telemetry.attach(pipeline)
+        pipeline.set_state(Gst.State.PLAYING)
+        message = pipeline.get_bus().timed_pop_filtered(
+            10 * Gst.SECOND, Gst.MessageType.EOS | Gst.MessageType.ERROR)
+        pipeline.set_state(Gst.State.NULL)
+        telemetry.detach()
+
+        self.assertEqual(message.type, Gst.MessageType.EOS)
+        report = telemetry.report()
+        convert, = [element for element in report["elements"] if element["name"] == "convert"]
+        self.assertEqual(convert["buffers_in"], 30)
+        self.assertEqual(convert["buffers_out"], 30)
+        self.assertEqual(report["stalls"], [])
+
+    def test_stalls(self):
+        pipeline = Gst.Pipeline()
+        telemetry = RenderTelemetry()
+        now = 1000
+        with mock.patch("time.monotonic", return_value=now):
+            telemetry.attach(pipeline)
+        for elapsed, position in ((1, 10), (2, 20), (3, 20), (4, 20), (5, 20), (6, 30)):
+            telemetry.sample(now + elapsed, position)
+        telemetry.detach()
+
+        self.assertEqual(len(telemetry.stalls), 1)
+        stall = telemetry.stalls[0]
+        self.assertEqual(stall["start"], 2)
+        self.assertEqual(stall["duration"], 4)
+        self.assertEqual(stall["position"], 20)
+        self.assertEqual(len(telemetry.fps), 6)
@@ -23,8 +23,6 @@ from gi.repository import Gdk
 from gi.repository import GES
 from gi.repository import Gst
 from gi.repository import Gtk
-from matplotlib.backend_bases import MouseButton
-from matplotlib.backend_bases import MouseEvent
 
 from pitivi.timeline.elements import GES_TYPE_UI_TYPE
 from pitivi.undo.undo import UndoableActionLog
@@ -35,6 +33,16 @@ from pitivi.utils.ui import LAYER_HEIGHT
 from tests import common
 
 
+def create_button_event(event_type, x, y):
+    """Creates a left mouse button event at the specified position."""
+    event = mock.Mock(spec=Gdk.EventButton)
+    event.type = event_type
+    event.x = x
+    event.y = y
+    event.get_button.return_value = (True, 1)
+    return event
+
+
 class TestKeyframeCurve(common.TestCase):
     """Tests for the KeyframeCurve class."""
 
@@ -138,67 +146,41 @@ class TestKeyframeCurve(common.TestCase):
         values = [item.timestamp for item in control_source.get_all()]
         self.assertEqual(values, [inpoint, inpoint + duration])
 
+        # Make the curve wide enough for the line to be clicked
+        # next to the edge keyframes.
+        keyframe_curve.set_size_request(1000, LAYER_HEIGHT)
+
         # Add keyframes by simulating mouse clicks.
         for offset_px in offsets_px:
             offset = Zoomable.pixel_to_ns(start_px + offset_px) - start
-            xdata, ydata = inpoint + offset, 1
-            x, y = keyframe_curve._ax.transData.transform((xdata, ydata))
-
-            event = MouseEvent(
-                name="button_press_event",
-                canvas=keyframe_curve,
-                x=x,
-                y=y,
-                button=1
-            )
+            x, y = keyframe_curve._get_point(inpoint + offset, 1)
             keyframe_curve.translate_coordinates = \
                 mock.Mock(return_value=(start_px + offset_px, None))
 
-            with mock.patch.object(Gtk, "get_event_widget") as get_event_widget:
-                get_event_widget.return_value = keyframe_curve
-                event.guiEvent = Gdk.Event.new(Gdk.EventType.BUTTON_PRESS)
-                keyframe_curve._mpl_button_press_event_cb(event)
-
-                event.name = "button_release_event"
-                event.guiEvent = Gdk.Event.new(Gdk.EventType.BUTTON_RELEASE)
-                keyframe_curve._mpl_button_release_event_cb(event)
+            keyframe_curve._button_press_event_cb(
+                None, create_button_event(Gdk.EventType.BUTTON_PRESS, x, y))
+            keyframe_curve._button_release_event_cb(
+                None, create_button_event(Gdk.EventType.BUTTON_RELEASE, x, y))
 
             values = [item.timestamp for item in control_source.get_all()]
             self.assertIn(inpoint + offset, values)
 
         for offset_px in offsets_px:
             offset = Zoomable.pixel_to_ns(start_px + offset_px) - start
-            xdata, ydata = inpoint + offset, 1
-            x, y = keyframe_curve._ax.transData.transform((xdata, ydata))
-
-            event = MouseEvent(
-                name="button_press_event",
-                canvas=keyframe_curve,
-                x=x,
-                y=y,
-                button=1
-            )
+            x, y = keyframe_curve._get_point(inpoint + offset, 1)
             keyframe_curve.translate_coordinates = \
                 mock.Mock(return_value=(start_px + offset_px, None))
-            with mock.patch.object(Gtk, "get_event_widget") as get_event_widget:
-                get_event_widget.return_value = keyframe_curve
-                event.guiEvent = Gdk.Event.new(Gdk.EventType.BUTTON_PRESS)
-                keyframe_curve._mpl_button_press_event_cb(event)
-
-                event.name = "button_release_event"
-                event.guiEvent = Gdk.Event.new(Gdk.EventType.BUTTON_RELEASE)
-                keyframe_curve._mpl_button_release_event_cb(event)
-
-                event.name = "button_press_event"
-                event.guiEvent = Gdk.Event.new(Gdk.EventType.BUTTON_PRESS)
-                keyframe_curve._mpl_button_press_event_cb(event)
-
-                event.guiEvent = Gdk.Event.new(Gdk.EventType._2BUTTON_PRESS)
-                keyframe_curve._mpl_button_press_event_cb(event)
 
-                event.name = "button_release_event"
-                event.guiEvent = Gdk.Event.new(Gdk.EventType.BUTTON_RELEASE)
-                keyframe_curve._mpl_button_release_event_cb(event)
+            keyframe_curve._button_press_event_cb(
+                None, create_button_event(Gdk.EventType.BUTTON_PRESS, x, y))
+            keyframe_curve._button_release_event_cb(
+                None, create_button_event(Gdk.EventType.BUTTON_RELEASE, x, y))
+            keyframe_curve._button_press_event_cb(
+                None, create_button_event(Gdk.EventType.BUTTON_PRESS, x, y))
+            keyframe_curve._button_press_event_cb(
+                None, create_button_event(Gdk.EventType.DOUBLE_BUTTON_PRESS, x, y))
+            keyframe_curve._button_release_event_cb(
+                None, create_button_event(Gdk.EventType.BUTTON_RELEASE, x, y))
 
             values = [item.timestamp for item in control_source.get_all()]
             self.assertNotIn(inpoint + offset, values)
@@ -232,60 +214,42 @@ class TestKeyframeCurve(common.TestCase):
             timeline_container._keyframe_cb(None, None)
 
         # Start dragging the keyframe.
-        x, y = keyframe_curve._ax.transData.transform((position, 1))
-        event = MouseEvent(
-            name="button_press_event",
-            canvas=keyframe_curve,
-            x=x,
-            y=y,
-            button=MouseButton.LEFT
-        )
-        event.guiEvent = Gdk.Event.new(Gdk.EventType.BUTTON_PRESS)
+        keyframe_curve.set_size_request(1000, LAYER_HEIGHT)
+        x, y = keyframe_curve._get_point(position, 1)
+        event = create_button_event(Gdk.EventType.BUTTON_PRESS, x, y)
         self.assertIsNone(keyframe_curve._offset)
-        keyframe_curve._mpl_button_press_event_cb(event)
+        keyframe_curve._button_press_event_cb(None, event)
         self.assertIsNotNone(keyframe_curve._offset)
 
         # Drag and make sure x and y are not locked.
         timeline_container.control_mask = False
-        event = mock.Mock(
-            x=x + 1,
-            y=y + 1,
-            xdata=position + 1,
-            ydata=0.9,
-        )
+        event = mock.Mock(x=x + 10, y=y + 10)
+        xdata1, ydata1 = keyframe_curve._get_timestamp_value(event.x, event.y)
         with mock.patch.object(keyframe_curve,
                                "_move_keyframe") as _move_keyframe:
-            keyframe_curve._mpl_motion_event_cb(event)
+            keyframe_curve._motion_notify_event_cb(None, event)
             # Check the keyframe is moved exactly where the cursor is.
-            _move_keyframe.assert_called_once_with(position, position + 1, 0.9)
+            _move_keyframe.assert_called_once_with(position, xdata1, ydata1)
 
         # Drag locked horizontally.
         timeline_container.control_mask = True
-        event = mock.Mock(
-            x=x + 1,
-            y=y + 2,
-            xdata=position + 2,
-            ydata=0.8,
-        )
+        event = mock.Mock(x=x + 10, y=y + 20)
+        unused_xdata, ydata2 = keyframe_curve._get_timestamp_value(event.x, event.y)
         with mock.patch.object(keyframe_curve,
                                "_move_keyframe") as _move_keyframe:
-            keyframe_curve._mpl_motion_event_cb(event)
+            keyframe_curve._motion_notify_event_cb(None, event)
             # Check the keyframe is kept on the same timestamp.
-            _move_keyframe.assert_called_once_with(position + 1, position, 0.8)
+            _move_keyframe.assert_called_once_with(xdata1, position, ydata2)
 
         # Drag locked vertically.
         timeline_container.control_mask = True
-        event = mock.Mock(
-            x=x + 2,
-            y=y + 1,
-            xdata=position + 3,
-            ydata=0.7,
-        )
+        event = mock.Mock(x=x + 20, y=y + 10)
+        xdata3, unused_ydata = keyframe_curve._get_timestamp_value(event.x, event.y)
         with mock.patch.object(keyframe_curve,
                                "_move_keyframe") as _move_keyframe:
-            keyframe_curve._mpl_motion_event_cb(event)
+            keyframe_curve._motion_notify_event_cb(None, event)
             # Check the keyframe is kept on the same value.
-            _move_keyframe.assert_called_once_with(position, position + 3, 1)
+            _move_keyframe.assert_called_once_with(position, xdata3, 1)
 
     def test_no_clip_selected(self):
         """Checks nothing happens when no clip is selected."""
@@ -311,26 +275,13 @@ class TestKeyframeCurve(common.TestCase):
         keyframe_curve = ges_video_source.ui.keyframe_curve
 
         # Simulate a mouse click.
-        xdata, ydata = 1, LAYER_HEIGHT // 2
-        x, y = keyframe_curve._ax.transData.transform((xdata, ydata))
-
-        event = MouseEvent(
-            name="button_press_event",
-            canvas=keyframe_curve,
-            x=x,
-            y=y,
-            button=1
-        )
+        x, y = keyframe_curve._get_point(1, LAYER_HEIGHT // 2)
         keyframe_curve.translate_coordinates = mock.Mock(return_value=(1, None))
 
-        with mock.patch.object(Gtk, "get_event_widget") as get_event_widget:
-            get_event_widget.return_value = keyframe_curve
-            event.guiEvent = Gdk.Event.new(Gdk.EventType.BUTTON_PRESS)
-            keyframe_curve._mpl_button_press_event_cb(event)
-
-            event.name = "button_release_event"
-            event.guiEvent = Gdk.Event.new(Gdk.EventType.BUTTON_RELEASE)
-            keyframe_curve._mpl_button_release_event_cb(event)
+        keyframe_curve._button_press_event_cb(
+            None, create_button_event(Gdk.EventType.BUTTON_PRESS, x, y))
+        keyframe_curve._button_release_event_cb(
+            None, create_button_event(Gdk.EventType.BUTTON_RELEASE, x, y))
 
         self.assertListEqual([item.timestamp for item in control_source.get_all()], [0, 1000000000])
 
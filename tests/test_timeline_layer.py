@@ -22,6 +22,7 @@ from gi.repository import GES
 from pitivi.timeline.layer import AUDIO_ICONS
 from pitivi.timeline.layer import FullLayer
 from pitivi.timeline.layer import VIDEO_ICONS
+from pitivi.utils.timeline import Zoomable
 from pitivi.utils.ui import LAYER_HEIGHT
 from tests import common
 
@@ -214,3 +215,67 @@ class TestLayer(common.TestCase):
             self.assertEqual(self.layer.ui.props.height_request, LAYER_HEIGHT)
         else:
             self.assertEqual(self.layer.ui.props.height_request, LAYER_HEIGHT // 2)
+
+    @common.setup_timeline
+    def test_viewport(self):
+        clips = [self.add_clip(self.layer, start, duration=10) for start in (0, 10, 100, 1000)]
+        layer = self.layer.ui
+        for clip in clips:
+            self.assertTrue(layer.is_realized(clip))
+
+        layer.set_viewport(5, 101)
+        self.assertListEqual([layer.is_realized(clip) for clip in clips],
+                             [True, True, True, False])
+        self.assertFalse(clips[3].ui.get_child_visible())
+
+        # Moving a clip in view realizes it.
+        clips[3].props.start = 50
+        self.assertTrue(layer.is_realized(clips[3]))
+        self.assertTrue(clips[3].ui.get_child_visible())
+
+        clips[0].props.start = 200
+        self.assertFalse(layer.is_realized(clips[0]))
+
+        # A clip added out of view is not realized.
+        clip = self.add_clip(self.layer, 500, duration=10)
+        self.assertFalse(layer.is_realized(clip))
+
+        layer.set_viewport(0, 1000)
+        for clip in self.layer.get_clips():
+            self.assertTrue(layer.is_realized(clip))
+
+    @common.setup_timeline
+    def test_viewport_previewers(self):
+        layer = self.layer.ui
+        layer.set_viewport(0, 100)
+        in_view = self.add_clip(self.layer, 0, duration=10)
+        out_of_view = self.add_clip(self.layer, 1000, duration=10)
+        in_view_source = in_view.find_track_element(None, GES.VideoUriSource).ui
+        out_of_view_source = out_of_view.find_track_element(None, GES.VideoUriSource).ui
+
+        self.assertIsNotNone(in_view_source.previewer)
+        self.assertTrue(Zoomable.has_instance(in_view_source.previewer))
+        self.assertTrue(Zoomable.has_instance(in_view_source.markers))
+        self.assertFalse(Zoomable.has_instance(in_view.ui))
+
+        # The previewer is created only when the clip gets in view.
+        self.assertIsNone(out_of_view_source.previewer)
+        self.assertFalse(Zoomable.has_instance(out_of_view_source.markers))
+
+        layer.set_viewport(900, 1100)
+        self.assertIsNotNone(out_of_view_source.previewer)
+        self.assertTrue(Zoomable.has_instance(out_of_view_source.markers))
+
+        # Out of view, the previewer is kept but not notified of zoom changes.
+        previewer = in_view_source.previewer
+        self.assertFalse(Zoomable.has_instance(previewer))
+        self.assertFalse(Zoomable.has_instance(in_view_source.markers))
+        with mock.patch.object(previewer, "zoom_changed") as zoom_changed:
+            Zoomable.set_zoom_ratio(Zoomable.zoomratio * 2)
+            Zoomable.apply_zoom()
+            zoom_changed.assert_not_called()
+
+            layer.set_viewport(0, 100)
+            self.assertIs(in_view_source.previewer, previewer)
+            self.assertTrue(Zoomable.has_instance(previewer))
+            zoom_changed.assert_called_once_with()
@@ -16,6 +16,11 @@
 # License along with this program; if not, see <http://www.gnu.org/licenses/>.
 # pylint: disable=protected-access
 """Tests for the pitivi.timeline.ruler module."""
+from unittest import mock
+
+import cairo
+from gi.repository import Gst
+
 from tests import common
 
 
@@ -31,3 +36,22 @@ class TestRuler(common.TestCase):
         # Check the ticks are sorted correctly.
         for unused_interval, ticks in scales:
             self.assertListEqual(sorted(ticks), ticks)
+
+    def test_static_content_cached(self):
+        ruler = common.create_timeline_container().ruler
+        ruler.do_configure_event(None)
+        context = cairo.Context(cairo.ImageSurface(cairo.FORMAT_ARGB32, 100, 10))
+
+        with mock.patch.object(ruler, "draw_ruler") as draw_ruler:
+            ruler.do_draw(context)
+            self.assertEqual(draw_ruler.call_count, 1)
+
+            # Check only the playhead is painted when the position changes.
+            ruler._pipeline_position_cb(None, Gst.SECOND)
+            ruler.do_draw(context)
+            self.assertEqual(draw_ruler.call_count, 1)
+
+            # Check the static content is drawn again when scrolling.
+            ruler.pixbuf_offset = 10
+            ruler.do_draw(context)
+            self.assertEqual(draw_ruler.call_count, 2)
@@ -26,6 +26,7 @@ from gi.repository import Gtk
 from pitivi.undo.timeline import TimelineObserver
 from pitivi.undo.undo import UndoableActionLog
 from pitivi.utils.timeline import UNSELECT
+from pitivi.utils.timeline import Zoomable
 from pitivi.utils.ui import LAYER_HEIGHT
 from pitivi.utils.ui import SEPARATOR_HEIGHT
 from pitivi.utils.ui import URI_TARGET_ENTRY
@@ -898,6 +899,31 @@ class TestTimelineContainer(common.TestCase):
         # Check the title clips are ignored.
         timeline_container.update_clips_asset(mock.Mock())
 
+    def test_zoom_fit(self):
+        timeline_container = common.create_timeline_container()
+        timeline = timeline_container.timeline
+        self.add_clips_simple(timeline, 5)
+        Zoomable.set_zoom_level(50)
+        Zoomable.apply_zoom()
+        self.assertFalse(timeline.zoomed_fitted)
+
+        best_ratio = Zoomable.compute_zoom_ratio(10)
+        with mock.patch.object(timeline, "calc_best_zoom_ratio", return_value=best_ratio):
+            timeline.set_best_zoom_ratio(allow_zoom_in=True)
+        self.assertEqual(Zoomable.get_current_zoom_level(), 10)
+        self.assertTrue(timeline.zoomed_fitted)
+
+        # The pass deferred until the timeline is mapped keeps the flag.
+        mainloop = common.create_main_loop()
+        mainloop.run(until_empty=True)
+        timeline.zoom_changed()
+        self.assertTrue(timeline.zoomed_fitted)
+
+        Zoomable.set_zoom_level(20)
+        Zoomable.apply_zoom()
+        timeline.zoom_changed()
+        self.assertFalse(timeline.zoomed_fitted)
+
 
 class TestClipsEdges(common.TestCase):
 
@@ -19,11 +19,13 @@ from unittest import mock
 from gi.repository import GES
 
 from pitivi.utils.timeline import EditingContext
+from pitivi.utils.timeline import IntervalIndex
 from pitivi.utils.timeline import SELECT
 from pitivi.utils.timeline import SELECT_ADD
 from pitivi.utils.timeline import Selected
 from pitivi.utils.timeline import Selection
 from pitivi.utils.timeline import UNSELECT
+from pitivi.utils.timeline import Zoomable
 from tests import common
 
 
@@ -171,3 +173,95 @@ class TestEditingContext(common.TestCase):
             self.assertTrue(context.with_video)
         else:
             self.assertFalse(context.with_video)
+
+
+class TestIntervalIndex(common.TestCase):
+    """Tests for the IntervalIndex class."""
+
+    def test_overlapping(self):
+        index = IntervalIndex()
+        index.add("a", 0, 10)
+        index.add("b", 5, 100)
+        index.add("c", 20, 30)
+        index.add("d", 30, 40)
+        self.assertEqual(len(index), 4)
+
+        self.assertListEqual(index.overlapping(0, 5), ["a"])
+        self.assertListEqual(index.overlapping(9, 21), ["a", "b", "c"])
+        self.assertListEqual(index.overlapping(30, 31), ["b", "d"])
+        self.assertListEqual(index.overlapping(100, 200), [])
+
+        index.update("b", 50, 60)
+        self.assertListEqual(index.overlapping(9, 21), ["a", "c"])
+        self.assertListEqual(index.overlapping(35, 55), ["d", "b"])
+
+        index.remove("a")
+        self.assertNotIn("a", index)
+        self.assertListEqual(index.overlapping(0, 25), ["c"])
+
+    def test_same_start(self):
+        index = IntervalIndex()
+        index.add("a", 10, 20)
+        index.add("b", 10, 30)
+        index.remove("b")
+        self.assertListEqual(index.overlapping(0, 100), ["a"])
+        self.assertEqual(index.get_extent("a"), (10, 20))
+
+    def test_edges(self):
+        index = IntervalIndex()
+        self.assertIsNone(index.next_edge(0))
+        self.assertIsNone(index.previous_edge(0))
+        self.assertListEqual(index.containing(0), [])
+
+        index.add("a", 0, 10)
+        index.add("b", 5, 15)
+        index.add("c", 20, 30)
+        self.assertEqual(index.next_edge(0), 5)
+        self.assertEqual(index.next_edge(5), 10)
+        self.assertEqual(index.next_edge(15), 20)
+        self.assertIsNone(index.next_edge(30))
+        self.assertEqual(index.previous_edge(30), 20)
+        self.assertEqual(index.previous_edge(20), 15)
+        self.assertIsNone(index.previous_edge(0))
+
+        # The ends are included.
+        self.assertListEqual(index.containing(10), ["a", "b"])
+        self.assertListEqual(index.containing(20), ["c"])
+        self.assertListEqual(index.containing(17), [])
+
+    def test_long_interval(self):
+        index = IntervalIndex()
+        for start in range(0, 1000, 10):
+            index.add(start, start, start + 10)
+        index.add("long", 5, 995)
+
+        self.assertListEqual(index.overlapping(500, 505), ["long", 500])
+        self.assertListEqual(index.containing(0), [0])
+        self.assertListEqual(index.containing(995), ["long", 990])
+        self.assertEqual(len(index.overlapping(0, 1000)), 101)
+
+        index.remove("long")
+        self.assertListEqual(index.overlapping(500, 505), [500])
+        self.assertListEqual(index.containing(5), [0])
+
+
+class TestZoomable(common.TestCase):
+    """Tests for the Zoomable class."""
+
+    def test_coalesced_zoom_changes(self):
+        zoomable = Zoomable()
+        zoomable.zoom_changed = mock.Mock()
+        self.addCleanup(Zoomable.remove_instance, zoomable)
+
+        level = Zoomable.get_current_zoom_level()
+        Zoomable.set_zoom_level(level + 1)
+        Zoomable.set_zoom_level(level + 2)
+        self.assertEqual(Zoomable.get_current_zoom_level(), level + 2)
+        zoomable.zoom_changed.assert_not_called()
+
+        Zoomable.apply_zoom()
+        zoomable.zoom_changed.assert_called_once_with()
+
+        # Nothing pending anymore.
+        Zoomable.apply_zoom()
+        zoomable.zoom_changed.assert_called_once_with()